@@ -8,6 +8,8 @@ class Config:
         compress: bool = None,
         b64: bool = DEFAULT_B64,
         root_dir: str = DEFAULT_ROOT_DIR,
+        json_backend: str = None,
+        compress_threads: int = None,
         **kwargs,
     ):
         self.serializer = get_serializer_type(serializer)
@@ -15,7 +17,20 @@ class Config:
         self.compress = get_compresser(compress)
         self.b64 = b64
         self.root_dir = root_dir
+        if json_backend is not None:
+            self.set_json_backend(json_backend)
+        if compress_threads is not None:
+            self.set_compress_threads(compress_threads)
 
+    @property
+    def json_backend(self):
+        from .serializers.custom import get_json_backend
+        return get_json_backend()
+
+    @property
+    def compress_threads(self):
+        from .utils.encodings import get_compress_threads
+        return get_compress_threads()
 
     def to_dict(self):
         return {
@@ -24,6 +39,8 @@ class Config:
             "compress": self.compress,
             "b64": self.b64,
             "root_dir": self.root_dir,
+            "json_backend": self.json_backend,
+            "compress_threads": self.compress_threads,
         }
 
     def __repr__(self):
@@ -47,6 +64,16 @@ class Config:
             )
         self.engine = engine
 
+    def set_json_backend(self, json_backend: str):
+        # applies process-wide: used by the hashstash serializer to parse json
+        from .serializers.custom import set_json_backend
+        set_json_backend(json_backend)
+
+    def set_compress_threads(self, compress_threads: int):
+        # applies process-wide: threads used to compress and decompress large values
+        from .utils.encodings import set_compress_threads
+        set_compress_threads(compress_threads)
+
     def set_compress(self, compress: bool):
         self.compress = compress
 
@@ -147,7 +174,10 @@ def get_engine(engine):
 @fcache
 def get_working_serializers():
     from .utils.logs import log
-    working_serializers = ['hashstash','pickle']
+    import pickle
+    working_serializers = ['hashstash','hashstash_bin','pickle']
+    if pickle.HIGHEST_PROTOCOL >= 5:
+        working_serializers.append('pickle5')
     try:
         import jsonpickle
         working_serializers.append('jsonpickle')
@@ -177,7 +207,7 @@ def get_working_io_engines():
     try:
         import pyarrow
 
-        working_engines.extend(["parquet", "feather"])
+        working_engines.extend(["parquet", "feather", "arrow"])
     except ImportError:
         pass
 
@@ -262,13 +292,44 @@ def get_working_compressers():
         compressers.append('lz4')
     except ImportError:
         pass
+
+    try:
+        import zstandard
+        compressers.append('zstd')
+    except ImportError:
+        pass
     return set(compressers)
 
+@fcache
+def get_working_hashers():
+    hashers = ['md5', 'blake2b']
+    try:
+        import xxhash
+        hashers.append('xxh3')
+    except ImportError:
+        pass
+    return set(hashers)
+
+@fcache
+def get_hasher(hash_type):
+    from .utils.logs import log
+    if hash_type is None:
+        return DEFAULT_HASH_TYPE
+    if not hash_type in get_working_hashers():
+        if hash_type in HASHERS:
+            log.warning(f'Hash library for {hash_type} is not installed. Defaulting to {DEFAULT_HASH_TYPE}. To install it, run: pip install xxhash')
+        else:
+            log.warning(f'Hash type {hash_type} is not recognized. Defaulting to {DEFAULT_HASH_TYPE}. Choose one of: {", ".join(HASHERS)}')
+        hash_type = DEFAULT_HASH_TYPE
+    return hash_type
+
 @fcache
 def get_compresser(compress):
     from .utils.logs import log
     if compress in {False,RAW_NO_COMPRESS}:
         return RAW_NO_COMPRESS
+    if compress == ADAPTIVE_COMPRESS:
+        return ADAPTIVE_COMPRESS
     if compress in {True, None}:
         compress = OPTIMAL_COMPRESS
     if not compress in get_working_compressers():
@@ -21,6 +21,8 @@ OPTIMAL_DATAFRAME_IO_ENGINE = 'feather'
 DEFAULT_DATAFRAME_IO_ENGINE = 'csv'
 OPTIMAL_DATAFRAME_DF_ENGINE = 'pandas'
 DEFAULT_DATAFRAME_DF_ENGINE = 'pandas'
+ARROW_IO_ENGINES = {'arrow', 'feather', 'parquet'}
+DATAFRAME_SCHEMA_KEY = b'hashstash'  # arrow schema metadata marking a typed write
 
 DEFAULT_APPEND_MODE = True
 
@@ -37,7 +39,37 @@ OPTIMAL_COMPRESS = 'lz4'
 DEFAULT_COMPRESS = RAW_NO_COMPRESS
 DEFAULT_B64 = True
 
-COMPRESSERS = ['zlib','lz4','blosc','gzip','bz2']
+COMPRESSERS = ['zlib','lz4','blosc','gzip','bz2','zstd']
+ADAPTIVE_COMPRESS = 'auto'  # per-value codec, recorded in a header on each value
+ADAPTIVE_MIN_SIZE = 256  # values smaller than this stay uncompressed in adaptive stashes
+ADAPTIVE_MIN_DICT_SIZE = 32  # ...or smaller than this, with a trained zstd dictionary
+ADAPTIVE_MIN_RATIO = 0.9  # ...as do values whose probe compresses worse than this
+ADAPTIVE_PROBE_SIZE = 64 * 1024
+DEFAULT_ZSTD_LEVEL = 3
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024  # values larger than this are split over several records
+CHUNKS_DBNAME = "chunks"
+INDEXES_FILENAME = "indexes.sqlite"  # secondary indexes, beside the stash
+ASSEMBLE_BATCH_SIZE = 100_000  # rows per frame yielded by assemble_batches
+ARRAYS_DIRNAME = "arrays"
+EXTERNAL_VALUES_FILENAME = ".external_values"  # marks stashes that have stored values outside their records
+NPY_EXT = ".npy"
+ARRAY_FILE_MIN_SIZE = 64 * 1024  # numpy arrays at least this big are stored as .npy files
+COMPRESS_BLOCK_SIZE = 1024 * 1024  # large values are compressed as independent blocks of this size
+COMPRESS_BLOCK_MIN_BLOCKS = 4  # ...once they span at least this many blocks
+STREAM_CHUNK_SIZE = 1024 * 1024  # bytes per step when streaming values to and from files
+JSON_STREAM_MIN_ITEMS = 256  # lists/dicts this long are walked when streaming json; shorter ones are encoded whole
+PMAP_CHUNK_SECONDS = 0.05  # auto-tuned StashMap chunks aim to take about this long in a worker
+PMAP_MAX_WORKER_POOLS = 4  # process pools kept warm for per-map worker initializers
+PMAP_STREAM_WINDOW = 1000  # runs a streaming map keeps in flight or waiting to be yielded
+DEFAULT_ZSTD_DICT_SIZE = 16 * 1024
+
+HASH_TYPES = Literal[
+    "md5",             # original default, kept for existing stashes
+    "blake2b",         # blake2b with a 16 byte digest
+    "xxh3",            # xxh3-128, fastest (requires xxhash)
+]
+DEFAULT_HASH_TYPE = "md5"
+HASHERS = list(HASH_TYPES.__args__)
 
 # Cache engines
 ENGINE_TYPES = Literal[
@@ -92,8 +124,10 @@ OBJ_SRC_KEY = "__py_src__"
 
 SERIALIZER_TYPES = Literal[
     "hashstash",          # flexible, but not as fast as jsonpickle
+    "hashstash_bin",      # same as hashstash, framed as binary with raw byte payloads
     "jsonpickle",      # pretty flexible json replacement for pickle
     "pickle",          # fastest but not platform independent
+    "pickle5",         # pickle with large buffers stored out of band, read back zero-copy
 ]
 DEFAULT_SERIALIZER = "hashstash"
 OPTIMAL_SERIALIZER = "hashstash"
@@ -1,15 +1,22 @@
 from . import *
 import time
+import itertools
 import threading
 from contextlib import contextmanager
 from multiprocessing import Manager, Lock as mp_Lock
 from multiprocessing.managers import SyncManager
-from ..serializers import serialize, deserialize
+from ..serializers import serialize, deserialize, typed_frames
 
 _manager = Manager()
 _connection_lock = _manager.dict()
+
+# Open handles, keyed by (pid, thread id or None, path). Each entry records
+# the connection, how to close it, its idle timeout, last use and use count.
 _connection_pool = {}
-_last_used = {}
+_pool_lock = threading.RLock()
+_inherited_connections = []
+_reaper_thread = None
+REAPER_INTERVAL = 5  # seconds between sweeps for idle connections
 
 
 def get_manager():
@@ -30,6 +37,151 @@ def get_lock(path):
     return _connection_lock[path]
 
 
+def get_connection_key(path, thread_affinity=False):
+    return (os.getpid(), threading.get_ident() if thread_affinity else None, path)
+
+
+def _checkout_connection(stash):
+    key = get_connection_key(stash.path, stash.thread_affinity)
+    with _pool_lock:
+        entry = _connection_pool.get(key)
+        if entry is None:
+            log.debug(f"Opening {stash.engine} at {stash.path}")
+            entry = _connection_pool[key] = {
+                "conn": stash.get_db(),
+                "close": stash._close_connection,
+                "timeout": stash.CONNECTION_TIMEOUT,
+                "last_used": time.time(),
+                "in_use": 0,
+            }
+            _start_reaper()
+        entry["in_use"] += 1
+    return entry
+
+
+def _checkin_connection(entry):
+    with _pool_lock:
+        entry["in_use"] -= 1
+        entry["last_used"] = time.time()
+
+
+def _close_pool_entry(key):
+    entry = _connection_pool.pop(key, None)
+    if entry is not None:
+        try:
+            entry["close"](entry["conn"])
+        except Exception as e:
+            log.debug(e)
+
+
+def close_connections(path=None):
+    """Close this process's pooled connections, either all or those for one path."""
+    pid = os.getpid()
+    with _pool_lock:
+        for key in list(_connection_pool):
+            if key[0] == pid and (path is None or key[2] == path):
+                _close_pool_entry(key)
+
+
+def reap_idle_connections():
+    """Close this process's pooled connections that are idle past their timeout."""
+    pid = os.getpid()
+    now = time.time()
+    with _pool_lock:
+        for key, entry in list(_connection_pool.items()):
+            if (
+                key[0] == pid
+                and not entry["in_use"]
+                and now - entry["last_used"] > entry["timeout"]
+            ):
+                _close_pool_entry(key)
+
+
+def _reap_forever():
+    while True:
+        time.sleep(REAPER_INTERVAL)
+        try:
+            reap_idle_connections()
+        except Exception as e:
+            log.debug(f"error reaping connections: {e}")
+
+
+def _start_reaper():
+    global _reaper_thread
+    if _reaper_thread is None:
+        _reaper_thread = threading.Thread(
+            target=_reap_forever, name="hashstash-reaper", daemon=True
+        )
+        _reaper_thread.start()
+
+
+def _after_fork_in_child():
+    # Handles inherited from the parent (LMDB environments, sqlite connections)
+    # must not be used or closed here; keep a reference so they are never
+    # garbage-collected either, and start over with an empty pool.
+    global _pool_lock, _reaper_thread
+    _pool_lock = threading.RLock()
+    _inherited_connections.extend(_connection_pool.values())
+    _connection_pool.clear()
+    _reaper_thread = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+atexit.register(close_connections)
+
+
+def warm_connections(*stashes):
+    """Open connections ahead of time, e.g. as a process pool worker initializer."""
+    for stash in stashes:
+        if stash is not None:
+            stash.connect()
+
+
+
+class ChunkedValueReader(io.RawIOBase):
+    """Seekable raw reader over a chunked value, fetching one chunk at a time."""
+
+    def __init__(self, stash, manifest):
+        self.stash = stash
+        self.manifest = manifest
+        self.size = manifest["size"]
+        self.chunk_size = manifest["chunk_size"]
+        self._pos = 0
+        self._chunk_index = None
+        self._chunk = b""
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError(f"Negative seek position {offset}")
+        self._pos = offset
+        return offset
+
+    def readinto(self, b):
+        if self._pos >= self.size:
+            return 0
+        i, start = divmod(self._pos, self.chunk_size)
+        if i != self._chunk_index:
+            self._chunk = self.stash._read_chunk(self.manifest, i)
+            self._chunk_index = i
+        n = min(len(b), len(self._chunk) - start)
+        b[:n] = self._chunk[start : start + n]
+        self._pos += n
+        return n
+
 
 class BaseHashStash(MutableMapping):
     engine = "base"
@@ -52,6 +204,10 @@ class BaseHashStash(MutableMapping):
         "serializer",
         "compress",
         "b64",
+        "compress_level",
+        "adaptive",
+        "hash_type",
+        "chunk_size",
         "append_mode",
         "is_function_stash",
         "is_tmp",
@@ -63,6 +219,11 @@ class BaseHashStash(MutableMapping):
     is_function_stash = False
     needs_lock = True
     needs_reconnect = False
+    thread_affinity = False  # True if handles can't be shared across threads
+    stream_values = False  # True if values are streamed to and from files in chunks
+    chunk_size = DEFAULT_CHUNK_SIZE  # 0 or None to never split values over several records
+    array_files = True  # large numpy arrays are saved as .npy files beside the stash
+    concurrent_writes = True  # False if writes from several threads at once aren't safe
 
     @log.debug
     def __init__(
@@ -72,6 +233,10 @@ class BaseHashStash(MutableMapping):
         compress: str = None,
         b64: bool = None,
         serializer: SERIALIZER_TYPES = None,
+        hash_type: HASH_TYPES = None,
+        compress_level: int = None,
+        adaptive: bool = None,
+        chunk_size: int = None,
         parent: "BaseHashStash" = None,
         children: List["BaseHashStash"] = None,
         is_function_stash=None,
@@ -95,9 +260,15 @@ class BaseHashStash(MutableMapping):
             compress if compress is not None else config.compress
         )
         self.b64 = b64 if b64 is not None else config.b64
+        self.compress_level = compress_level
+        # adaptive stashes pick a codec per value; an existing stash opened with
+        # adaptive=True keeps its folder and reads header-less values as before
+        self.adaptive = bool(adaptive) or self.compress == ADAPTIVE_COMPRESS
+        self.chunk_size = chunk_size if chunk_size is not None else self.chunk_size
         if self.compress and (self.string_keys or self.string_values):
             self.b64 = True
         self.serializer = serializer if serializer is not None else config.serializer
+        self.hash_type = get_hasher(hash_type)
         self.dbname = dbname if dbname is not None else self.dbname
         self.parent = parent
         self.children = [] if not children else children
@@ -112,13 +283,19 @@ class BaseHashStash(MutableMapping):
         # get folders
         folders = [self.root_dir]
         if self.dbname: folders.append(self.dbname)
-        param_folder_name = f"{self.engine}.{self.serializer}.{get_encoding_str(self.compress, self.b64)}"
-        folders.append(param_folder_name)
+        folders.append(self.get_param_folder_name())
         self.path_dirname = os.path.join(*folders)
         self.path = os.path.join(self.path_dirname, self.filename)
         if clear:
             self.clear()
 
+    def get_param_folder_name(self, hash_type=None):
+        hash_type = self.hash_type if hash_type is None else hash_type
+        param_folder_name = f"{self.engine}.{self.serializer}.{get_encoding_str(self.compress, self.b64)}"
+        if hash_type != DEFAULT_HASH_TYPE:
+            param_folder_name += f".{hash_type}"
+        return param_folder_name
+
     @staticmethod
     def _remove_dir(dir_path):
         if os.path.exists(dir_path):
@@ -207,49 +384,46 @@ class BaseHashStash(MutableMapping):
     @contextmanager
     @retry_patiently()
     def get_connection(self):
-        global _connection_pool, _last_used
-
         if self.needs_reconnect:
             with self.get_db() as db:
                 yield db
         else:
-            if not self.path in _connection_pool:
-                log.debug(f"Opening {self.engine} at {self.path}")
-                conn = self.get_db()
-                _connection_pool[self.path] = conn
-            else:
-                conn = _connection_pool[self.path]
-                _last_used[self.path] = time.time()
+            entry = _checkout_connection(self)
             try:
-                yield conn
+                yield entry["conn"]
             finally:
-                self._cleanup_connections()
-
-    def _cleanup_connections(self):
-        global _connection_pool, _last_used
-        current_time = time.time()
-        for path, last_used in list(_last_used.items()):
-            if current_time - last_used > self.CONNECTION_TIMEOUT:
-                self._close_connection_path(path)
+                _checkin_connection(entry)
 
     def close(self):
         self._close_connection_path(self.path)
 
-    def _close_connection_path(self, path):
-        with self:
-            conn = _connection_pool.pop(path, None)
-            if conn is not None:
-                self._close_connection(conn)
-                _last_used.pop(path, None)
+    @classmethod
+    def _close_connection_path(cls, path):
+        close_connections(path)
 
     def connect(self):
         with self.get_connection() as db:
             return True
 
+    @contextmanager
+    def batch(self):
+        """
+        Group a run of writes into one durable unit.
+
+        Engines that commit per operation override this to commit everything
+        at once when the block exits, and to roll back on exceptions where the
+        engine supports it. The base implementation simply yields the stash.
+        """
+        yield self
+
+    def transaction(self):
+        return self.batch()
+
     def query(self, test_func_key=bool, test_func_val=bool, return_vals=None, **kwargs):
         return_vals = return_vals or test_func_val is not bool
+        # keyword criteria narrow the keys first, through the indexes where there are any
         for k in progress_bar(
-            self.keys(),
+            self.find(**kwargs) if kwargs else self.keys(),
             total=len(self),
             desc=f"querying by key = {test_func_key.__name__} and value = {test_func_val.__name__}",
         ):
@@ -261,29 +435,6 @@ class BaseHashStash(MutableMapping):
                     if test_func_val(v):
                         yield (k, v)
 
-    @classmethod
-    def _cleanup_connections(cls):
-        current_time = time.time()
-        for path, last_used in list(_last_used.items()):
-            if current_time - last_used > cls.CONNECTION_TIMEOUT:
-                cls._close_connection_path(path)
-
-    def close(self):
-        self._close_connection_path(self.path)
-
-    @classmethod
-    def _close_connection_path(cls, path):
-        global _connection_pool
-        conn = _connection_pool.get(path)
-        if conn is not None:
-            with get_lock(path):
-                try:
-                    cls._close_connection(conn)
-                except Exception as e:
-                    log.debug(e)
-                _connection_pool.pop(path, None)
-                _last_used.pop(path, None)
-
     @staticmethod
     def _close_connection(connection):
         # Default implementation, can be overridden by subclasses
@@ -381,6 +532,20 @@ class BaseHashStash(MutableMapping):
         value = values[-1] if values else default
         return self.serialize(value) if as_string else value
 
+    @log.debug
+    def get_many(self, unencoded_keys, default=None):
+        """Get the latest value of each key, reading them all in one pass."""
+        encoded_keys = [self.encode_key(key) for key in unencoded_keys]
+        out = []
+        for encoded_value in self._get_many(encoded_keys):
+            values = self.decode_value(encoded_value) if encoded_value is not None else None
+            out.append(values[-1] if values else default)
+        return out
+
+    def _get_many(self, encoded_keys):
+        with self as cache, cache.db as db:
+            return [db.get(encoded_key) for encoded_key in encoded_keys]
+
     @log.debug
     def get_all(
         self,
@@ -388,6 +553,7 @@ class BaseHashStash(MutableMapping):
         default: Any = None,
         with_metadata: bool = None,
         all_results: bool = True,
+        mmap: bool = False,
         **kwargs,
     ) -> Any:
         encoded_key = self.encode_key(unencoded_key)
@@ -395,7 +561,7 @@ class BaseHashStash(MutableMapping):
         if encoded_value is None:
             return default
 
-        values = self.decode_value(encoded_value)
+        values = self.decode_value(encoded_value, mmap=mmap)
         if with_metadata:
             values = [
                 {"_version": vi + 1, "_value": value} for vi, value in enumerate(values)
@@ -414,8 +580,16 @@ class BaseHashStash(MutableMapping):
             append=append,
         )
 
-        encoded_value = self.encode_value(new_unencoded_value)
+        encoded_value, _ = self._encode_record(new_unencoded_value)
+        # chunks or files of a value being replaced go once the new record is in place,
+        # whether or not the new value is stored outside its record too
+        old_manifest = (
+            self._read_manifest(self._get(encoded_key)) if self._may_have_external_values else None
+        )
         self._set(encoded_key, encoded_value)
+        if old_manifest is not None:
+            self._del_external(old_manifest)
+        self._update_indexes(unencoded_key, unencoded_value, encoded_key)
 
     @log.debug
     def run(
@@ -424,10 +598,14 @@ class BaseHashStash(MutableMapping):
         *args,
         _force=False,
         _store_args=True,
+        _fstash=None,
         **kwargs,
     ):
+        # _fstash: func's results stash, when the caller has already attached it
         fstash = (
             self.attach_func(func)
+            if _fstash is None
+            else _fstash
             # if getattr(func, "stash", None) is None
             # else func.stash
         )
@@ -484,6 +662,8 @@ class BaseHashStash(MutableMapping):
         precompute=True,
         stash_runs=True,
         stash_map=True,
+        prewarm=False,
+        chunksize=None,
         _force=False,
         **common_kwargs,
     ):
@@ -509,6 +689,8 @@ class BaseHashStash(MutableMapping):
                 precompute=precompute,
                 stash_runs=stash_runs,
                 stash_map=stash_map,
+                prewarm=prewarm,
+                chunksize=chunksize,
                 _force=_force,
                 _stash_key=key,
                 **common_kwargs,
@@ -531,6 +713,14 @@ class BaseHashStash(MutableMapping):
 
             return pmap
 
+    def map_stream(self, func, objects=None, options=None, **kwargs):
+        """
+        Like map, but pulls from objects and options lazily and yields results as
+        they finish, holding only a bounded window of runs at once (see pmap_stream).
+        Each result is stashed as it's computed; the map as a whole is not.
+        """
+        return pmap_stream(func, objects=objects, options=options, stash=self, **kwargs)
+
     def attach_func(self, func):
         funcx = unwrap_func(func)
         local_stash = self.sub_function_results(funcx)
@@ -544,7 +734,7 @@ class BaseHashStash(MutableMapping):
         #     "kwargs": kwargs,
         # }
         key = (args,kwargs)
-        return encode_hash(self.serialize(key)) if not store_args else key
+        return self.hash(self.serialize(key)) if not store_args else key
 
     @log.debug
     def new_unencoded_value(
@@ -584,26 +774,167 @@ class BaseHashStash(MutableMapping):
     def has(self, unencoded_key: Any) -> bool:
         return self._has(self.encode_key(unencoded_key))
 
+    @property
+    def _key_compress(self):
+        # compress='auto' stashes leave keys uncompressed: they're small, and
+        # their encoding has to stay the same for lookups
+        return RAW_NO_COMPRESS if self.compress == ADAPTIVE_COMPRESS else self.compress
+
     @log.debug
     def encode_key(self, unencoded_key: Any) -> Union[str, bytes]:
         return self.encode(
             self.serialize(unencoded_key),
             as_string=self.string_keys,
-            # compress=False
+            compress=self._key_compress,
         )
 
+    def serialize_value(self, unencoded_value: Any) -> Union[str, bytes]:
+        # DataFrames in values keep their native dtypes; keys keep the string cast
+        with typed_frames():
+            return self.serialize(unencoded_value)
+
     @log.debug
     def encode_value(self, unencoded_value: Any) -> Union[str, bytes]:
+        return self._encode_serialized(self.serialize_value(unencoded_value))
+
+    def _encode_serialized(self, serialized: Union[str, bytes]) -> Union[str, bytes]:
+        if self.adaptive:
+            return self._encode_serialized_adaptive(serialized)
+        return self.encode(
+            serialized,
+            as_string=self.string_values,
+            **self._value_compress_opts(),
+        )
+
+    def _encode_serialized_adaptive(self, serialized: Union[str, bytes]) -> Union[str, bytes]:
+        data_b = serialized.encode() if isinstance(serialized, str) else bytes(serialized)
+        zstd_dict = self.zstd_dicts.latest if "zstd" in get_working_compressers() else None
+        codec = choose_codec(data_b, zstd_dict=zstd_dict)
+        if codec != RAW_NO_COMPRESS:
+            opts = {"level": self.compress_level, "zstd_dict": zstd_dict} if codec == "zstd" else {}
+            data_b = encode_compressed(data_b, codec, **opts)
         return self.encode(
-            self.serialize(unencoded_value),
+            encode_value_header(self.serializer, codec) + data_b,
+            compress=RAW_NO_COMPRESS,
             as_string=self.string_values,
         )
 
+    def _value_decompress_opts(self):
+        return {"zstd_dicts": self.zstd_dicts} if self.compress == "zstd" else {}
+
+    def _value_compress_opts(self):
+        # keys never use these: their encoding must not depend on level or dictionary
+        if self.compress != "zstd":
+            return {}
+        return {"level": self.compress_level, "zstd_dict": self.zstd_dicts.latest}
+
+    ## secondary indexes
+
+    @property
+    def indexes(self):
+        return StashIndexes(os.path.join(self.path_dirname, INDEXES_FILENAME))
+
+    @log.debug
+    def create_index(self, field):
+        """
+        Index a field so find() and query() can look it up without a full scan.
+
+        Fields are named as in assemble_df: key fields ("_key"; "_arg1" or "_lang"
+        for a function's arguments) or value fields, dotted for nested dicts
+        ("score", "meta.lang"; "_value" for values that are not dicts). The index
+        is filled in from the stash now and kept up to date on set and delete.
+        """
+        records = (
+            (self.encode_key(key), self._index_record(key, self.get(key)))
+            for key in self.keys()
+        )
+        self.indexes.add_field(field, records)
+        return self
+
+    @log.debug
+    def drop_index(self, field):
+        self.indexes.drop_field(field)
+        return self
+
+    @log.debug
+    def find(self, criteria=None, return_vals=False, **kwargs):
+        """
+        Yield the keys (or (key, value) pairs) whose fields meet every criterion.
+
+        Criteria are field=value or field__op=value, op being one of eq, ne, gt,
+        gte, lt, lte or in; dotted field names can be passed in the criteria dict.
+        Indexed fields are looked up in the index, and keys come back in the order
+        of the first one's values; any others are checked against the values of
+        the keys found, which means a full scan if none is indexed.
+        """
+        criteria = parse_criteria({**(criteria or {}), **kwargs})
+        indexes = self.indexes
+        indexed = set(indexes.fields)
+        encoded_keys, rest = None, []
+        for field, op, value in criteria:
+            if field in indexed and value is not None:
+                found = indexes.lookup(field, op, value)
+                if encoded_keys is not None:
+                    found = set(found)
+                    found = [k for k in encoded_keys if k in found]
+                encoded_keys = found
+            else:
+                rest.append((field, op, value))
+
+        keys = (
+            self.keys()
+            if encoded_keys is None
+            else (self.decode_key(k) for k in encoded_keys)
+        )
+        for key in keys:
+            value = self.get(key) if rest or return_vals else None
+            if rest and not match_criteria(self._index_record(key, value), rest):
+                continue
+            yield (key, value) if return_vals else key
+
+    def _index_record(self, key, value):
+        # {field: [indexable values]} for a key and its latest value
+        rows = [self._key_fields(key)]
+        if not is_dataframe(value):
+            rows.extend(flatten_ld(value))
+        record = {}
+        for row in rows:
+            for field, v in row.items():
+                if is_indexable(v):
+                    record.setdefault(field, []).append(v)
+        return record
+
+    def _update_indexes(self, unencoded_key, unencoded_value, encoded_key=None):
+        indexes = self.indexes
+        if indexes.exists:
+            if encoded_key is None:
+                encoded_key = self.encode_key(unencoded_key)
+            indexes.update(encoded_key, self._index_record(unencoded_key, unencoded_value))
+
+    @cached_property
+    def zstd_dicts(self):
+        return ZstdDictionaries(os.path.join(self.path_dirname, "zstd_dicts"))
+
+    @log.debug
+    def train_zstd_dict(self, num_samples=1000, dict_size=DEFAULT_ZSTD_DICT_SIZE):
+        """
+        Train a new zstd dictionary version on a sample of this stash's values.
+
+        Only values written afterwards use it; existing values name the
+        dictionary they were compressed with and stay readable.
+        """
+        values = [
+            self._decode_serialized(v)[1]
+            for v in itertools.islice(self._values(), num_samples)
+            if not self._uses_manifests or self._read_manifest(v) is None
+        ]
+        return self.zstd_dicts.train(values, dict_size=dict_size, level=self.compress_level)
+
     @log.debug
     def decode_key(self, encoded_key: Any, as_string=False) -> Union[str, bytes]:
         decoded_key = self.decode(
             encoded_key,
-            # compress=False,
+            compress=self._key_compress,
         )
         return (
             self.deserialize(decoded_key)
@@ -616,16 +947,272 @@ class BaseHashStash(MutableMapping):
         self,
         encoded_value: Any,
         as_string=False,
+        mmap=False,
     ) -> Union[str, bytes, dict, list]:
         log.debug("Decoding value")
-        decoded_value = self.decode(encoded_value)
+        manifest = self._read_manifest(encoded_value) if self._uses_manifests else None
+        if manifest is None:
+            serializer, decoded_value = self._decode_serialized(encoded_value)
+        elif "array" in manifest:
+            return [self._load_array_file(manifest, mmap=mmap)]
+        else:
+            decoded_value = b"".join(self._read_chunks(manifest))
+            if manifest["raw"]:
+                # a lone bytes value, chunked as is
+                return [decoded_value] if not as_string else decoded_value.decode("utf-8")
+            serializer = manifest["serializer"]
         log.debug(f"Decoded value of {len(decoded_value):,}B")
         return (
-            self.deserialize(decoded_value)
+            deserialize(decoded_value, serializer=serializer)
             if not as_string
-            else decoded_value.decode("utf-8")
+            else bytes(decoded_value).decode("utf-8")
         )
 
+    def _decode_serialized(self, encoded_value: Any):
+        if not self.adaptive:
+            return self.serializer, self.decode(encoded_value, **self._value_decompress_opts())
+        data_b = self.decode(encoded_value, compress=RAW_NO_COMPRESS)
+        header = decode_value_header(data_b)
+        if header is None:
+            # written before the stash went adaptive, with its own compression
+            if self.compress == ADAPTIVE_COMPRESS:
+                return self.serializer, data_b
+            return self.serializer, decode_compressed(data_b, self.compress, **self._value_decompress_opts())
+        serializer, codec, _flags, offset = header
+        # pickle5 can keep its buffers as views into the stored bytes
+        payload = memoryview(data_b)[offset:] if serializer == "pickle5" else data_b[offset:]
+        if codec != RAW_NO_COMPRESS:
+            opts = {"zstd_dicts": self.zstd_dicts} if codec == "zstd" else {}
+            payload = decode_compressed(payload, codec, **opts)
+        return serializer, payload
+
+    @property
+    def _streams_values(self):
+        # adaptive values pick their codec from the whole payload
+        return self.stream_values and not self.adaptive
+
+    def value_writer(self, fileobj):
+        """File-like object encoding values written to it into fileobj, chunk by chunk."""
+        return StreamEncoder(fileobj, b64=self.b64, compress=self.compress, **self._value_compress_opts())
+
+    def value_reader(self, fileobj):
+        """Buffered file-like object reading a value encoded in fileobj, chunk by chunk."""
+        return io.BufferedReader(
+            StreamDecoder(fileobj, b64=self.b64, compress=self.compress, **self._value_decompress_opts()),
+            buffer_size=STREAM_CHUNK_SIZE,
+        )
+
+    def serialize_to(self, unencoded_value: Any, writer) -> None:
+        """
+        Serialize a value into a value_writer. pickle and the hashstash json
+        serializer stream straight into it; other serializers build the
+        serialized value first and hand it over in chunks.
+        """
+        if self.serializer == "pickle":
+            pickle.dump(unencoded_value, writer, protocol=pickle.HIGHEST_PROTOCOL)
+            return
+        if self.serializer == "hashstash":
+            with typed_frames():
+                serialize_custom_to(unencoded_value, writer)
+            return
+        data = self.serialize_value(unencoded_value)
+        data = memoryview(data.encode() if isinstance(data, str) else data)
+        for i in range(0, len(data), STREAM_CHUNK_SIZE):
+            writer.write(data[i : i + STREAM_CHUNK_SIZE])
+
+    def deserialize_from(self, reader) -> Any:
+        if self.serializer == "pickle":
+            return pickle.load(reader)
+        return self.deserialize(reader.read())
+
+    ## values stored outside their record: chunks and array files
+
+    @property
+    def _chunks_values(self):
+        # streamed values already go to files of their own
+        return bool(self.chunk_size) and not self.stream_values
+
+    @property
+    def _uses_manifests(self):
+        # streamed values keep arrays as value files of their own
+        return self._chunks_values or (self.array_files and not self.stream_values)
+
+    def _encode_record(self, unencoded_value: Any):
+        """
+        Encode a record, returning (encoded value, False); or store it outside
+        the record and return (encoded manifest, True).
+        """
+        if (
+            self.array_files
+            and isinstance(unencoded_value, list)
+            and len(unencoded_value) == 1
+            and is_large_array(unencoded_value[0])
+        ):
+            return self._set_array_file(unencoded_value[0]), True
+        if self._chunks_values:
+            return self._encode_value_or_chunks(unencoded_value)
+        return self.encode_value(unencoded_value), False
+
+    def _encode_manifest(self, manifest: dict) -> Union[str, bytes]:
+        self._mark_external_values()
+        return self.encode(
+            CHUNK_MANIFEST_MAGIC + json.dumps(manifest).encode(),
+            compress=RAW_NO_COMPRESS,
+            as_string=self.string_values,
+        )
+
+    @property
+    def path_external_marker(self):
+        return os.path.join(self.path_dirname, EXTERNAL_VALUES_FILENAME)
+
+    def _mark_external_values(self):
+        if not getattr(self, "_external_marked", False):
+            os.makedirs(self.path_dirname, exist_ok=True)
+            open(self.path_external_marker, "a").close()
+            self._external_marked = True
+
+    @property
+    def _may_have_external_values(self):
+        # a stat per write instead of reading back every value being replaced;
+        # the folders cover stashes written before the marker was
+        return self._uses_manifests and any(
+            os.path.exists(path)
+            for path in (
+                self.path_external_marker,
+                self.path_arrays,
+                os.path.join(self.path_dirname, CHUNKS_DBNAME),
+            )
+        )
+
+    def _del_external(self, manifest):
+        if "array" in manifest:
+            try:
+                os.remove(os.path.join(self.path_arrays, manifest["array"]))
+            except FileNotFoundError:
+                pass
+        else:
+            self._del_chunks(manifest)
+
+    @property
+    def path_arrays(self):
+        return os.path.join(self.path_dirname, ARRAYS_DIRNAME)
+
+    def _set_array_file(self, arr) -> Union[str, bytes]:
+        """Save an array as a .npy file beside the stash and return the encoded manifest."""
+        manifest = {"array": uuid.uuid4().hex + NPY_EXT}
+        save_npy(os.path.join(self.path_arrays, manifest["array"]), arr)
+        return self._encode_manifest(manifest)
+
+    def _load_array_file(self, manifest, mmap=False):
+        return load_npy(os.path.join(self.path_arrays, manifest["array"]), mmap=mmap)
+
+    @cached_property
+    def chunks(self):
+        """Sub-stash holding the chunks of values larger than chunk_size."""
+        return self.sub(dbname=CHUNKS_DBNAME, chunk_size=0)
+
+    def _encode_value_or_chunks(self, unencoded_value: Any):
+        """
+        Encode a value, returning (encoded value, False); or, if it is larger
+        than chunk_size, write it out in chunks and return (encoded manifest, True).
+        """
+        # a lone bytes value is chunked as is, so open() can seek within it
+        if (
+            isinstance(unencoded_value, list)
+            and len(unencoded_value) == 1
+            and isinstance(unencoded_value[0], (bytes, bytearray))
+            and len(unencoded_value[0]) > self.chunk_size
+        ):
+            return self._set_chunks(unencoded_value[0], raw=True), True
+        serialized = self.serialize_value(unencoded_value)
+        if len(serialized) <= self.chunk_size:
+            return self._encode_serialized(serialized), False
+        if isinstance(serialized, str):
+            serialized = serialized.encode()
+        return self._set_chunks(serialized), True
+
+    def _set_chunks(self, data: bytes, raw=False) -> Union[str, bytes]:
+        """Write data to the chunk stash in parallel and return the encoded manifest."""
+        data = memoryview(data).cast("B")
+        manifest = {
+            "id": uuid.uuid4().hex,
+            "size": data.nbytes,
+            "chunk_size": self.chunk_size,
+            "num_chunks": -(-data.nbytes // self.chunk_size),
+            "serializer": self.serializer,
+            "raw": raw,
+        }
+
+        def set_chunk(i):
+            piece = data[i * self.chunk_size : (i + 1) * self.chunk_size]
+            self.chunks._set(self._chunk_key(manifest, i), self._encode_serialized(bytes(piece)))
+
+        if self.concurrent_writes:
+            self._map_chunks(set_chunk, manifest)
+        else:
+            with self.chunks.batch():
+                for i in range(manifest["num_chunks"]):
+                    set_chunk(i)
+        return self._encode_manifest(manifest)
+
+    def _read_manifest(self, encoded_value: Any):
+        """Return the manifest if encoded_value stands in for a chunked value, else None."""
+        if encoded_value is None:
+            return None
+        head = encoded_value[:8]
+        head = head.encode() if isinstance(head, str) else bytes(head)
+        if self.b64:
+            head = decode_b64(head)
+        if head[:4] != CHUNK_MANIFEST_MAGIC:
+            return None
+        return json.loads(bytes(self.decode(encoded_value, compress=RAW_NO_COMPRESS)[4:]))
+
+    def _chunk_key(self, manifest, i):
+        return self.chunks.encode_key(f"{manifest['id']}.{i}")
+
+    def _read_chunk(self, manifest, i):
+        encoded_chunk = self.chunks._get(self._chunk_key(manifest, i))
+        if encoded_chunk is None:
+            raise KeyError(f"Chunk {i} of chunked value {manifest['id']} is missing")
+        return self._decode_serialized(encoded_chunk)[1]
+
+    def _read_chunks(self, manifest):
+        return self._map_chunks(lambda i: self._read_chunk(manifest, i), manifest)
+
+    def _map_chunks(self, func, manifest):
+        num_chunks = manifest["num_chunks"]
+        if num_chunks == 1:
+            return [func(0)]
+        with ThreadPoolExecutor(max_workers=min(num_chunks, get_num_proc())) as executor:
+            return list(executor.map(func, range(num_chunks)))
+
+    def _del_chunks(self, manifest):
+        for i in range(manifest["num_chunks"]):
+            chunk_key = self._chunk_key(manifest, i)
+            if self.chunks._has(chunk_key):
+                self.chunks._del(chunk_key)
+
+    @log.debug
+    def open(self, unencoded_key: Any):
+        """
+        Open the latest value at a key as a seekable binary file.
+
+        A bytes value reads as itself, anything else as its serialized form.
+        Chunked bytes values fetch their chunks as they are read, so a slice
+        of a large value can be read without loading the rest.
+        """
+        if self._chunks_values:
+            manifest = self._read_manifest(self._get(self.encode_key(unencoded_key)))
+            if manifest is not None and manifest["raw"]:
+                return io.BufferedReader(ChunkedValueReader(self, manifest), buffer_size=STREAM_CHUNK_SIZE)
+        if not self.has(unencoded_key):
+            raise KeyError(unencoded_key)
+        value = self.get(unencoded_key)
+        if not isinstance(value, (bytes, bytearray)):
+            value = self.serialize_value(value)
+            value = value.encode() if isinstance(value, str) else value
+        return io.BytesIO(value)
+
     @log.debug
     def _has(self, encoded_key: Union[str, bytes]):
         with self as cache, cache.db as db:
@@ -638,6 +1225,7 @@ class BaseHashStash(MutableMapping):
         
         self.close()
         self._remove_dir(self.path_dirname)
+        self.__dict__.pop("zstd_dicts", None)  # removed along with the data
         return self
 
     @log.debug
@@ -649,7 +1237,12 @@ class BaseHashStash(MutableMapping):
     def __delitem__(self, unencoded_key: str) -> None:
         if not self.has(unencoded_key):
             raise KeyError(unencoded_key)
-        self._del(self.encode_key(unencoded_key))
+        encoded_key = self.encode_key(unencoded_key)
+        manifest = self._read_manifest(self._get(encoded_key)) if self._uses_manifests else None
+        self._del(encoded_key)
+        if manifest is not None:
+            self._del_external(manifest)
+        self.indexes.remove(encoded_key)
 
     @log.debug
     def _del(self, encoded_key: Union[str, bytes]) -> None:
@@ -758,7 +1351,7 @@ class BaseHashStash(MutableMapping):
 
     @log.debug
     def hash(self, data: bytes) -> str:
-        return encode_hash(data)
+        return encode_hash(data, self.hash_type)
 
     @property
     def stashed_result(self):
@@ -792,9 +1385,113 @@ class BaseHashStash(MutableMapping):
             'dbname': dbname
         }
         new_instance = self.__class__(**kwargs)
+        # reuse a sub-stash opened with the same settings, so repeated lookups
+        # (attach_func on every run, say) don't pile up children
+        settings = new_instance.to_dict()
+        for child in self.children:
+            if type(child) is type(new_instance) and child.to_dict() == settings:
+                return child
         self.children.append(new_instance)
         return new_instance
 
+    @log.debug
+    def rehash(self, hash_type: HASH_TYPES, num_proc=None) -> "BaseHashStash":
+        """
+        Copy this stash and the stashes nested in it (function results and the
+        like) into sibling stashes keyed with hash_type, and return the copy.
+
+        Records are copied still encoded, so only the key hashes are recomputed;
+        writes are spread over num_proc threads. The original is left in place.
+        A nested stash rehashed on its own goes where its parent's copy looks for
+        it. Function results stored under hashed keys (store_args=False) can't
+        be rekeyed, since their arguments aren't kept: they raise ValueError,
+        before anything is copied.
+        """
+        hash_type = get_hasher(hash_type)
+        new_stash = self.__class__(
+            **{**self.to_dict(), "hash_type": hash_type, "root_dir": self._rehashed_root_dir(hash_type)}
+        )
+        if new_stash.path == self.path:
+            return new_stash
+        pairs = list(self._rehash_pairs(new_stash))
+        for src, _ in pairs:
+            src._check_rekeyable()
+        num_proc = get_num_proc(num_proc)
+        with ThreadPoolExecutor(max_workers=num_proc) as executor:
+            futures = set()
+            for src, dest in pairs:
+                if os.path.isdir(src.path_arrays):
+                    shutil.copytree(src.path_arrays, dest.path_arrays, dirs_exist_ok=True)
+                if src._may_have_external_values:
+                    dest._mark_external_values()
+                for encoded_key, record in src._raw_records():
+                    if len(futures) >= num_proc * 2:
+                        done, futures = wait(futures, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            future.result()
+                    futures.add(executor.submit(dest._put_raw_record, encoded_key, record))
+            for future in futures:
+                future.result()
+        return new_stash
+
+    def _rehashed_root_dir(self, hash_type):
+        # a nested stash lives in its parent's folder, which is named for the hash type too
+        parent_dirname, parent_folder = os.path.split(self.root_dir)
+        if parent_folder != self.get_param_folder_name(self.hash_type) or self.hash_type == hash_type:
+            return self.root_dir
+        return os.path.join(parent_dirname, self.get_param_folder_name(hash_type))
+
+    def _rehash_pairs(self, new_stash):
+        """Yield (stash, its rehashed copy) for this stash, its chunks and its nested stashes."""
+        yield self, new_stash
+        if self._chunks_values:
+            yield self.chunks, new_stash.chunks
+        for dbname, is_function_stash in self._nested_stashes().items():
+            src = self.sub(dbname=dbname, is_function_stash=is_function_stash)
+            dest = new_stash.sub(dbname=dbname, is_function_stash=is_function_stash)
+            yield from src._rehash_pairs(dest)
+
+    def _nested_stashes(self):
+        """{dbname: is function stash} for the stashes nested directly in this one."""
+        nested = {}
+        for child in self.children:
+            if child.root_dir == self.path_dirname:
+                nested[child.dbname] = child.is_function_stash
+        # on disk, a nested stash's folder is named like this one's
+        param_folder = os.path.basename(self.path_dirname)
+        skip = {self.path, self.path_arrays}
+        for dirpath, dirnames, _ in os.walk(self.path_dirname):
+            for dirname in list(dirnames):
+                path = os.path.join(dirpath, dirname)
+                if path in skip or dirname == param_folder:
+                    dirnames.remove(dirname)
+                if dirname == param_folder and dirpath != self.path_dirname:
+                    dbname = os.path.relpath(dirpath, self.path_dirname)
+                    nested.setdefault(dbname, dbname.split(os.sep)[0] == "stashed_result")
+        return {
+            dbname: is_function_stash
+            for dbname, is_function_stash in nested.items()
+            if dbname != CHUNKS_DBNAME and dbname.split("/")[0] != "tmp"
+        }
+
+    def _check_rekeyable(self):
+        if not self.is_function_stash:
+            return
+        hash_len = len(self.hash(b""))
+        for key in self.keys():
+            if isinstance(key, str) and len(key) == hash_len and all(c in "0123456789abcdef" for c in key):
+                raise ValueError(
+                    f"{self} has results stored under hashed keys (store_args=False), "
+                    "which can't be rehashed without their arguments"
+                )
+
+    def _raw_records(self):
+        """Yield (encoded_key, record) pairs for _put_raw_record on a stash with other settings."""
+        yield from self._items()
+
+    def _put_raw_record(self, encoded_key, record):
+        self._set(encoded_key, record)
+
     @contextmanager
     def tmp(self, use_tempfile=True, dbname=None, **kwargs):
         kwargs = {
@@ -917,6 +1614,82 @@ class BaseHashStash(MutableMapping):
                 ld.append({**key_d, **value_d})
         return filter_ld(ld, no_nan=False, no_meta=not with_metadata)
 
+    def _key_fields(self, key):
+        if self.is_function_stash:
+            args,kwargs = key
+            key_d = {f'_arg{n+1}':arg for n,arg in enumerate(args)}
+            key_d.update({f'_{k}':v for k,v in kwargs.items()})
+            return key_d
+        return {"_key": key} if not isinstance(key, dict) else key
+
+    def assemble_batches(
+        self,
+        all_results=None,
+        with_metadata=None,
+        batch_size=ASSEMBLE_BATCH_SIZE,
+        progress=False,
+        keys=None,
+    ):
+        """
+        Yield the stash's contents as pandas DataFrames, with the same rows and
+        columns as assemble_ld but built column by column.
+
+        Non-DataFrame values are gathered into frames of at most batch_size rows;
+        DataFrame values are yielded whole with their key columns added, never
+        exploded into rows. Only one batch is held at a time, so the stream can be
+        written out (e.g. to parquet) without holding the whole stash in memory.
+        Passing keys assembles only those keys' values.
+        """
+        def finish(df):
+            if not with_metadata:
+                df = df.drop(columns=[c for c in df.columns if is_meta_col(c)])
+            return df
+
+        batch = ColumnBatch()
+        if keys is None:
+            iterr = self.items(
+                all_results=self._all_results(all_results),
+                with_metadata=True,
+            )
+        else:
+            iterr = (
+                (key, value_d)
+                for key in keys
+                for value_d in self.get_all(
+                    key,
+                    all_results=self._all_results(all_results),
+                    with_metadata=True,
+                    default=[],
+                )
+            )
+        if progress:
+            iterr = progress_bar(iterr, desc='Assembling cached contents')
+        for key, value_d in iterr:
+            value = value_d.pop("_value")
+            fixed_d = {**self._key_fields(key), **value_d}
+
+            if is_dataframe(value):
+                if len(batch):
+                    yield finish(batch.to_pandas())
+                    batch = ColumnBatch()
+                if get_dataframe_engine(value) != "pandas":
+                    value = value.to_pandas()
+                df, _ = reset_index_misc(value)
+                df = df.copy(deep=False)
+                for i, (k, v) in enumerate(kv for kv in fixed_d.items() if kv[0] not in df.columns):
+                    df.insert(i, k, [v] * len(df))
+                yield finish(df)
+                continue
+
+            for value_d2 in flatten_ld(value):
+                batch.append({**fixed_d, **value_d2})
+            if len(batch) >= batch_size:
+                yield finish(batch.to_pandas())
+                batch = ColumnBatch()
+
+        if len(batch):
+            yield finish(batch.to_pandas())
+
     def assemble_df(
         self,
         index_cols=None,
@@ -926,16 +1699,40 @@ class BaseHashStash(MutableMapping):
         df_engine="pandas",
         **kwargs,
     ):
-        ld = self.assemble_ld(
-            all_results=all_results,
-            with_metadata=with_metadata,
-            **kwargs,
+        import pandas as pd
+
+        dfs = list(
+            self.assemble_batches(
+                all_results=all_results,
+                with_metadata=with_metadata,
+                **kwargs,
+            )
         )
-        if not ld:
+        if not dfs:
             return MetaDataFrame([], df_engine=df_engine)
-        mdf = MetaDataFrame(ld, df_engine=df_engine)
+        df = pd.concat(dfs, ignore_index=True, sort=False) if len(dfs) > 1 else dfs[0]
+        mdf = MetaDataFrame(df, df_engine=df_engine)
         return mdf.set_index()
 
+    @log.debug
+    def sql(self, query, criteria=None, engine=None, df_engine="pandas", **kwargs):
+        """
+        Run a SQL query over the stash's contents, as the table "stash".
+
+        The table has the rows and columns of assemble_df(with_metadata=True): key
+        fields (_key; _arg1, _lang, ... for function results), _version and the
+        value fields, e.g. SELECT _lang, avg(score) FROM stash GROUP BY _lang.
+        Runs on duckdb if installed, otherwise on a temporary sqlite database.
+        Criteria, as for find(), choose which values are read at all: on indexed
+        fields, values of other keys are never decoded.
+        """
+        source = self._sql_source(criteria, **kwargs)
+        return MetaDataFrame(run_sql(query, source, engine=engine), df_engine=df_engine)
+
+    def _sql_source(self, criteria=None, **kwargs):
+        keys = self.find(criteria, **kwargs) if criteria or kwargs else None
+        return self.assemble_batches(with_metadata=True, keys=keys)
+
     @property
     def df(self):
         return self.assemble_df()
@@ -1,6 +1,44 @@
 from . import *
 from .pairtree import PairtreeHashStash
-from ..utils.dataframes import MetaDataFrame
+from ..utils.dataframes import MetaDataFrame, read_arrow_table
+
+
+def get_scan_field_types(fields_l):
+    # plain values keep their arrow type; mixed or nested ones are stored serialized
+    import pyarrow as pa
+
+    names = {name: None for fields in fields_l for name in fields}
+    types = {}
+    for name in names:
+        vals = [fields.get(name) for fields in fields_l]
+        try:
+            type = pa.array(vals).type
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            type = None
+        if type is None or not (pa.types.is_primitive(type) or pa.types.is_string(type)):
+            for fields in fields_l:
+                if name in fields:
+                    fields[name] = serialize(fields[name])
+            type = pa.string()
+        types[name] = type
+    return types
+
+
+def get_scan_partition_expression(fields, key_schema):
+    import pyarrow.dataset as ds
+    import pyarrow as pa
+
+    expr = None
+    for name, value in fields.items():
+        field = key_schema.field(name)
+        cond = (
+            ds.field(name).is_null()
+            if value is None
+            else ds.field(name) == pa.scalar(value, type=field.type)
+        )
+        expr = cond if expr is None else expr & cond
+    return expr
+
 
 class DataFrameHashStash(PairtreeHashStash):
     engine = "dataframe"
@@ -29,7 +67,8 @@ class DataFrameHashStash(PairtreeHashStash):
         encoded_key = self.encode_key(unencoded_key)
         self._set_key(encoded_key)
         filepath_value = self._get_path_new_value(encoded_key)
-        return mdf.write(filepath_value, io_engine=self.io_engine, compression=self.compress)
+        mdf.write(filepath_value, io_engine=self.io_engine, compression=self.compress)
+        self._update_indexes(unencoded_key, unencoded_value, encoded_key)
 
     @log.debug
     def get_all(
@@ -40,6 +79,7 @@ class DataFrameHashStash(PairtreeHashStash):
         all_results=None,
         as_dataframe=None,
         as_list=None,
+        as_arrow=False,
         **kwargs,
     ) -> Any:
         all_results = self._all_results(all_results)
@@ -51,10 +91,18 @@ class DataFrameHashStash(PairtreeHashStash):
             with_metadata=True,
         )
 
+        if as_arrow:
+            tables = [self._read_arrow_table(path_d["_path"]) for path_d in paths_ld]
+            return tables if tables else default
+
         out_l = []
         for path_d in paths_ld:
             path = path_d.pop("_path")
-            decoded_value = self._decode_value_from_filepath(path)
+            decoded_value = self._decode_value_from_filepath(
+                path,
+                mmap=kwargs.get("mmap", False),
+                arrow_dtypes=kwargs.get("arrow_dtypes", False),
+            )
             if is_dataframe(decoded_value):
                 df = decoded_value
                 if with_metadata:
@@ -113,16 +161,30 @@ class DataFrameHashStash(PairtreeHashStash):
         
         # return self.serialize(values) if as_string else values
 
-    def _decode_value_from_filepath(self, filepath):
+    def _decode_value_from_filepath(self, filepath, mmap=False, arrow_dtypes=False):
         try:
             ext = os.path.splitext(filepath)[1]
-            if not ext:
-                return super().decode_value_from_filepath(filepath)
-            return MetaDataFrame.read(filepath, df_engine=self.df_engine, compression=self.compress)
+            if not ext or ext == NPY_EXT:
+                return super().decode_value_from_filepath(filepath, mmap=mmap)
+            return MetaDataFrame.read(
+                filepath,
+                df_engine=self.df_engine,
+                compression=self.compress,
+                arrow_dtypes=arrow_dtypes,
+            )
         except Exception as e:
             log.warning(f'error reading dataframe from {filepath}: {e}')
             return None
 
+    def _read_arrow_table(self, filepath):
+        # arrow files are memory-mapped as is; other formats are read and converted
+        if filepath.endswith(".arrow"):
+            return read_arrow_table(filepath)
+        value = self._decode_value_from_filepath(filepath)
+        if not is_dataframe(value):
+            raise ValueError(f"Value at {filepath} is not a dataframe")
+        return MetaDataFrame(value).to_arrow_table()
+
     @log.debug
     def items(
         self, all_results=None, with_metadata=False, as_dataframe=False, **kwargs
@@ -144,6 +206,92 @@ class DataFrameHashStash(PairtreeHashStash):
                     for val in vals:
                         yield key, val
 
+    @log.debug
+    def scan(self, all_results=None, df_engine=None):
+        """
+        Lazily scan every stored DataFrame as one dataset, without reading any of them.
+
+        Returns a pyarrow.dataset.Dataset (or a polars LazyFrame for df_engine="polars")
+        over the stash's parquet/feather/arrow value files. Key fields, flattened as in
+        assemble_df, appear as constant columns per file, so filters on them skip whole
+        files; column projections and row filters are pushed down to the file readers.
+        Values that are not DataFrames are left out.
+        """
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        import pyarrow.fs as pafs
+
+        if self.io_engine not in ARROW_IO_ENGINES:
+            raise ValueError(f"scan needs one of the io engines {sorted(ARROW_IO_ENGINES)}, not {self.io_engine}")
+        if self.io_engine == "parquet":
+            file_format, exts = ds.ParquetFileFormat(), {".parquet"}
+        else:
+            file_format, exts = ds.IpcFileFormat(), {".feather", ".arrow"}
+
+        paths, fields_l = [], []
+        for key_path, value_paths in self.paths_items(all_results=True):
+            value_paths = sorted(p for p in value_paths if os.path.splitext(p)[1] in exts)
+            if not value_paths:
+                continue
+            key_fields = flatten_args_kwargs(self.decode_key(self._get_from_filepath(key_path)))
+            path_ld = self._get_path_values_metadata(value_paths, incl_path=True)
+            if not self._all_results(all_results):
+                path_ld = path_ld[-1:]
+            for path_d in path_ld:
+                paths.append(path_d.pop("_path"))
+                fields_l.append({**key_fields, **(path_d if self._all_results(all_results) else {})})
+
+        if not paths:
+            dataset = ds.dataset(pa.table({}))
+        else:
+            key_schema = pa.schema(
+                [
+                    pa.field(name, type)
+                    for name, type in get_scan_field_types(fields_l).items()
+                ]
+            )
+            file_schema = ds.dataset(paths[0], format=file_format).schema
+            schema = pa.unify_schemas([file_schema.remove_metadata(), key_schema])
+            partitions = [
+                get_scan_partition_expression(fields, key_schema) for fields in fields_l
+            ]
+            dataset = ds.FileSystemDataset.from_paths(
+                paths,
+                schema=schema,
+                format=file_format,
+                filesystem=pafs.LocalFileSystem(),
+                partitions=partitions,
+            )
+
+        if get_df_engine(df_engine or self.df_engine) == "polars":
+            import polars as pl
+
+            return pl.scan_pyarrow_dataset(dataset)
+        return dataset
+
+    def _sql_source(self, criteria=None, **kwargs):
+        # the scan's dataset: the sql engine pushes filters and projections into the files
+        dataset = self.scan(all_results=True, df_engine="pandas")
+        criteria = parse_criteria({**(criteria or {}), **kwargs})
+        if not criteria:
+            return dataset
+        import pyarrow.dataset as ds
+
+        ops = {
+            "eq": lambda f, v: f == v,
+            "ne": lambda f, v: f != v,
+            "gt": lambda f, v: f > v,
+            "gte": lambda f, v: f >= v,
+            "lt": lambda f, v: f < v,
+            "lte": lambda f, v: f <= v,
+            "in": lambda f, v: f.isin(list(v)),
+        }
+        expr = None
+        for field, op, value in criteria:
+            cond = ops[op](ds.field(field), value)
+            expr = cond if expr is None else expr & cond
+        return dataset.to_table(filter=expr)
+
     def assemble_df(
         self,
         all_results=None,
@@ -175,3 +323,4 @@ class DataFrameHashStash(PairtreeHashStash):
         )
         ld = mdf.reset_index().to_pandas().df.to_dict(orient="records")
         return filter_ld(ld, no_nan=True)
+
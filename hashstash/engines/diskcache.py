@@ -8,4 +8,10 @@ class DiskCacheHashStash(BaseHashStash):
     def get_db(self):
         from diskcache import Cache
         os.makedirs(self.path_dirname, exist_ok=True)
-        return Cache(self.path)
\ No newline at end of file
+        return Cache(self.path)
+
+    @contextmanager
+    def batch(self):
+        """Run all operations in the block inside one diskcache transaction."""
+        with self.db as db, db.transact():
+            yield self
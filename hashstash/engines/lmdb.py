@@ -5,35 +5,37 @@ class LMDBHashStash(BaseHashStash):
     filename_is_dir = True
 
     def __init__(self, *args, map_size=10 * 1024**3, **kwargs):  # Default to 10GB
-        self._env = None
+        self._txn = None
         self.map_size = map_size
         super().__init__(*args, **kwargs)
 
     @log.debug
     def get_db(self):
-        if self._env is None:
-            import lmdb
-            os.makedirs(self.path_dirname, exist_ok=True)
-
-            self._env = lmdb.open(self.path, map_size=self.map_size)
-        return self._env
-
+        import lmdb
+        os.makedirs(self.path_dirname, exist_ok=True)
+        return lmdb.open(self.path, map_size=self.map_size)
 
     @contextmanager
     def get_transaction(self, write=False):
-        import lmdb
-        max_retries = 3
-        for attempt in range(max_retries):
+        if self._txn is not None:
+            # inside a batch: reuse its write transaction
+            yield self._txn
+            return
+        with self.get_connection() as env, env.begin(write=write) as txn:
+            yield txn
+
+    @contextmanager
+    def batch(self):
+        """Run all operations in the block inside a single write transaction."""
+        if self._txn is not None:
+            yield self
+            return
+        with self.get_connection() as env, env.begin(write=True) as txn:
+            self._txn = txn
             try:
-                with self.get_db().begin(write=write) as txn:
-                    yield txn
-                break
-            except lmdb.Error as e:
-                log.debug(f"LMDB transaction error (attempt {attempt + 1}/{max_retries}): {e}")
-                if attempt == max_retries - 1:
-                    raise
-                self.close()  # Close the current environment
-                self._env = None  # Reset the environment to force a new one on next attempt
+                yield self
+            finally:
+                self._txn = None
 
     def _set(self, encoded_key, encoded_value):
         with self.get_transaction(write=True) as txn:
@@ -44,6 +46,10 @@ class LMDBHashStash(BaseHashStash):
         with self.get_transaction(write=False) as txn:
             return txn.get(self._encode_key_value(encoded_key))
 
+    def _get_many(self, encoded_keys):
+        with self.get_transaction(write=False) as txn:
+            return [txn.get(self._encode_key_value(encoded_key)) for encoded_key in encoded_keys]
+
     def _del(self, encoded_key):
         with self.get_transaction(write=True) as txn:
             txn.delete(self._encode_key_key(encoded_key))
@@ -79,24 +85,12 @@ class LMDBHashStash(BaseHashStash):
                     yield value, txn.get(key[:-4]+b'.value')
 
     def _encode_key_key(self, encoded_key):
-        return encode_hash(encoded_key).encode() + b'.key'
+        return self.hash(encoded_key).encode() + b'.key'
     
     def _encode_key_value(self, encoded_key):
-        return encode_hash(encoded_key).encode() + b'.value'
+        return self.hash(encoded_key).encode() + b'.value'
 
     @staticmethod
     def _close_connection(connection):
         if connection is not None:
             connection.close()
-
-    def clear(self):
-        super().clear()
-        self._env = None  # Reset the environment
-        return self
-
-    def close(self):
-        if self._env is not None:
-            self._env.close()
-            self._env = None
-        super().close()
-
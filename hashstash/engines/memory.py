@@ -16,6 +16,7 @@ def get_shared_memory_cache():
 class MemoryHashStash(BaseHashStash):
     engine = 'memory'
     ensure_dir = False
+    array_files = False
 
     @contextmanager
     def get_connection(self):
@@ -25,8 +26,11 @@ class MemoryHashStash(BaseHashStash):
         yield cache[self.path]
 
     def clear(self):
+        for sub in self.children:
+            sub.clear()
         cache = get_shared_memory_cache()
         cache[self.path] = {}
+        self.indexes.clear()
         return self
 
     @property
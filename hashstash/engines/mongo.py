@@ -25,6 +25,7 @@ class MongoHashStash(BaseHashStash):
     host = 'localhost'
     port = 27017
     ensure_dir = False
+    array_files = False  # .npy files on local disk aren't shared with the server
     string_keys = True
     string_values = True
     dbname = 'hashstash'
@@ -34,6 +35,7 @@ class MongoHashStash(BaseHashStash):
         if port is not None: self.port = port
         # force b64 True for mongo
         self.b64 = True
+        self._bulk_ops = None
         super().__init__(*args, **kwargs)
 
         
@@ -52,7 +54,33 @@ class MongoHashStash(BaseHashStash):
     def _close_connection(coll):
         coll._client.close()
 
+    @contextmanager
+    def batch(self):
+        """
+        Collect all writes in the block and send them as one unordered bulk write.
+
+        Nothing is sent if the block raises. Queued writes are not visible to
+        reads until the block exits.
+        """
+        if self._bulk_ops is not None:
+            yield self
+            return
+        self._bulk_ops = []
+        try:
+            yield self
+            if self._bulk_ops:
+                with self.db as db:
+                    db.bulk_write(self._bulk_ops, ordered=False)
+        finally:
+            self._bulk_ops = None
+
     def _set(self, encoded_key, encoded_value):
+        if self._bulk_ops is not None:
+            from pymongo import UpdateOne
+            self._bulk_ops.append(
+                UpdateOne({"_id": encoded_key}, {"$set": {"value": encoded_value}}, upsert=True)
+            )
+            return
         with self.db as db:
             db.update_one(
                 {"_id": encoded_key},
@@ -65,17 +93,27 @@ class MongoHashStash(BaseHashStash):
             result = db.find_one({"_id": encoded_key})
         return result["value"] if result else None
 
+    def _get_many(self, encoded_keys):
+        with self.db as db:
+            found = {doc["_id"]: doc["value"] for doc in db.find({"_id": {"$in": list(encoded_keys)}})}
+        return [found.get(encoded_key) for encoded_key in encoded_keys]
+
     def _has(self, encoded_key):
         with self.db as db:
             return db.count_documents({"_id": encoded_key}, limit=1) > 0
 
     def _del(self, encoded_key: Union[str, bytes]) -> None:
+        if self._bulk_ops is not None:
+            from pymongo import DeleteOne
+            self._bulk_ops.append(DeleteOne({"_id": encoded_key}))
+            return
         with self.db as db:
             db.delete_one({"_id": encoded_key})
 
     def clear(self):
         with self.db as db:
             db.drop()
+        self.indexes.clear()
         return self
 
     def __len__(self):
@@ -1,4 +1,13 @@
 from . import *
+import mmap
+
+
+def _fsync_path(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
 
 
 class PairtreeHashStash(BaseHashStash):
@@ -8,6 +17,8 @@ class PairtreeHashStash(BaseHashStash):
     valtype_filename = ".valtype"
     metadata_cols = ["_version", "_timestamp"]
     needs_lock = False
+    stream_values = True
+    _batch = None
 
     def connect(self):
         pass
@@ -87,6 +98,7 @@ class PairtreeHashStash(BaseHashStash):
         default: Any = None,
         with_metadata=None,
         all_results=True,
+        mmap=False,
         **kwargs,
     ) -> Any:
         paths_ld = self.get_path_values(
@@ -97,8 +109,7 @@ class PairtreeHashStash(BaseHashStash):
         out = []
         for path_d in paths_ld:
             path = path_d.pop("_path")
-            encoded_value = self._get_from_filepath(path)
-            decoded_value = self.decode_value(encoded_value)
+            decoded_value = self.decode_value_from_filepath(path, mmap=mmap)
             if not with_metadata:
                 out.append(decoded_value)
             else:
@@ -106,6 +117,11 @@ class PairtreeHashStash(BaseHashStash):
                 out.append(path_d)
         return out if out else default
 
+    @log.debug
+    def get_many(self, unencoded_keys, default=None):
+        # each value is its own file: there is no connection to share
+        return [self.get(key, default=default) for key in unencoded_keys]
+
     def new_unencoded_value(self, unencoded_value: Any, *args, **kwargs):
         return unencoded_value # file versioning takes care of this
 
@@ -114,21 +130,108 @@ class PairtreeHashStash(BaseHashStash):
             return None
 
         with open(filepath, "rb") as f:
+            if self._can_mmap_values and os.fstat(f.fileno()).st_size:
+                # pickle5 reattaches its buffers as views into the map
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
             return f.read()
 
+    @property
+    def _can_mmap_values(self):
+        return (
+            self.serializer == "pickle5"
+            and not self.b64
+            and self.compress == RAW_NO_COMPRESS
+        )
+
     def _set_to_filepath(self, filepath, encoded_data):
         os.makedirs(os.path.dirname(filepath), exist_ok=True)
         with open(filepath, "wb") as f:
             f.write(encoded_data)
 
+    @log.debug
+    def set(self, unencoded_key: Any, unencoded_value: Any, append=None) -> None:
+        if self.array_files and is_large_array(unencoded_value):
+            return self._set_array(unencoded_key, unencoded_value)
+        if not self._streams_values:
+            return super().set(unencoded_key, unencoded_value, append=append)
+        # serialize, compress and encode straight into the value file
+        encoded_key = self.encode_key(unencoded_key)
+        self._set_key(encoded_key)
+        filepath_value = self._get_path_new_value(encoded_key)
+        os.makedirs(os.path.dirname(filepath_value), exist_ok=True)
+        try:
+            with open(filepath_value, "wb") as f, self.value_writer(f) as writer:
+                self.serialize_to(unencoded_value, writer)
+        except BaseException:
+            if os.path.exists(filepath_value):
+                os.remove(filepath_value)
+            raise
+        self._add_value_path(filepath_value)
+        self._update_indexes(unencoded_key, unencoded_value, encoded_key)
+
+    def _set_array(self, unencoded_key, arr):
+        # saved as a .npy value file, so it can be read back memory-mapped
+        encoded_key = self.encode_key(unencoded_key)
+        self._set_key(encoded_key)
+        filepath_value = self._get_path_new_value(encoded_key) + NPY_EXT
+        save_npy(filepath_value, arr)
+        self._add_value_path(filepath_value)
+        self._update_indexes(unencoded_key, arr, encoded_key)
+
     @log.debug
     def _set(self, encoded_key: str, encoded_value: Any) -> None:
         self._set_key(encoded_key)
         filepath_value = self._get_path_new_value(encoded_key)
         self._set_to_filepath(filepath_value, encoded_value)
-        if not self.append_mode:
+        self._add_value_path(filepath_value)
+
+    def _add_value_path(self, filepath_value):
+        if self._batch is not None:
+            self._batch["values"].append(filepath_value)
+        elif not self.append_mode:
             self._prune_dir(filepath_value)
 
+    @contextmanager
+    def batch(self):
+        """
+        Group writes so they become durable together.
+
+        Pruning of old versions and fsyncs of the written files and their
+        directories are deferred until the block exits. If the block raises,
+        the files it wrote are removed again.
+        """
+        if self._batch is not None:
+            yield self
+            return
+        self._batch = {"keys": [], "values": []}
+        try:
+            yield self
+        except BaseException:
+            self._rollback_batch(self._batch)
+            raise
+        else:
+            self._commit_batch(self._batch)
+        finally:
+            self._batch = None
+
+    def _commit_batch(self, batch):
+        if not self.append_mode:
+            for filepath_value in batch["values"]:
+                if os.path.exists(filepath_value):
+                    self._prune_dir(filepath_value)
+        paths = [p for p in batch["keys"] + batch["values"] if os.path.exists(p)]
+        for path in paths:
+            _fsync_path(path)
+        for dir_path in {os.path.dirname(p) for p in paths}:
+            _fsync_path(dir_path)
+
+    def _rollback_batch(self, batch):
+        for path in batch["values"] + batch["keys"]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
 
     def _prune_dir(self, filepath_value):
         dir_path = os.path.dirname(filepath_value)
@@ -147,6 +250,8 @@ class PairtreeHashStash(BaseHashStash):
         filepath_key = self._get_path_key(encoded_key)
         if not os.path.exists(filepath_key):
             self._set_to_filepath(filepath_key, encoded_key)
+            if self._batch is not None:
+                self._batch["keys"].append(filepath_key)
 
     @log.debug
     def _has(self, encoded_key: bytes) -> bool:
@@ -186,8 +291,13 @@ class PairtreeHashStash(BaseHashStash):
             for vi, vpath in enumerate(path_values)
         ]
 
-    def decode_value_from_filepath(self, filepath):
-        return self.decode_value(self._get_from_filepath(filepath))
+    def decode_value_from_filepath(self, filepath, mmap=False):
+        if filepath.endswith(NPY_EXT):
+            return load_npy(filepath, mmap=mmap)
+        if not self._streams_values or self._can_mmap_values:
+            return self.decode_value(self._get_from_filepath(filepath))
+        with open(filepath, "rb") as f:
+            return self.deserialize_from(self.value_reader(f))
 
     def paths_items(self, all_results=None, with_metadata=None):
         for root, _, files in os.walk(self.path):
@@ -221,7 +331,8 @@ class PairtreeHashStash(BaseHashStash):
     def _values(self, all_results=None):
         for paths in self.paths_values(all_results=all_results):
             for path in paths:
-                yield self._get_from_filepath(path)
+                if not path.endswith(NPY_EXT):
+                    yield self._get_from_filepath(path)
 
     @log.debug
     # def values(self, all_results=None, **kwargs):
@@ -234,6 +345,8 @@ class PairtreeHashStash(BaseHashStash):
         for path_key, path_values in self.paths_items(all_results=all_results):
             encoded_key = self._get_from_filepath(path_key)
             for path_value in path_values:
+                if path_value.endswith(NPY_EXT):
+                    continue
                 encoded_value = self._get_from_filepath(path_value)
                 yield (encoded_key, encoded_value)
 
@@ -261,8 +374,17 @@ class PairtreeHashStash(BaseHashStash):
     #                 meta_d = path_value_d
     #                 yield {**key_d, **meta_d, **value_d}
 
+    def _raw_records(self):
+        for path_key, _ in self.paths_items(all_results=True):
+            yield self._get_from_filepath(path_key), os.path.dirname(path_key)
+
+    def _put_raw_record(self, encoded_key, record):
+        # record is the source key directory: copy it whole to keep every version
+        shutil.copytree(record, self._get_path(encoded_key), dirs_exist_ok=True)
+
     def __delitem__(self, unencoded_key: str) -> None:
         path = self.get_path(unencoded_key)
         if not os.path.exists(path):
             raise KeyError(unencoded_key)
         shutil.rmtree(path, ignore_errors=True)
+        self.indexes.remove(self.encode_key(unencoded_key))
@@ -18,6 +18,7 @@ class RedisHashStash(BaseHashStash):
     host = REDIS_HOST
     port = REDIS_PORT
     ensure_dir = False
+    array_files = False  # .npy files on local disk aren't shared with the server
     string_keys = True
     string_values = True
     dbname = 'hashstash'
@@ -39,6 +40,27 @@ class RedisHashStash(BaseHashStash):
     def _close_connection(connection):
         pass # how does one close a redis connection?
 
+    @contextmanager
+    def batch(self):
+        """
+        Queue all writes in the block into one MULTI/EXEC pipeline.
+
+        The pipeline is executed when the block exits and discarded on error.
+        As with RedisDict.pipeline, reads are not supported inside the block.
+        """
+        with self.db as db:
+            if db._temp_redis is not None:
+                yield self
+                return
+            pipe = db.redis.pipeline(transaction=True)
+            db.redis, db._temp_redis = pipe, db.redis
+            try:
+                yield self
+                pipe.execute()
+            finally:
+                pipe.reset()
+                db.redis, db._temp_redis = db._temp_redis, None
+
     def clear(self):
         super().close()
         import redis
@@ -50,6 +72,7 @@ class RedisHashStash(BaseHashStash):
             client.save()
         except Exception as e:
             pass
+        self.indexes.clear()
         return self
     
     @property
@@ -1,14 +1,117 @@
 from . import *
+from .base import _checkout_connection, _checkin_connection
+import dbm
+import shelve
+
+
+def open_dbm(path, fast=True):
+    """
+    Open a dbm database at path with the fastest backend available.
+
+    An existing database is reopened with whichever backend created it; new
+    databases prefer dbm.gnu in fast mode (no fsync per write), falling back
+    to dbm's default choice.
+    """
+    existing = dbm.whichdb(path)
+    if existing:
+        mod = importlib.import_module(existing)
+        flag = "cf" if fast and existing == "dbm.gnu" else "c"
+        return mod.open(path, flag)
+    try:
+        gnu = importlib.import_module("dbm.gnu")
+        return gnu.open(path, "cf" if fast else "c")
+    except ImportError:
+        return dbm.open(path, "c")
+
+
+def dbm_stamp(path):
+    """Sizes and modification times of a dbm database's files, whichever backend wrote them."""
+    stamp = []
+    for filename in (path, path + ".db", path + ".dir", path + ".dat"):
+        try:
+            st = os.stat(filename)
+        except FileNotFoundError:
+            continue
+        stamp.append((filename, st.st_size, st.st_mtime_ns))
+    return tuple(stamp)
+
 
 class ShelveHashStash(BaseHashStash):
     engine = 'shelve'
     string_keys = True
-    needs_reconnect = True
+    concurrent_writes = False  # chunks are written one at a time, in one batch
+
+    def __init__(self, *args, **kwargs):
+        self._batches = threading.local()
+        super().__init__(*args, **kwargs)
 
     @log.debug
     @retry_patiently()
-    def get_db(self, writeback=True):
-        import shelve
+    def get_db(self):
         os.makedirs(self.path_dirname, exist_ok=True)
-        return shelve.open(self.path, writeback=writeback)
-    
\ No newline at end of file
+        db = shelve.Shelf(open_dbm(self.path), writeback=False)
+        db._stamp = dbm_stamp(self.path)
+        return db
+
+    @contextmanager
+    def get_connection(self):
+        # one pooled handle per process and path, used by one thread at a time
+        entry = _checkout_connection(self)
+        try:
+            with entry.setdefault("lock", threading.RLock()):
+                if (
+                    not self._batch_depth
+                    and entry["in_use"] == 1
+                    and entry["conn"]._stamp != dbm_stamp(self.path)
+                ):
+                    # another process wrote the file since this handle last synced
+                    self._close_connection(entry["conn"])
+                    entry["conn"] = self.get_db()
+                yield entry["conn"]
+        finally:
+            _checkin_connection(entry)
+
+    @property
+    def _batch_depth(self):
+        return getattr(self._batches, "depth", 0)
+
+    def _set(self, encoded_key, encoded_value):
+        try:
+            with self as cache, cache.db as db:
+                db[encoded_key] = encoded_value
+                self._mark_written(db)
+        except Exception as e:
+            log.error(f"Failed to set key {encoded_key}: {e}")
+
+    def _del(self, encoded_key):
+        with self as cache, cache.db as db:
+            del db[encoded_key]
+            self._mark_written(db)
+
+    def _mark_written(self, db):
+        # outside a batch, writes are synced at once so other processes see them
+        if not self._batch_depth:
+            self._sync(db)
+
+    def _sync(self, db):
+        db.sync()
+        if hasattr(db.dict, "_modified"):
+            # dbm.dumb never clears this, so closing a synced handle would
+            # rewrite its index over keys other processes added since
+            db.dict._modified = False
+        db._stamp = dbm_stamp(self.path)
+
+    def sync(self):
+        with self.get_connection() as db:
+            self._sync(db)
+
+    @contextmanager
+    def batch(self):
+        """Group writes: nothing is synced to disk until this thread's outermost batch exits."""
+        self._batches.depth = self._batch_depth + 1
+        try:
+            yield self
+        finally:
+            self._batches.depth -= 1
+            if not self._batch_depth:
+                self.sync()
@@ -4,22 +4,42 @@ import os
 
 class SqliteHashStash(BaseHashStash):
     engine = "sqlite"
-    _db = None
-    needs_reconnect = True
+    concurrent_writes = False  # chunks are written one at a time, in one batch
+    _batch_db = None
 
     @log.debug
     @retry_patiently()
     def get_db(self):
-        log.debug(f'Path exists: {os.path.exists(self.path)}\nPath: {self.path}')
-        log.debug(f'Directory exists: {os.path.exists(self.path_dirname)}\nDirectory: {self.path_dirname}')
-        
-        # Ensure the directory exists
         os.makedirs(self.path_dirname, exist_ok=True)
-        
         from sqlitedict import SqliteDict
-        
-        if self._db is None or not os.path.exists(self.path):
-            log.debug("Creating new SqliteDict instance")
-            self._db = SqliteDict(self.path, flag='c', autocommit=True)
-        
-        return self._db
\ No newline at end of file
+        return SqliteDict(self.path, flag='c', autocommit=True)
+
+    @contextmanager
+    def get_connection(self):
+        if self._batch_db is not None:
+            yield self._batch_db
+        else:
+            with super().get_connection() as db:
+                yield db
+
+    @contextmanager
+    def batch(self):
+        """
+        Run all operations in the block inside one sqlite transaction.
+
+        Uses a dedicated non-autocommit connection; it is committed when the
+        block exits and closed without committing (i.e. rolled back) on error.
+        """
+        if self._batch_db is not None:
+            yield self
+            return
+        from sqlitedict import SqliteDict
+
+        os.makedirs(self.path_dirname, exist_ok=True)
+        self._batch_db = SqliteDict(self.path, flag='c', autocommit=False)
+        try:
+            yield self
+            self._batch_db.commit()
+        finally:
+            self._batch_db.close()
+            self._batch_db = None
@@ -16,6 +16,7 @@ opts_all = dict(
             "blosc",
             "raw",
             "zlib",
+            "zstd",
         }
     ],
     b64=[True],
@@ -742,6 +743,40 @@ class HashStashProfiler:
 
 
 
+def profile_json_backends(size=DEFAULT_DATA_SIZE, iterations=10, data_type="dict"):
+    """
+    Time serialize_custom/deserialize_custom with each installed json backend.
+    Returns a list of dicts, one per backend, with mean seconds per call.
+    """
+    from ..serializers.custom import (
+        JSON_BACKENDS,
+        json_loads,
+        serialize_custom,
+        _deserialize_custom,
+    )
+
+    data = generate_data(size, data_type=data_type)
+    serialized = serialize_custom(data)
+    out = []
+    for backend in JSON_BACKENDS:
+        try:
+            importlib.import_module(backend)
+        except ImportError:
+            continue
+        times = [
+            time_function(lambda: _deserialize_custom(json_loads(serialized, backend)))[1]
+            for _ in range(iterations)
+        ]
+        out.append(
+            {
+                "JSON Backend": backend,
+                "Serialized Size (B)": bytesize(serialized),
+                "Deserialize Time (s)": sum(times) / len(times),
+            }
+        )
+    return out
+
+
 def profile_stash_transaction(
     stash,
     size=DEFAULT_DATA_SIZE,
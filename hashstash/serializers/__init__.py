@@ -1,4 +1,5 @@
 from .. import *
 from .jsons import *
 from .custom import *
+from .binary import *
 from .serializer import *
\ No newline at end of file
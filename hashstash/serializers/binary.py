@@ -0,0 +1,253 @@
+from . import *
+from .custom import _serialize_custom, _deserialize_custom, raw_bytes
+import struct
+
+# Binary framing of the same type-tagged tree serialize_custom emits as json.
+# The wire format is msgpack: the msgpack C library is used when installed,
+# otherwise the pure python packer below writes identical bytes. Binary
+# payloads (bytes, numpy buffers, dataframe files) are stored as raw
+# length-prefixed blobs rather than base64 strings.
+
+EXT_BIGINT = 1  # ints outside 64 bits, stored as their decimal string
+
+_pack_float = struct.Struct(">Bd").pack
+_unpack_float = struct.Struct(">d").unpack_from
+_unpack_float32 = struct.Struct(">f").unpack_from
+
+_INT_FORMATS = [
+    (0, 0xFF, 0xCC, ">B"),
+    (0, 0xFFFF, 0xCD, ">H"),
+    (0, 0xFFFFFFFF, 0xCE, ">I"),
+    (0, 0xFFFFFFFFFFFFFFFF, 0xCF, ">Q"),
+    (-0x80, 0x7F, 0xD0, ">b"),
+    (-0x8000, 0x7FFF, 0xD1, ">h"),
+    (-0x80000000, 0x7FFFFFFF, 0xD2, ">i"),
+    (-0x8000000000000000, 0x7FFFFFFFFFFFFFFF, 0xD3, ">q"),
+]
+
+
+@log.debug
+def serialize_custom_binary(obj: Any) -> bytes:
+    with raw_bytes():
+        serialized = _serialize_custom(obj)
+    return pack_binary(serialized)
+
+
+@log.debug
+def deserialize_custom_binary(data: bytes) -> Any:
+    return _deserialize_custom(unpack_binary(data))
+
+
+def pack_binary(obj: Any) -> bytes:
+    try:
+        import msgpack
+
+        return msgpack.packb(obj, use_bin_type=True)
+    except (ImportError, OverflowError):
+        return _pack_binary(obj)
+
+
+def unpack_binary(data: bytes) -> Any:
+    try:
+        import msgpack
+    except ImportError:
+        return _unpack_binary(data)
+    return msgpack.unpackb(
+        data, raw=False, strict_map_key=False, ext_hook=_msgpack_ext_hook
+    )
+
+
+def _msgpack_ext_hook(code, data):
+    import msgpack
+
+    if code == EXT_BIGINT:
+        return int(data.decode())
+    return msgpack.ExtType(code, data)
+
+
+## pure python packer
+
+
+def _pack_binary(obj: Any) -> bytes:
+    out = []
+    _pack_into(obj, out.append)
+    return b"".join(out)
+
+
+def _pack_length(n, fix_tag, fix_max, tags, write):
+    if n <= fix_max and fix_tag is not None:
+        write(bytes((fix_tag | n,)))
+    elif n <= 0xFF and tags[0] is not None:
+        write(struct.pack(">BB", tags[0], n))
+    elif n <= 0xFFFF:
+        write(struct.pack(">BH", tags[1], n))
+    else:
+        write(struct.pack(">BI", tags[2], n))
+
+
+def _pack_into(obj, write):
+    if obj is None:
+        write(b"\xc0")
+    elif obj is True:
+        write(b"\xc3")
+    elif obj is False:
+        write(b"\xc2")
+    elif isinstance(obj, int):
+        _pack_int(obj, write)
+    elif isinstance(obj, float):
+        write(_pack_float(0xCB, obj))
+    elif isinstance(obj, str):
+        data = obj.encode("utf-8", "surrogatepass")
+        _pack_length(len(data), 0xA0, 31, (0xD9, 0xDA, 0xDB), write)
+        write(data)
+    elif isinstance(obj, (bytes, bytearray, memoryview)):
+        data = bytes(obj)
+        _pack_length(len(data), None, -1, (0xC4, 0xC5, 0xC6), write)
+        write(data)
+    elif isinstance(obj, (list, tuple)):
+        _pack_length(len(obj), 0x90, 15, (None, 0xDC, 0xDD), write)
+        for item in obj:
+            _pack_into(item, write)
+    elif isinstance(obj, dict):
+        _pack_length(len(obj), 0x80, 15, (None, 0xDE, 0xDF), write)
+        for k, v in obj.items():
+            _pack_into(k, write)
+            _pack_into(v, write)
+    else:
+        raise TypeError(f"Cannot pack object of type {type(obj)}")
+
+
+def _pack_int(n, write):
+    if 0 <= n <= 0x7F:
+        write(bytes((n,)))
+        return
+    if -32 <= n < 0:
+        write(bytes((n & 0xFF,)))
+        return
+    for lo, hi, tag, fmt in _INT_FORMATS:
+        if lo <= n <= hi:
+            write(bytes((tag,)) + struct.pack(fmt, n))
+            return
+    data = str(n).encode()
+    _pack_ext(EXT_BIGINT, data, write)
+
+
+def _pack_ext(code, data, write):
+    n = len(data)
+    fixext = {1: 0xD4, 2: 0xD5, 4: 0xD6, 8: 0xD7, 16: 0xD8}
+    if n in fixext:
+        write(struct.pack(">Bb", fixext[n], code))
+    elif n <= 0xFF:
+        write(struct.pack(">BBb", 0xC7, n, code))
+    elif n <= 0xFFFF:
+        write(struct.pack(">BHb", 0xC8, n, code))
+    else:
+        write(struct.pack(">BIb", 0xC9, n, code))
+    write(data)
+
+
+## pure python unpacker
+
+
+def _unpack_binary(data: bytes) -> Any:
+    buf = memoryview(data)
+    obj, pos = _unpack_from(buf, 0)
+    if pos != len(buf):
+        raise ValueError(f"Extra data after packed object ({len(buf) - pos}B)")
+    return obj
+
+
+_FIXED_INTS = {
+    0xCC: struct.Struct(">B"),
+    0xCD: struct.Struct(">H"),
+    0xCE: struct.Struct(">I"),
+    0xCF: struct.Struct(">Q"),
+    0xD0: struct.Struct(">b"),
+    0xD1: struct.Struct(">h"),
+    0xD2: struct.Struct(">i"),
+    0xD3: struct.Struct(">q"),
+}
+_LENGTHS = {1: struct.Struct(">B"), 2: struct.Struct(">H"), 4: struct.Struct(">I")}
+_STR_TAGS = {0xD9: 1, 0xDA: 2, 0xDB: 4}
+_BIN_TAGS = {0xC4: 1, 0xC5: 2, 0xC6: 4}
+_ARRAY_TAGS = {0xDC: 2, 0xDD: 4}
+_MAP_TAGS = {0xDE: 2, 0xDF: 4}
+_EXT_TAGS = {0xC7: 1, 0xC8: 2, 0xC9: 4}
+_FIXEXT_TAGS = {0xD4: 1, 0xD5: 2, 0xD6: 4, 0xD7: 8, 0xD8: 16}
+
+
+def _read_length(buf, pos, width):
+    return _LENGTHS[width].unpack_from(buf, pos)[0], pos + width
+
+
+def _unpack_from(buf, pos):
+    tag = buf[pos]
+    pos += 1
+    if tag <= 0x7F:
+        return tag, pos
+    if tag >= 0xE0:
+        return tag - 0x100, pos
+    if 0xA0 <= tag <= 0xBF:
+        n = tag & 0x1F
+        return str(buf[pos : pos + n], "utf-8", "surrogatepass"), pos + n
+    if 0x90 <= tag <= 0x9F:
+        return _unpack_array(buf, pos, tag & 0x0F)
+    if 0x80 <= tag <= 0x8F:
+        return _unpack_map(buf, pos, tag & 0x0F)
+    if tag == 0xC0:
+        return None, pos
+    if tag == 0xC2:
+        return False, pos
+    if tag == 0xC3:
+        return True, pos
+    if tag == 0xCB:
+        return _unpack_float(buf, pos)[0], pos + 8
+    if tag == 0xCA:
+        return _unpack_float32(buf, pos)[0], pos + 4
+    if tag in _FIXED_INTS:
+        fmt = _FIXED_INTS[tag]
+        return fmt.unpack_from(buf, pos)[0], pos + fmt.size
+    if tag in _STR_TAGS:
+        n, pos = _read_length(buf, pos, _STR_TAGS[tag])
+        return str(buf[pos : pos + n], "utf-8", "surrogatepass"), pos + n
+    if tag in _BIN_TAGS:
+        n, pos = _read_length(buf, pos, _BIN_TAGS[tag])
+        return bytes(buf[pos : pos + n]), pos + n
+    if tag in _ARRAY_TAGS:
+        n, pos = _read_length(buf, pos, _ARRAY_TAGS[tag])
+        return _unpack_array(buf, pos, n)
+    if tag in _MAP_TAGS:
+        n, pos = _read_length(buf, pos, _MAP_TAGS[tag])
+        return _unpack_map(buf, pos, n)
+    if tag in _FIXEXT_TAGS or tag in _EXT_TAGS:
+        if tag in _FIXEXT_TAGS:
+            n = _FIXEXT_TAGS[tag]
+        else:
+            n, pos = _read_length(buf, pos, _EXT_TAGS[tag])
+        code = struct.unpack_from(">b", buf, pos)[0]
+        data = bytes(buf[pos + 1 : pos + 1 + n])
+        return _unpack_ext(code, data), pos + 1 + n
+    raise ValueError(f"Invalid type tag 0x{tag:02x} at position {pos - 1}")
+
+
+def _unpack_array(buf, pos, n):
+    out = []
+    for _ in range(n):
+        item, pos = _unpack_from(buf, pos)
+        out.append(item)
+    return out, pos
+
+
+def _unpack_map(buf, pos, n):
+    out = {}
+    for _ in range(n):
+        k, pos = _unpack_from(buf, pos)
+        v, pos = _unpack_from(buf, pos)
+        out[k] = v
+    return out, pos
+
+
+def _unpack_ext(code, data):
+    if code == EXT_BIGINT:
+        return int(data.decode())
+    raise ValueError(f"Unknown extension type {code}")
@@ -7,6 +7,37 @@ from pathlib import Path
 from ..utils.misc import ReusableGenerator
 
 PANDAS_EXTENSION_ACTIVATED = True
+_raw_bytes_state = threading.local()
+
+@contextmanager
+def raw_bytes():
+    """Within this block, binary payloads stay raw bytes instead of base64 strings."""
+    prev = raw_bytes_active()
+    _raw_bytes_state.active = True
+    try:
+        yield
+    finally:
+        _raw_bytes_state.active = prev
+
+def raw_bytes_active():
+    return getattr(_raw_bytes_state, 'active', False)
+
+@contextmanager
+def typed_frames():
+    """Within this block, DataFrames keep their native dtypes in feather/parquet payloads.
+
+    Outside it they are cast to strings first, as keys always were, so the
+    serialized form of a key holding a DataFrame stays the same.
+    """
+    prev = typed_frames_active()
+    _raw_bytes_state.typed_frames = True
+    try:
+        yield
+    finally:
+        _raw_bytes_state.typed_frames = prev
+
+def typed_frames_active():
+    return getattr(_raw_bytes_state, 'typed_frames', False)
 
 def dump_json(obj,as_string=False):
     try:
@@ -30,6 +61,74 @@ def serialize_custom(obj: Any) -> str:
     serialized = _serialize_custom(obj)
     return json.dumps(serialized)
 
+def serialize_custom_to(obj: Any, fileobj, chunk_size: int = STREAM_CHUNK_SIZE) -> None:
+    """Write serialize_custom(obj) into fileobj as utf-8, about chunk_size bytes at a time."""
+    pieces, size = [], 0
+    for piece in iter_json_pieces(_serialize_custom(obj)):
+        pieces.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            fileobj.write("".join(pieces).encode())
+            pieces, size = [], 0
+    if pieces:
+        fileobj.write("".join(pieces).encode())
+
+def iter_json_pieces(obj):
+    """
+    Yield json.dumps(obj) in pieces. Lists and dicts are walked down to items
+    holding fewer than JSON_STREAM_MIN_ITEMS items in all, and runs of those
+    are encoded together so the C encoder does the work.
+    """
+    is_dict = isinstance(obj, dict)
+    if not (is_dict or isinstance(obj, list)):
+        yield json.dumps(obj)
+        return
+    yield "{" if is_dict else "["
+    sep, run = "", []
+    for item in (obj.items() if is_dict else obj):
+        value = item[1] if is_dict else item
+        if type(value) in _JSON_SHORT_SCALARS or _is_small_json(value):
+            run.append(item)
+            if len(run) < JSON_STREAM_MIN_ITEMS:
+                continue
+            yield sep + _dump_json_run(run, is_dict)
+        else:
+            if run:
+                yield sep + _dump_json_run(run, is_dict)
+                sep = ", "
+            # keys as json.dumps writes them, non-string ones converted
+            yield sep + (json.dumps({item[0]: 0})[1:-2] if is_dict else "")
+            yield from iter_json_pieces(value)
+        sep, run = ", ", []
+    if run:
+        yield sep + _dump_json_run(run, is_dict)
+    yield "}" if is_dict else "]"
+
+_JSON_SHORT_SCALARS = {int, float, bool, type(None)}
+
+def _is_small_json(obj):
+    # fewer than JSON_STREAM_MIN_ITEMS list/dict items in all, and no long strings
+    stack, count = [obj], 0
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, dict):
+            count += len(obj)
+            if count >= JSON_STREAM_MIN_ITEMS:
+                return False
+            stack.extend(obj.values())
+        elif isinstance(obj, list):
+            count += len(obj)
+            if count >= JSON_STREAM_MIN_ITEMS:
+                return False
+            stack.extend(obj)
+        elif isinstance(obj, str) and len(obj) >= STREAM_CHUNK_SIZE:
+            return False
+    return True
+
+def _dump_json_run(run, is_dict):
+    # the items of a list or dict, as json.dumps writes them between its brackets
+    return json.dumps(dict(run) if is_dict else run)[1:-1]
+
 def stuff(obj, data=None):
     return _serialize_custom(obj, data=data)
 def unstuff(obj):
@@ -39,63 +138,165 @@ def unstuff(obj):
 def _serialize_custom(obj: Any, data:Any=None) -> Any:
     if obj is None:
         return None
-    
     if data is not None:
         return {
             '__py__': get_obj_addr(obj),
             '__data__': _serialize_custom(data)
         }
-    
+    return _serialize_value(obj)
+
+
+JSON_SCALAR_TYPES = frozenset({str, int, float, bool, type(None)})
 
+# type -> handler for objects whose address and serializer depend only on
+# their type; clear after changing CUSTOM_SERIALIZERS at runtime
+SERIALIZER_DISPATCH = {}
+
+def _serialize_value(obj):
+    cls = type(obj)
+    if cls in JSON_SCALAR_TYPES:
+        return obj
+    if cls is list or cls is dict:
+        return _serialize_container(obj)
     if isinstance(obj, (str, int, float, bool)):
         return obj
-    
-    if isinstance(obj, dict):
-        return {_serialize_custom(k): _serialize_custom(v) for k, v in obj.items()}
-    
-    if isinstance(obj, list):
-        return [_serialize_custom(v) for v in obj]
+    if isinstance(obj, (dict, list)):
+        return _serialize_container(obj)
+    handler = SERIALIZER_DISPATCH.get(cls)
+    if handler is None:
+        handler = _get_serializer_handler(obj)
+    return handler(obj)
+
+def _is_json_native(obj):
+    if type(obj) is dict:
+        return JSON_SCALAR_TYPES.issuperset(map(type, obj.values())) and JSON_SCALAR_TYPES.issuperset(map(type, obj))
+    return JSON_SCALAR_TYPES.issuperset(map(type, obj))
+
+def _serialize_container(root):
+    """Serialize a list/dict tree without recursion, reusing json-native leaves as they are."""
+    if type(root) in (list, dict) and _is_json_native(root):
+        return root
+    is_dict = isinstance(root, dict)
+    out_root = {} if is_dict else []
+    stack = [(iter(root.items() if is_dict else root), out_root, is_dict)]
+    scalars = JSON_SCALAR_TYPES
+    all_scalars = scalars.issuperset
+    while stack:
+        items, out, is_dict = stack[-1]
+        for item in items:
+            if is_dict:
+                key, value = item
+                if type(key) not in scalars:
+                    key = _serialize_value(key)
+            else:
+                value = item
+            cls = type(value)
+            if cls in scalars:
+                res = value
+            elif cls is dict:
+                if all_scalars(map(type, value.values())) and all_scalars(map(type, value)):
+                    res = value
+                else:
+                    res = {}
+                    if is_dict:
+                        out[key] = res
+                    else:
+                        out.append(res)
+                    stack.append((iter(value.items()), res, True))
+                    break
+            elif cls is list:
+                if all_scalars(map(type, value)):
+                    res = value
+                else:
+                    res = []
+                    if is_dict:
+                        out[key] = res
+                    else:
+                        out.append(res)
+                    stack.append((iter(value), res, False))
+                    break
+            else:
+                res = _serialize_value(value)
+            if is_dict:
+                out[key] = res
+            else:
+                out.append(res)
+        else:
+            stack.pop()
+    return out_root
 
+def _get_serializer_handler(obj):
     addr = get_obj_addr(obj)
+    handler = None
     if addr in CUSTOM_SERIALIZERS:
-        return CUSTOM_SERIALIZERS[addr](obj)
-
-    if hasattr(obj, 'to_serialized') and callable(obj.to_serialized) and not inspect.isclass(obj):
-        return {
-            '__py__': addr,
-            '__data__': _serialize_custom(obj.to_serialized())
-        }
-    
-    if hasattr(obj, 'to_dict') and callable(obj.to_dict) and not inspect.isclass(obj):
-        return {
-            '__py__': addr,
-            '__data__': _serialize_custom(obj.to_dict())
-        }
-    
-    if isinstance(obj, type):
-        return ClassSerializer.serialize(obj)
-    
-    if inspect.isgenerator(obj):
-        return GeneratorSerializer.serialize(obj)
-
-    if is_function(obj):
-        return FunctionSerializer.serialize(obj)
-    
-    # Handle class instances
-    if hasattr(obj, '__dict__'):
-        return InstanceSerializer.serialize(obj)
+        handler = CUSTOM_SERIALIZERS[addr]
+    elif hasattr(obj, 'to_serialized') and callable(obj.to_serialized) and not inspect.isclass(obj):
+        handler = lambda obj: {'__py__': addr, '__data__': _serialize_custom(obj.to_serialized())}
+    elif hasattr(obj, 'to_dict') and callable(obj.to_dict) and not inspect.isclass(obj):
+        handler = lambda obj: {'__py__': addr, '__data__': _serialize_custom(obj.to_dict())}
+    elif isinstance(obj, type):
+        handler = ClassSerializer.serialize
+    elif inspect.isgenerator(obj):
+        handler = GeneratorSerializer.serialize
+    elif is_function(obj):
+        handler = FunctionSerializer.serialize
+    elif hasattr(obj, '__dict__'):
+        handler = InstanceSerializer.serialize
+    elif hasattr(obj, '__reduce__'):
+        handler = ReducerSerializer.serialize
+    else:
+        log.warning(f"Unsupported object type: {type(obj)}")
+        return lambda obj: obj
 
-    if hasattr(obj, '__reduce__'):
-        return ReducerSerializer.serialize(obj)
-    
-    log.warning(f"Unsupported object type: {type(obj)}")
-    return obj
+    # classes, functions and wrapped callables have per-object addresses
+    if not callable(obj) and '__name__' not in getattr(obj, '__dict__', {}):
+        SERIALIZER_DISPATCH[type(obj)] = handler
+    return handler
 
 
 ### Deserializing
 
 def deserialize_custom(serialized_str: str) -> Any:
-    return _deserialize_custom(json.loads(serialized_str))
+    return _deserialize_custom(json_loads(serialized_str))
+
+
+## json backends
+#
+# Only parsing is pluggable: serialize_custom always writes with stdlib json,
+# whose output (separators, ascii escaping, float repr) the other libraries
+# don't reproduce byte for byte, so keys keep hashing the same.
+
+JSON_BACKENDS = ('orjson', 'ujson', 'json')
+JSON_BACKEND = None  # None picks the fastest installed backend
+
+def set_json_backend(backend: str = None):
+    global JSON_BACKEND
+    if backend is not None and backend not in JSON_BACKENDS:
+        raise ValueError(f"Invalid json backend: {backend}. Choose one of: {', '.join(JSON_BACKENDS)}")
+    JSON_BACKEND = backend
+
+def get_json_backend() -> str:
+    return JSON_BACKEND if JSON_BACKEND is not None else get_fastest_json_backend()
+
+@fcache
+def get_fastest_json_backend() -> str:
+    for backend in JSON_BACKENDS[:-1]:
+        try:
+            importlib.import_module(backend)
+            return backend
+        except ImportError:
+            pass
+    return 'json'
+
+def json_loads(data, backend: str = None) -> Any:
+    backend = backend or get_json_backend()
+    if backend != 'json':
+        try:
+            return importlib.import_module(backend).loads(data)
+        except ValueError:
+            # NaN/Infinity and ints beyond 64 bits are only read by stdlib json
+            pass
+    return json.loads(data)
 
 def _deserialize_object_data(obj, obj_data: Any) -> Any:
     if hasattr(obj, 'from_serialized') and callable(obj.from_serialized):
@@ -112,45 +313,122 @@ def _deserialize_object_data(obj, obj_data: Any) -> Any:
 
 
 def _deserialize_custom(data: Any) -> Any:
+    cls = type(data)
+    if cls is list or cls is dict:
+        return _deserialize_container(data)
     if isinstance(data, (str, int, float, bool, type(None))):
         return data
-    
-    if isinstance(data, list):
-        return [_deserialize_custom(v) for v in data]
-    
-    if isinstance(data, dict):
-        pytype = data.get('__pytype__')
-        addr = data.get('__py__')
-        
-        if pytype == 'instance':
-            return InstanceSerializer.deserialize(data)
-        
-        if addr and addr in CUSTOM_DESERIALIZERS:
-            return CUSTOM_DESERIALIZERS[addr](data)
-        
-        if pytype == 'reducer':
-            return ReducerSerializer.deserialize(data)
-        
-        if pytype in {'function', 'classmethod', 'instancemethod'}:
-            return FunctionSerializer.deserialize(data)
-        
-        if pytype == 'class':
-            return ClassSerializer.deserialize(data)
-        
-        if pytype == 'generator':
-            return GeneratorSerializer.deserialize(data)
-
-        obj_data = data.get('__data__')
-        if obj_data and can_import_object(addr):
-            return _deserialize_object_data(flexible_import(addr), _deserialize_custom(obj_data))
-        
-        if '__py__' in data:
-            return flexible_import(data['__py__'])
-        
-        return {_deserialize_custom(k): _deserialize_custom(v) for k, v in data.items()}
-    
+    if isinstance(data, (list, dict)):
+        return _deserialize_container(data)
     return data
 
+def _is_tagged(data):
+    return '__py__' in data or '__pytype__' in data
+
+def _deserialize_container(root):
+    """Deserialize a parsed list/dict tree without recursion, reusing json-native leaves as they are."""
+    if type(root) is dict and _is_tagged(root):
+        return _deserialize_tagged(root)
+    if type(root) in (list, dict) and _is_json_native(root):
+        return root
+    is_dict = isinstance(root, dict)
+    out_root = {} if is_dict else []
+    stack = [(iter(root.items() if is_dict else root), out_root, is_dict)]
+    scalars = JSON_SCALAR_TYPES
+    all_scalars = scalars.issuperset
+    while stack:
+        items, out, is_dict = stack[-1]
+        for item in items:
+            if is_dict:
+                key, value = item
+                if type(key) not in scalars:
+                    key = _deserialize_custom(key)
+            else:
+                value = item
+            cls = type(value)
+            if cls in scalars:
+                res = value
+            elif cls is dict:
+                if '__py__' in value or '__pytype__' in value:
+                    res = _deserialize_tagged(value)
+                elif all_scalars(map(type, value.values())):
+                    res = value
+                else:
+                    res = {}
+                    if is_dict:
+                        out[key] = res
+                    else:
+                        out.append(res)
+                    stack.append((iter(value.items()), res, True))
+                    break
+            elif cls is list:
+                if all_scalars(map(type, value)):
+                    res = value
+                else:
+                    res = []
+                    if is_dict:
+                        out[key] = res
+                    else:
+                        out.append(res)
+                    stack.append((iter(value), res, False))
+                    break
+            else:
+                res = _deserialize_custom(value)
+            if is_dict:
+                out[key] = res
+            else:
+                out.append(res)
+        else:
+            stack.pop()
+    return out_root
+
+IMPORT_CACHE = {}
+
+def import_cached(addr):
+    """flexible_import, memoized for addresses outside __main__ (which may be redefined)."""
+    try:
+        return IMPORT_CACHE[addr]
+    except KeyError:
+        pass
+    try:
+        obj = flexible_import(addr)
+    except ImportError:
+        return None
+    if obj is not None and not addr.startswith('__main__.'):
+        IMPORT_CACHE[addr] = obj
+    return obj
+
+def _deserialize_tagged(data: dict) -> Any:
+    pytype = data.get('__pytype__')
+    addr = data.get('__py__')
+
+    if pytype == 'instance':
+        return InstanceSerializer.deserialize(data)
+
+    if addr and addr in CUSTOM_DESERIALIZERS:
+        return CUSTOM_DESERIALIZERS[addr](data)
+
+    if pytype == 'reducer':
+        return ReducerSerializer.deserialize(data)
+
+    if pytype in {'function', 'classmethod', 'instancemethod'}:
+        return FunctionSerializer.deserialize(data)
+
+    if pytype == 'class':
+        return ClassSerializer.deserialize(data)
+
+    if pytype == 'generator':
+        return GeneratorSerializer.deserialize(data)
+
+    obj_data = data.get('__data__')
+    if obj_data and addr is not None and import_cached(addr) is not None:
+        return _deserialize_object_data(import_cached(addr), _deserialize_custom(obj_data))
+
+    if '__py__' in data:
+        return import_cached(data['__py__'])
+
+    return {_deserialize_custom(k): _deserialize_custom(v) for k, v in data.items()}
+
 
 
 ## custom object de/serializers
@@ -280,6 +558,8 @@ class NumpySerializer(CustomSerializer):
         }
         if obj.dtype.kind == 'O':
             outd['__data__']['values'] = [_serialize_custom(item) for item in obj.flatten()]
+        elif raw_bytes_active():
+            outd['__data__']['bytes'] = obj.tobytes()
         else:
             outd['__data__']['bytes'] = encode(obj.tobytes(), compress=False, b64=True, as_string=True)
         return outd
@@ -293,7 +573,9 @@ class NumpySerializer(CustomSerializer):
         dtype = data['__data__']['dtype']
         shape = data['__data__']['shape']
         if 'bytes' in data['__data__']:
-            arr_bytes = decode(data['__data__']['bytes'], compress=False, b64=True)
+            arr_bytes = data['__data__']['bytes']
+            if not isinstance(arr_bytes, bytes):
+                arr_bytes = decode(arr_bytes, compress=False, b64=True)
             return np.frombuffer(arr_bytes, dtype=dtype).reshape(shape)
         else:
             return np.array([_deserialize_custom(item) for item in data['__data__']['values']], dtype=dtype).reshape(shape)
@@ -383,11 +665,13 @@ class BytesSerializer(CustomSerializer):
         return {
             '__py__': get_obj_addr(obj),
             '__pytype__': 'bytes',
-            '__data__': encode(obj, compress=False, b64=True, as_string=True)
+            '__data__': obj if raw_bytes_active() else encode(obj, compress=False, b64=True, as_string=True)
         }
 
     @staticmethod
     def deserialize(data):
+        if isinstance(data['__data__'], bytes):
+            return data['__data__']
         return decode(data['__data__'], compress=False, b64=True)
 
 
@@ -1,4 +1,5 @@
 from . import *
+import struct
 
 # try:
 #     import jsonpickle
@@ -43,6 +44,56 @@ def deserialize_pickle(data):
     return pickle.loads(data)
 
 
+PICKLE5_MAGIC = b"HSP5"
+PICKLE5_ALIGN = 64
+
+def serialize_pickle5(obj):
+    """
+    Pickle with protocol 5, keeping large buffers (numpy arrays, pandas blocks)
+    out of band. The result is a framed container:
+
+        magic | num buffers | pickle length | buffer lengths | pickle | buffers
+
+    with each buffer aligned to PICKLE5_ALIGN bytes, so that deserializing
+    from a memory map can hand the buffers back without copying them.
+    """
+    buffers = []
+    data = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+    raws = [buf.raw() for buf in buffers]
+    header = struct.pack(
+        f">4sIQ{len(raws)}Q", PICKLE5_MAGIC, len(raws), len(data), *(len(raw) for raw in raws)
+    )
+    parts = [header, data]
+    offset = len(header) + len(data)
+    for raw in raws:
+        pad = -offset % PICKLE5_ALIGN
+        parts.append(b"\0" * pad)
+        parts.append(raw)
+        offset += pad + len(raw)
+    return b"".join(parts)
+
+def deserialize_pickle5(data):
+    """
+    Load a container written by serialize_pickle5. Out-of-band buffers are
+    reattached as views into data rather than copies, so arrays read this way
+    are read-only and keep data (e.g. a memory map) alive.
+    """
+    view = memoryview(data)
+    if bytes(view[:4]) != PICKLE5_MAGIC:
+        return pickle.loads(view)
+    num_buffers, data_len = struct.unpack_from(">IQ", view, 4)
+    lengths = struct.unpack_from(f">{num_buffers}Q", view, 16)
+    offset = 16 + 8 * num_buffers
+    pickled = view[offset : offset + data_len]
+    offset += data_len
+    buffers = []
+    for length in lengths:
+        offset += -offset % PICKLE5_ALIGN
+        buffers.append(view[offset : offset + length])
+        offset += length
+    return pickle.loads(pickled, buffers=buffers)
+
+
 
 def serialize_jsonpickle(obj):
     import jsonpickle
@@ -4,8 +4,10 @@ import functools
 def get_serializer(serializer: SERIALIZER_TYPES = DEFAULT_SERIALIZER):
     serializer_dict = {
         "hashstash": serialize_custom,
+        "hashstash_bin": serialize_custom_binary,
         "jsonpickle": serialize_jsonpickle,
         "pickle": serialize_pickle,
+        "pickle5": serialize_pickle5,
     }
     
     return serializer_dict.get(serializer)
@@ -13,8 +15,10 @@ def get_serializer(serializer: SERIALIZER_TYPES = DEFAULT_SERIALIZER):
 def get_deserializer(serializer: SERIALIZER_TYPES = DEFAULT_SERIALIZER):
     deserializer_dict = {
         "hashstash": deserialize_custom,
+        "hashstash_bin": deserialize_custom_binary,
         "jsonpickle": deserialize_jsonpickle,
         "pickle": deserialize_pickle,
+        "pickle5": deserialize_pickle5,
     }
     
     return deserializer_dict.get(serializer)
@@ -5,4 +5,6 @@ from .wrappers import *
 from .misc import *
 from .pmap import *
 from .encodings import *
-from .dataframes import *
\ No newline at end of file
+from .dataframes import *
+from .indexes import *
+from .sql import *
\ No newline at end of file
@@ -164,11 +164,16 @@ class MetaDataFrame:
         else:
             return self.df.write_csv(path, **kwargs)
 
-    def to_parquet(self, path: str, **kwargs):
-        if self.is_pandas:
-            return self.df.to_parquet(path, **kwargs)
-        else:
+    def to_parquet(self, path: str, typed: bool = True, **kwargs):
+        if not typed:
+            # string-cast frames keep the pandas/polars writer, so keys holding
+            # them serialize to the same bytes as before
+            if self.is_pandas:
+                return self.df.to_parquet(path, **kwargs)
             return self.df.write_parquet(path, **kwargs)
+        import pyarrow.parquet as pq
+
+        return pq.write_table(self.to_arrow_table(), path, **kwargs)
 
     def to_json(self, path: str = None, orient: str = "records", **kwargs):
         if self.is_pandas:
@@ -186,12 +191,58 @@ class MetaDataFrame:
                 "Polars does not have a native to_excel method. Consider converting to pandas first."
             )
 
-    def to_feather(self, path: str, **kwargs):
-        if self.is_pandas:
-            return self.df.to_feather(path, **kwargs)
+    def to_feather(self, path: str, typed: bool = True, **kwargs):
+        if not typed:
+            return self.to_pandas().df.to_feather(path, **kwargs)
+        import pyarrow.feather as feather
+
+        return feather.write_feather(self.to_arrow_table(), path, **kwargs)
+
+    def to_arrow_table(self):
+        """Convert to a pyarrow Table keeping native dtypes.
+
+        Object columns arrow cannot type (mixed ints and strings, ...) fall back
+        to strings column by column, and columns of dicts or lists arrow would
+        not give back as written (dicts with differing keys become one merged
+        struct) are stored as JSON; the rest are converted as is. The schema
+        metadata records the write so readers can skip reinfer_types.
+        """
+        import pyarrow as pa
+
+        string_columns, json_columns = [], []
+        if not self.is_pandas:
+            table = self.df.to_arrow()
         else:
-            return self.to_pandas().to_feather(path, **kwargs)
-            # return self.df.write_ipc(path, **kwargs)
+            df = self.df
+            json_columns = get_nested_mixed_columns(df)
+            if json_columns:
+                df = jsonify_columns(df, json_columns)
+            try:
+                table = pa.Table.from_pandas(df)
+            except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+                df, string_columns = stringify_mixed_columns(df)
+                table = pa.Table.from_pandas(df)
+        schema = {
+            "version": 1,
+            "string_columns": [str(c) for c in string_columns],
+            "json_columns": [str(c) for c in json_columns],
+        }
+        metadata = {**(table.schema.metadata or {}), DATAFRAME_SCHEMA_KEY: json.dumps(schema)}
+        return table.replace_schema_metadata(metadata)
+
+    def to_arrow(self, path_or_buffer, compression=None, **kwargs):
+        """Write as an Arrow IPC file, uncompressed (readable zero-copy) or lz4/zstd framed."""
+        import pyarrow as pa
+
+        table = self.to_arrow_table()
+        options = pa.ipc.IpcWriteOptions(compression=compression, **kwargs)
+        sink = pa.OSFile(path_or_buffer, "wb") if isinstance(path_or_buffer, str) else path_or_buffer
+        try:
+            with pa.ipc.new_file(sink, table.schema, options=options) as writer:
+                writer.write_table(table)
+        finally:
+            if isinstance(path_or_buffer, str):
+                sink.close()
 
     def to_sql(self, name: str, con, **kwargs):
         if self.is_pandas:
@@ -274,10 +325,12 @@ class MetaDataFrame:
         return serialize(self.stuff(io_engine, string_values, **kwargs))
 
     def stuff(self, io_engine: str = None, string_values: bool = None, **kwargs):
-        from ..serializers import stuff
+        from ..serializers import stuff, raw_bytes_active, typed_frames_active
 
         buffer = io.BytesIO()
         io_engine = get_io_engine(io_engine)
+        if string_values is None and io_engine in {"feather", "parquet"}:
+            string_values = not typed_frames_active()
         self.write(
             buffer,
             io_engine=io_engine,
@@ -287,7 +340,7 @@ class MetaDataFrame:
         serialized_df = buffer.getvalue()
         return stuff(
             {
-                "data": b64encode(serialized_df).decode(),
+                "data": serialized_df if raw_bytes_active() else b64encode(serialized_df).decode(),
                 "df_engine": self.df_engine,
                 "io_engine": io_engine,
             }
@@ -309,7 +362,9 @@ class MetaDataFrame:
         from ..serializers import unstuff
 
         unstuffed_data = unstuff(stuffed_data)
-        serialized_df_b = b64decode(unstuffed_data["data"].encode())
+        serialized_df_b = unstuffed_data["data"]
+        if not isinstance(serialized_df_b, bytes):
+            serialized_df_b = b64decode(serialized_df_b.encode())
         io_engine = unstuffed_data["io_engine"]
         df_engine = unstuffed_data["df_engine"]
         buffer = io.BytesIO(serialized_df_b)
@@ -343,9 +398,6 @@ class MetaDataFrame:
             path_or_buffer = path_or_buffer + "." + io_engine
 
         log.debug(f"writing with {io_engine}")
-        if io_engine in {"feather", "parquet"}:
-            string_values = True
-
         if string_values:
             self = self.applymap(str)
 
@@ -359,7 +411,7 @@ class MetaDataFrame:
         elif io_engine == "parquet":
             if compression not in {'snappy', 'gzip', 'brotli', None}:
                 compression = None
-            return self.to_parquet(path_or_buffer, compression=compression, **kwargs)
+            return self.to_parquet(path_or_buffer, typed=not string_values, compression=compression, **kwargs)
         elif io_engine == "json":
             if compression not in {'infer', 'gzip', 'bz2', 'zip', 'xz', None}:
                 compression = None
@@ -367,17 +419,21 @@ class MetaDataFrame:
         elif io_engine == "feather":
             if compression not in {'zstd', 'lz4', 'uncompressed'}:
                 compression = None
-            return self.to_feather(path_or_buffer, compression=compression, **kwargs)
+            return self.to_feather(path_or_buffer, typed=not string_values, compression=compression, **kwargs)
         elif io_engine == "pickle":
             if compression not in {'infer', 'gzip', 'bz2', 'zip', 'xz', None}:
                 compression = None
             return self.to_pandas().df.to_pickle(path_or_buffer, compression=compression, **kwargs)
+        elif io_engine == "arrow":
+            if compression not in {'lz4', 'zstd', None}:
+                compression = None
+            return self.to_arrow(path_or_buffer, compression=compression, **kwargs)
         else:
             raise ValueError(f"Unsupported I/O engine: {io_engine}")
 
     @classmethod
     def read(
-        cls, path_or_buffer, io_engine: str = None, df_engine: str = None, compression=None, **kwargs
+        cls, path_or_buffer, io_engine: str = None, df_engine: str = None, compression=None, arrow_dtypes=False, **kwargs
     ):
         """
         Read a DataFrame from a file or buffer using the specified I/O engine.
@@ -387,6 +443,8 @@ class MetaDataFrame:
             io_engine (str, optional): The I/O engine to use. If None, it will be inferred from the file extension.
             df_engine (str, optional): The DataFrame engine to use (pandas or polars).
             compression (str, optional): Compression to use (e.g., 'gzip', 'bz2', 'zip', 'xz').
+            arrow_dtypes (bool): For arrow, feather and parquet files read into pandas,
+                keep the columns as Arrow-backed dtypes instead of converting to numpy.
             **kwargs: Additional keyword arguments to pass to the specific read method.
 
         Returns:
@@ -404,21 +462,32 @@ class MetaDataFrame:
 
         log.debug(f"reading with {df_engine} and {io_engine}")
 
-        if df_engine == "pandas":
+        if io_engine in ARROW_IO_ENGINES:
+            table = read_arrow_table(path_or_buffer, io_engine=io_engine, **kwargs)
+            if df_engine == "pandas":
+                import pandas as pd
+
+                df = table.to_pandas(types_mapper=pd.ArrowDtype if arrow_dtypes else None)
+                # dtypes come back from the pandas schema metadata; only files
+                # from before typed writes (all strings) need reinferring
+                if io_engine != "arrow" and not has_schema_metadata(table):
+                    reinfer_types(df)
+                unjsonify_columns(df, get_schema_metadata(table).get("json_columns", []))
+            else:
+                import polars as pl
+
+                df = pl.from_arrow(table)
+        elif df_engine == "pandas":
             import pandas as pd
 
             if io_engine == "csv":
                 if compression not in {'infer', 'gzip', 'bz2', 'zip', 'xz', None}:
                     compression = None
                 df = pd.read_csv(path_or_buffer, compression=compression, **kwargs)
-            elif io_engine == "parquet":
-                df = pd.read_parquet(path_or_buffer, **kwargs)
             elif io_engine == "json":
                 if compression not in {'infer', 'gzip', 'bz2', 'zip', 'xz', None}:
                     compression = None
                 df = pd.read_json(path_or_buffer, compression=compression, **kwargs)
-            elif io_engine == "feather":
-                df = pd.read_feather(path_or_buffer, **kwargs)
             elif io_engine == "pickle":
                 if compression not in {'infer', 'gzip', 'bz2', 'zip', 'xz', None}:
                     compression = None
@@ -426,7 +495,8 @@ class MetaDataFrame:
             else:
                 raise ValueError(f"Unsupported I/O engine: {io_engine}")
 
-            reinfer_types(df)
+            if io_engine != "pickle":
+                reinfer_types(df)
         else:  # polars
             import polars as pl
 
@@ -434,14 +504,10 @@ class MetaDataFrame:
                 if compression not in {'gzip', 'zlib', None}:
                     compression = None
                 df = pl.read_csv(path_or_buffer, infer_schema_length=10000, compression=compression, **kwargs)
-            elif io_engine == "parquet":
-                df = pl.read_parquet(path_or_buffer, **kwargs)
             elif io_engine == "json":
                 if compression not in {'gzip', 'zlib', None}:
                     compression = None
                 df = pl.read_json(path_or_buffer, infer_schema_length=10000, compression=compression, **kwargs)
-            elif io_engine == "feather":
-                df = pl.read_ipc(path_or_buffer, **kwargs)
             elif io_engine == "pickle":
                 df = cls.read(path_or_buffer, io_engine=io_engine, df_engine="pandas")
                 df = pl.DataFrame(df)
@@ -498,6 +564,96 @@ class MetaDataFrame:
 
 
 
+def stringify_mixed_columns(df):
+    """Cast object columns arrow cannot type to strings (nulls kept).
+
+    Returns a shallow copy of df and the list of columns that were cast.
+    """
+    import pyarrow as pa
+
+    df = df.copy(deep=False)
+    string_columns = []
+    for column in df.columns:
+        col = df[column]
+        if col.dtype != object:
+            continue
+        try:
+            pa.array(col, from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            df[column] = col.astype(str).where(col.notna(), None)
+            string_columns.append(column)
+    return df, string_columns
+
+
+def get_nested_mixed_columns(df):
+    """Object columns of dicts or lists that arrow would not give back as written."""
+    import pyarrow as pa
+    from pandas.api.types import infer_dtype
+
+    columns = []
+    for column in df.columns:
+        col = df[column]
+        if col.dtype != object or not infer_dtype(col, skipna=True).startswith("mixed"):
+            continue
+        values = col.dropna().tolist()
+        if not any(isinstance(v, (dict, list)) for v in values):
+            continue
+        try:
+            if pa.array(values).to_pylist() == values:
+                continue
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            pass
+        columns.append(column)
+    return columns
+
+
+def jsonify_columns(df, columns):
+    """Shallow copy of df with the given columns' values as JSON strings (nulls kept)."""
+    df = df.copy(deep=False)
+    for column in columns:
+        col = df[column]
+        df[column] = col.map(lambda v: json.dumps(v, default=str)).where(col.notna(), None)
+    return df
+
+
+def unjsonify_columns(df, columns):
+    for column in columns:
+        if column in df.columns:
+            col = df[column]
+            df[column] = col.map(json.loads, na_action="ignore")
+
+
+def read_arrow_table(path_or_buffer, io_engine="arrow", **kwargs):
+    """Read an arrow, feather or parquet file as a pyarrow Table, memory-mapped if given a path."""
+    import pyarrow as pa
+
+    if isinstance(path_or_buffer, str):
+        source = pa.memory_map(path_or_buffer, "r")
+    elif isinstance(path_or_buffer, io.BytesIO):
+        source = pa.BufferReader(path_or_buffer.getbuffer())
+    else:
+        source = path_or_buffer
+
+    if io_engine == "parquet":
+        import pyarrow.parquet as pq
+
+        return pq.read_table(source, **kwargs)
+    if io_engine == "feather":
+        import pyarrow.feather as feather
+
+        return feather.read_table(source, **kwargs)
+    return pa.ipc.open_file(source).read_all()
+
+
+def has_schema_metadata(table):
+    return DATAFRAME_SCHEMA_KEY in (table.schema.metadata or {})
+
+
+def get_schema_metadata(table):
+    metadata = (table.schema.metadata or {}).get(DATAFRAME_SCHEMA_KEY)
+    return json.loads(metadata) if metadata else {}
+
+
 def reset_index(df, prefix_columns=None):
     if has_index(df):  # pandas
         index = [x for x in df.index.names if x is not None]
@@ -2,86 +2,551 @@ from . import *
 import zlib
 import base64
 import hashlib
+import io
+import struct
+from concurrent.futures import ThreadPoolExecutor
 
 
 @log.debug
-def encode(data: Union[str, bytes], b64=DEFAULT_B64, compress=DEFAULT_COMPRESS, as_string=False):
+def encode(data: Union[str, bytes], b64=DEFAULT_B64, compress=DEFAULT_COMPRESS, as_string=False, **compress_opts):
     if not isinstance(data, (str, bytes)):
         raise ValueError("Input data must be either a string or bytes.")
     data_b = data.encode() if isinstance(data, str) else data
-    return _encode(data_b, b64=b64 or as_string, compress=compress, as_string=as_string)
+    return _encode(data_b, b64=b64 or as_string, compress=compress, as_string=as_string, **compress_opts)
 
-def _encode(data_b: bytes, b64=DEFAULT_B64, compress=DEFAULT_COMPRESS, as_string=False):
+def _encode(data_b: bytes, b64=DEFAULT_B64, compress=DEFAULT_COMPRESS, as_string=False, **compress_opts):
     if compress:
-        data_b = encode_compressed(data_b, compress)
+        data_b = encode_compressed(data_b, compress, **compress_opts)
     if b64:
         data_b = encode_b64(data_b)
     return data_b if not as_string else data_b.decode('utf-8')
 
 @log.debug
-def decode(data, b64=DEFAULT_B64, compress=DEFAULT_COMPRESS, as_string=False):
+def decode(data, b64=DEFAULT_B64, compress=DEFAULT_COMPRESS, as_string=False, **compress_opts):
     data_b = data.encode() if isinstance(data, str) else data
-    data_b = _decode(data_b, b64=b64, compress=compress)
+    data_b = _decode(data_b, b64=b64, compress=compress, **compress_opts)
     return data_b.decode('utf-8') if as_string else data_b
 
-def _decode(data_b, b64=DEFAULT_B64, compress=DEFAULT_COMPRESS):
+def _decode(data_b, b64=DEFAULT_B64, compress=DEFAULT_COMPRESS, **compress_opts):
     if b64:
         data_b = decode_b64(data_b)
     if compress:
-        data_b = decode_compressed(data_b, compress)
+        data_b = decode_compressed(data_b, compress, **compress_opts)
     return data_b
 
-def encode_compressed(data, compress_type=DEFAULT_COMPRESS):
+def encode_compressed(data, compress_type=DEFAULT_COMPRESS, level=None, zstd_dict=None):
     compress_type = get_compresser(compress_type)
     if compress_type == RAW_NO_COMPRESS:
         return data
     try:
-        if compress_type == 'zlib':
-            return zlib.compress(data)
-        elif compress_type == 'blosc':
-            import blosc
-            return blosc.compress(data)
-        elif compress_type == 'lz4':
-            import lz4.block
-            return lz4.block.compress(data)
-        elif compress_type == 'gzip':
-            import gzip
-            return gzip.compress(data, mtime=0)  # Ensure deterministic output by setting mtime to 0
-        elif compress_type == 'bz2':
-            import bz2
-            return bz2.compress(data)
-        else:
-            raise ValueError(f"Unsupported compression type: {compress_type}")
+        if use_compress_blocks(data, compress_type):
+            return encode_compressed_blocks(data, compress_type, level=level, zstd_dict=zstd_dict)
+        return _compress(data, compress_type, level=level, zstd_dict=zstd_dict)
     except Exception as e:
         log.error(f"Compression error: {e}")
         return data
 
-def decode_compressed(data, compress_type=DEFAULT_COMPRESS):
+def _compress(data, compress_type, level=None, zstd_dict=None):
+    if compress_type == 'zlib':
+        return zlib.compress(data)
+    elif compress_type == 'blosc':
+        import blosc
+        set_blosc_threads(blosc)
+        return blosc.compress(data)
+    elif compress_type == 'lz4':
+        import lz4.block
+        return lz4.block.compress(data)
+    elif compress_type == 'gzip':
+        import gzip
+        return gzip.compress(data, mtime=0)  # Ensure deterministic output by setting mtime to 0
+    elif compress_type == 'bz2':
+        import bz2
+        return bz2.compress(data)
+    elif compress_type == 'zstd':
+        return get_zstd_compressor(level, zstd_dict).compress(data)
+    else:
+        raise ValueError(f"Unsupported compression type: {compress_type}")
+
+def decode_compressed(data, compress_type=DEFAULT_COMPRESS, zstd_dicts=None):
     compress_type = get_compresser(compress_type)
     if compress_type == RAW_NO_COMPRESS:
         return data
     try:
-        if compress_type == 'zlib':
-            return zlib.decompress(data)
-        elif compress_type == 'blosc':
-            import blosc
-            return blosc.decompress(data)
-        elif compress_type == 'lz4':
-            import lz4.block
-            return lz4.block.decompress(data)
-        elif compress_type == 'gzip':
-            import gzip
-            return gzip.decompress(data)
-        elif compress_type == 'bz2':
-            import bz2
-            return bz2.decompress(data)
-        else:
-            raise ValueError(f"Unsupported compression type: {compress_type}")
+        if bytes(data[:4]) == COMPRESS_BLOCKS_MAGIC:
+            return decode_compressed_blocks(data, compress_type, zstd_dicts=zstd_dicts)
+        return _decompress(data, compress_type, zstd_dicts=zstd_dicts)
     except Exception as e:
         log.error(f"Decompression error: {e}")
         raise e
         return data
 
+def _decompress(data, compress_type, zstd_dicts=None):
+    if compress_type == 'zlib':
+        return zlib.decompress(data)
+    elif compress_type == 'blosc':
+        import blosc
+        set_blosc_threads(blosc)
+        return blosc.decompress(data)
+    elif compress_type == 'lz4':
+        if bytes(data[:4]) == LZ4_FRAME_MAGIC:
+            import lz4.frame
+            return lz4.frame.decompress(data)
+        import lz4.block
+        return lz4.block.decompress(data)
+    elif compress_type == 'gzip':
+        import gzip
+        return gzip.decompress(data)
+    elif compress_type == 'bz2':
+        import bz2
+        return bz2.decompress(data)
+    elif compress_type == 'zstd':
+        return decompress_zstd(data, zstd_dicts)
+    else:
+        raise ValueError(f"Unsupported compression type: {compress_type}")
+
+## multi-threaded block compression
+
+# Large values are split into blocks compressed independently on a thread
+# pool (these codecs release the GIL), framed as:
+#
+#   magic | block size | total size | num blocks | compressed block sizes | blocks
+#
+# blosc is left whole and runs its own threads instead.
+COMPRESS_BLOCKS_MAGIC = b"\x00HSB"
+BLOCK_COMPRESSERS = {'zlib', 'lz4', 'gzip', 'bz2', 'zstd'}
+_blocks_header = struct.Struct("<4sIQI")
+
+COMPRESS_THREADS = None  # None uses one thread per core
+
+def set_compress_threads(num_threads: int = None):
+    global COMPRESS_THREADS
+    if num_threads is not None and num_threads < 1:
+        raise ValueError(f"Invalid number of compression threads: {num_threads}")
+    COMPRESS_THREADS = num_threads
+
+def get_compress_threads() -> int:
+    return COMPRESS_THREADS if COMPRESS_THREADS is not None else (os.cpu_count() or 1)
+
+_compress_executors = {}
+_compress_executors_lock = threading.Lock()
+
+def get_compress_executor(num_threads):
+    # keyed by pid too: a forked child can't use its parent's threads
+    key = (os.getpid(), num_threads)
+    with _compress_executors_lock:
+        if key not in _compress_executors:
+            _compress_executors[key] = ThreadPoolExecutor(
+                max_workers=num_threads, thread_name_prefix="hashstash-compress"
+            )
+        return _compress_executors[key]
+
+def set_blosc_threads(blosc):
+    num_threads = get_compress_threads()
+    if getattr(set_blosc_threads, 'num_threads', None) != num_threads:
+        blosc.set_nthreads(num_threads)
+        set_blosc_threads.num_threads = num_threads
+
+def use_compress_blocks(data, compress_type):
+    # decided by size alone, so the same data always encodes to the same bytes
+    # (keys are looked up by their encoding), whatever the thread setting
+    return (
+        compress_type in BLOCK_COMPRESSERS
+        and len(data) >= COMPRESS_BLOCK_SIZE * COMPRESS_BLOCK_MIN_BLOCKS
+    )
+
+def map_compress_blocks(func, blocks):
+    num_threads = get_compress_threads()
+    if num_threads == 1:
+        return list(map(func, blocks))
+    return list(get_compress_executor(num_threads).map(func, blocks))
+
+def encode_compressed_blocks(data, compress_type, level=None, zstd_dict=None, block_size=COMPRESS_BLOCK_SIZE):
+    view = memoryview(data).cast('B')
+    blocks = [view[i : i + block_size] for i in range(0, view.nbytes, block_size)]
+    compressed = map_compress_blocks(
+        lambda block: _compress(block, compress_type, level=level, zstd_dict=zstd_dict),
+        blocks,
+    )
+    header = _blocks_header.pack(COMPRESS_BLOCKS_MAGIC, block_size, view.nbytes, len(compressed))
+    sizes = struct.pack(f"<{len(compressed)}Q", *(len(block) for block in compressed))
+    return b"".join([header, sizes, *compressed])
+
+def decode_compressed_blocks(data, compress_type, zstd_dicts=None):
+    view = memoryview(data).cast('B')
+    _magic, _block_size, total_size, num_blocks = _blocks_header.unpack_from(view)
+    pos = _blocks_header.size
+    sizes = struct.unpack_from(f"<{num_blocks}Q", view, pos)
+    pos += 8 * num_blocks
+    blocks = []
+    for size in sizes:
+        blocks.append(view[pos : pos + size])
+        pos += size
+    out = b"".join(map_compress_blocks(
+        lambda block: _decompress(block, compress_type, zstd_dicts=zstd_dicts),
+        blocks,
+    ))
+    if len(out) != total_size:
+        raise ValueError(f"Decompressed {len(out):,}B, expected {total_size:,}B")
+    return out
+
+VALUE_HEADER_MAGIC = b"\xffHS1"
+CHUNK_MANIFEST_MAGIC = b"\xffHSC"  # prefixes the manifest stored in place of a chunked value
+
+def encode_value_header(serializer, codec, flags=0):
+    """
+    Header prefixed to values in adaptive stashes:
+
+        magic | flags | len(serializer) | serializer | len(codec) | codec
+    """
+    serializer_b, codec_b = serializer.encode(), codec.encode()
+    return b"".join([
+        VALUE_HEADER_MAGIC,
+        bytes((flags, len(serializer_b))), serializer_b,
+        bytes((len(codec_b),)), codec_b,
+    ])
+
+def decode_value_header(data):
+    """Return (serializer, codec, flags, payload offset), or None if data has no header."""
+    if data[:4] != VALUE_HEADER_MAGIC:
+        return None
+    flags, n = data[4], data[5]
+    serializer = bytes(data[6 : 6 + n]).decode()
+    pos = 6 + n
+    m = data[pos]
+    codec = bytes(data[pos + 1 : pos + 1 + m]).decode()
+    return serializer, codec, flags, pos + 1 + m
+
+@fcache
+def get_adaptive_codecs():
+    """(probe codec, default codec) for adaptive stashes, by what's installed."""
+    working = get_working_compressers()
+    probe = 'lz4' if 'lz4' in working else 'zlib'
+    codec = 'zstd' if 'zstd' in working else probe
+    return probe, codec
+
+def choose_codec(data_b, zstd_dict=None):
+    """
+    Pick a codec for one value: raw for small or incompressible data, else
+    zstd (with the stash's trained dictionary if any) or the fastest installed.
+    """
+    min_size = ADAPTIVE_MIN_DICT_SIZE if zstd_dict is not None else ADAPTIVE_MIN_SIZE
+    if len(data_b) < min_size:
+        return RAW_NO_COMPRESS
+    probe_codec, codec = get_adaptive_codecs()
+    probe = data_b[:ADAPTIVE_PROBE_SIZE]
+    if zstd_dict is not None and len(data_b) < ADAPTIVE_MIN_SIZE:
+        # values this small only shrink with the dictionary, so probe with it
+        probed = get_zstd_compressor(zstd_dict=zstd_dict).compress(probe)
+    else:
+        probed = encode_compressed(probe, probe_codec)
+    if len(probed) > len(probe) * ADAPTIVE_MIN_RATIO:
+        return RAW_NO_COMPRESS
+    return 'zstd' if zstd_dict is not None else codec
+
+_zstd_local = threading.local()
+
+def get_zstd_compressor(level=None, zstd_dict=None):
+    """A per-thread ZstdCompressor for this level and dictionary (they aren't thread-safe)."""
+    import zstandard
+    level = DEFAULT_ZSTD_LEVEL if level is None else level
+    cache = _zstd_local.__dict__.setdefault('compressors', {})
+    key = (level, zstd_dict.dict_id() if zstd_dict is not None else 0)
+    if key not in cache:
+        cache[key] = zstandard.ZstdCompressor(level=level, dict_data=zstd_dict)
+    return cache[key]
+
+def get_zstd_decompressor(zstd_dict=None):
+    import zstandard
+    cache = _zstd_local.__dict__.setdefault('decompressors', {})
+    key = zstd_dict.dict_id() if zstd_dict is not None else 0
+    if key not in cache:
+        cache[key] = zstandard.ZstdDecompressor(dict_data=zstd_dict)
+    return cache[key]
+
+def decompress_zstd(data, zstd_dicts=None):
+    """
+    Decompress a zstd frame. The frame header names the dictionary it was
+    compressed with, which is looked up in zstd_dicts (a ZstdDictionaries).
+    """
+    import zstandard
+    dict_id = zstandard.get_frame_parameters(data).dict_id
+    zstd_dict = None
+    if dict_id:
+        if zstd_dicts is None:
+            raise ValueError(f"Value was compressed with zstd dictionary {dict_id}, but no dictionaries were given")
+        zstd_dict = zstd_dicts.get(dict_id)
+    decompressor = get_zstd_decompressor(zstd_dict)
+    if zstandard.get_frame_parameters(data).content_size == zstandard.CONTENTSIZE_UNKNOWN:
+        # streamed frames don't record their size up front
+        return decompressor.decompressobj().decompress(data)
+    return decompressor.decompress(data)
+
+
+class ZstdDictionaries:
+    """
+    Versioned zstd dictionaries kept in a directory as <version>.zdict files.
+
+    The newest version compresses new values; older versions are kept so
+    values written with them can still be read.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._dicts = None
+        self._latest = None
+
+    def load(self):
+        import zstandard
+        dicts, latest = {}, None
+        if os.path.isdir(self.path):
+            for fn in sorted(os.listdir(self.path)):
+                if not fn.endswith('.zdict'):
+                    continue
+                with open(os.path.join(self.path, fn), 'rb') as f:
+                    zstd_dict = zstandard.ZstdCompressionDict(f.read())
+                dicts[zstd_dict.dict_id()] = latest = zstd_dict
+        self._dicts, self._latest = dicts, latest
+        return self
+
+    @property
+    def latest(self):
+        if self._dicts is None:
+            self.load()
+        return self._latest
+
+    @property
+    def num_versions(self):
+        if self._dicts is None:
+            self.load()
+        return len(self._dicts)
+
+    def get(self, dict_id):
+        if self._dicts is None or dict_id not in self._dicts:
+            # may have been trained since, e.g. by another process
+            self.load()
+        if dict_id not in self._dicts:
+            raise ValueError(f"Unknown zstd dictionary {dict_id} in {self.path}")
+        return self._dicts[dict_id]
+
+    def train(self, samples, dict_size=DEFAULT_ZSTD_DICT_SIZE, level=None):
+        """Train a dictionary on samples (bytes), save it as the next version and return it."""
+        import zstandard
+        level = DEFAULT_ZSTD_LEVEL if level is None else level
+        zstd_dict = zstandard.train_dictionary(dict_size, list(samples), level=level)
+        os.makedirs(self.path, exist_ok=True)
+        version = self.num_versions + 1
+        tmp_path = os.path.join(self.path, f'.{version:04d}.zdict.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(zstd_dict.as_bytes())
+        os.replace(tmp_path, os.path.join(self.path, f'{version:04d}.zdict'))
+        return self.load().latest
+
+
+## streaming
+
+# codecs with incremental (de)compressors whose output the one-shot
+# encode/decode above can also read; others are buffered whole
+STREAMING_COMPRESSERS = {'zlib', 'gzip', 'bz2', 'zstd', 'lz4'}
+
+# lz4 streams are written as lz4 frames, told apart from one-shot lz4 blocks
+# by the frame magic number
+LZ4_FRAME_MAGIC = b"\x04\x22\x4d\x18"
+
+
+class LZ4FrameStreamCompressor:
+    """compressobj-like wrapper writing one lz4 frame, header included."""
+
+    def __init__(self):
+        import lz4.frame
+        self._compressor = lz4.frame.LZ4FrameCompressor()
+        self._started = False
+
+    def _begin(self):
+        if self._started:
+            return b''
+        self._started = True
+        return self._compressor.begin()
+
+    def compress(self, data):
+        return self._begin() + self._compressor.compress(data)
+
+    def flush(self):
+        return self._begin() + self._compressor.flush()
+
+def get_stream_compressor(compress_type, level=None, zstd_dict=None):
+    compress_type = get_compresser(compress_type)
+    if compress_type == 'zlib':
+        return zlib.compressobj()
+    if compress_type == 'gzip':
+        return zlib.compressobj(9, zlib.DEFLATED, 31)
+    if compress_type == 'bz2':
+        import bz2
+        return bz2.BZ2Compressor()
+    if compress_type == 'zstd':
+        return get_zstd_compressor(level, zstd_dict).compressobj()
+    if compress_type == 'lz4':
+        return LZ4FrameStreamCompressor()
+    return None
+
+def get_stream_decompressor(compress_type, first_chunk=b'', zstd_dicts=None):
+    compress_type = get_compresser(compress_type)
+    if compress_type == 'zlib':
+        return zlib.decompressobj()
+    if compress_type == 'gzip':
+        return zlib.decompressobj(31)
+    if compress_type == 'bz2':
+        import bz2
+        return bz2.BZ2Decompressor()
+    if compress_type == 'zstd':
+        import zstandard
+        dict_id = zstandard.get_frame_parameters(first_chunk).dict_id
+        zstd_dict = zstd_dicts.get(dict_id) if dict_id else None
+        return get_zstd_decompressor(zstd_dict).decompressobj()
+    if compress_type == 'lz4':
+        import lz4.frame
+        return lz4.frame.LZ4FrameDecompressor()
+    return None
+
+
+class StreamEncoder(io.RawIOBase):
+    """
+    Writable file-like object that compresses and base64-encodes whatever
+    is written to it on the way into fileobj, one chunk at a time.
+
+    The bytes written to fileobj are readable by decode(); closing the
+    encoder flushes it but leaves fileobj open. Codecs without a streaming
+    mode (blosc) are buffered and compressed whole on close.
+    """
+
+    def __init__(self, fileobj, b64=DEFAULT_B64, compress=DEFAULT_COMPRESS, **compress_opts):
+        self.fileobj = fileobj
+        self.b64 = b64
+        self.compress_type = get_compresser(compress) if compress else RAW_NO_COMPRESS
+        self.compress_opts = compress_opts
+        self._compressor = None
+        self._buffered = None
+        if self.compress_type != RAW_NO_COMPRESS:
+            if self.compress_type in STREAMING_COMPRESSERS:
+                self._compressor = get_stream_compressor(self.compress_type, **compress_opts)
+            else:
+                self._buffered = bytearray()
+        self._b64_tail = b''
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        # pickle hands over PickleBuffers for large in-band buffers
+        data = memoryview(data).cast('B')
+        if self._buffered is not None:
+            self._buffered += data
+            return data.nbytes
+        for i in range(0, data.nbytes, STREAM_CHUNK_SIZE):
+            chunk = data[i : i + STREAM_CHUNK_SIZE]
+            self._emit(self._compressor.compress(chunk) if self._compressor is not None else chunk)
+        return data.nbytes
+
+    def _emit(self, data):
+        if not data:
+            return
+        if not self.b64:
+            self.fileobj.write(data)
+            return
+        # base64 of 3-byte aligned pieces concatenates to the base64 of the whole
+        data = self._b64_tail + bytes(data)
+        cut = len(data) - len(data) % 3
+        self._b64_tail = data[cut:]
+        if cut:
+            self.fileobj.write(base64.b64encode(data[:cut]))
+
+    def close(self):
+        if self.closed:
+            return
+        if self._buffered is not None:
+            self._emit(encode_compressed(bytes(self._buffered), self.compress_type, **self.compress_opts))
+            self._buffered = None
+        elif self._compressor is not None:
+            self._emit(self._compressor.flush())
+        if self._b64_tail:
+            self.fileobj.write(base64.b64encode(self._b64_tail))
+            self._b64_tail = b''
+        super().close()
+
+
+class StreamDecoder(io.RawIOBase):
+    """
+    Readable file-like object over a value written by encode() or
+    StreamEncoder: reads fileobj chunk by chunk, undoing base64 and
+    compression as it goes.
+    """
+
+    def __init__(self, fileobj, b64=DEFAULT_B64, compress=DEFAULT_COMPRESS, chunk_size=STREAM_CHUNK_SIZE, zstd_dicts=None):
+        self.fileobj = fileobj
+        self.b64 = b64
+        self.compress_type = get_compresser(compress) if compress else RAW_NO_COMPRESS
+        self.chunk_size = chunk_size
+        self.zstd_dicts = zstd_dicts
+        self._decompressor = None
+        self._b64_tail = b''
+        self._out = b''
+        self._pos = 0
+        self._eof = False
+
+    def readable(self):
+        return True
+
+    def _read_raw(self):
+        raw = self.fileobj.read(self.chunk_size)
+        if not self.b64:
+            return raw
+        data = self._b64_tail + raw
+        cut = len(data) - len(data) % 4 if raw else len(data)
+        self._b64_tail = data[cut:]
+        return base64.b64decode(data[:cut]) if cut else b''
+
+    def _fill(self):
+        while self._pos >= len(self._out) and not self._eof:
+            data = self._read_raw()
+            if not data:
+                self._eof = True
+                if self._decompressor is not None and hasattr(self._decompressor, 'flush'):
+                    self._out, self._pos = self._decompressor.flush(), 0
+                return
+            if self.compress_type == RAW_NO_COMPRESS:
+                self._out, self._pos = data, 0
+            elif self.compress_type not in STREAMING_COMPRESSERS or (
+                self._decompressor is None and not self._is_stream_format(data)
+            ):
+                # no streaming mode, or written in blocks: decompress the whole value at once
+                rest = [data]
+                while True:
+                    more = self._read_raw()
+                    if not more:
+                        break
+                    rest.append(more)
+                self._out, self._pos = decode_compressed(b''.join(rest), self.compress_type, zstd_dicts=self.zstd_dicts), 0
+                self._eof = True
+            else:
+                if self._decompressor is None:
+                    self._decompressor = get_stream_decompressor(self.compress_type, data, zstd_dicts=self.zstd_dicts)
+                self._out, self._pos = self._decompressor.decompress(data), 0
+
+    def _is_stream_format(self, first_chunk):
+        if bytes(first_chunk[:4]) == COMPRESS_BLOCKS_MAGIC:
+            return False
+        if self.compress_type == 'lz4':
+            # values written one-shot are lz4 blocks, not frames
+            return bytes(first_chunk[:4]) == LZ4_FRAME_MAGIC
+        return True
+
+    def readinto(self, b):
+        self._fill()
+        n = min(len(b), len(self._out) - self._pos)
+        b[:n] = self._out[self._pos : self._pos + n]
+        self._pos += n
+        return n
+
+
 def encode_b64(data):
     try:
         return base64.b64encode(data)
@@ -96,8 +561,15 @@ def decode_b64(data):
         log.debug(f"Base64 decoding error: {e}")
         return data
 
-def encode_hash(data_b):
+def encode_hash(data_b, hash_type=DEFAULT_HASH_TYPE):
     if isinstance(data_b, str):
         data_b = data_b.encode()
-    return hashlib.md5(data_b).hexdigest()
+    if hash_type == 'md5':
+        return hashlib.md5(data_b).hexdigest()
+    if hash_type == 'blake2b':
+        return hashlib.blake2b(data_b, digest_size=16).hexdigest()
+    if hash_type == 'xxh3':
+        import xxhash
+        return xxhash.xxh3_128_hexdigest(data_b)
+    raise ValueError(f"Unsupported hash type: {hash_type}")
 
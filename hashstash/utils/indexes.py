@@ -0,0 +1,141 @@
+from . import *
+import sqlite3
+
+# find() criteria: field=value, or field__<op>=value
+INDEX_OPS = {
+    "eq": "=",
+    "ne": "!=",
+    "gt": ">",
+    "gte": ">=",
+    "lt": "<",
+    "lte": "<=",
+    "in": "IN",
+}
+_INDEX_OP_FUNCS = {
+    "eq": lambda a, b: a == b,
+    "ne": lambda a, b: a != b,
+    "gt": lambda a, b: a > b,
+    "gte": lambda a, b: a >= b,
+    "lt": lambda a, b: a < b,
+    "lte": lambda a, b: a <= b,
+    "in": lambda a, b: a in b,
+}
+
+
+class StashIndexes:
+    """
+    Secondary indexes for a stash, kept in a sqlite file beside it.
+
+    Each indexed field maps its values to the encoded keys holding them, one
+    (field, value, key) row each; sqlite keeps the rows sorted, so both equality
+    and range lookups read only the matching rows.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    @property
+    def exists(self):
+        return os.path.exists(self.path)
+
+    @contextmanager
+    def connect(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                conn.execute("CREATE TABLE IF NOT EXISTS fields (field TEXT PRIMARY KEY)")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS entries "
+                    "(field TEXT, value, key, PRIMARY KEY (field, value, key)) WITHOUT ROWID"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS entries_key ON entries (key)")
+                yield conn
+        finally:
+            conn.close()
+
+    @property
+    def fields(self):
+        if not self.exists:
+            return []
+        with self.connect() as conn:
+            return [row[0] for row in conn.execute("SELECT field FROM fields ORDER BY field")]
+
+    def add_field(self, field, records=()):
+        """Index field, filling it in from records: (encoded key, {field: values}) pairs."""
+        with self.connect() as conn:
+            conn.execute("INSERT OR IGNORE INTO fields VALUES (?)", (field,))
+            conn.execute("DELETE FROM entries WHERE field = ?", (field,))
+            conn.executemany(
+                "INSERT OR IGNORE INTO entries VALUES (?, ?, ?)",
+                (
+                    (field, value, key)
+                    for key, record in records
+                    for value in record.get(field, ())
+                ),
+            )
+
+    def drop_field(self, field):
+        with self.connect() as conn:
+            conn.execute("DELETE FROM fields WHERE field = ?", (field,))
+            conn.execute("DELETE FROM entries WHERE field = ?", (field,))
+
+    def update(self, key, record):
+        """Replace the rows for key with its record's values of the indexed fields."""
+        with self.connect() as conn:
+            fields = [row[0] for row in conn.execute("SELECT field FROM fields")]
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            conn.executemany(
+                "INSERT OR IGNORE INTO entries VALUES (?, ?, ?)",
+                ((field, value, key) for field in fields for value in record.get(field, ())),
+            )
+
+    def remove(self, key):
+        if self.exists:
+            with self.connect() as conn:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def lookup(self, field, op, value):
+        """Return the encoded keys whose field compares to value by op, in value order."""
+        if op == "in":
+            value = list(value)
+            cond, params = f"value IN ({', '.join('?' * len(value))})", value
+        else:
+            cond, params = f"value {INDEX_OPS[op]} ?", [value]
+        with self.connect() as conn:
+            rows = conn.execute(
+                f"SELECT key FROM entries WHERE field = ? AND {cond} ORDER BY value, key",
+                [field, *params],
+            )
+            return list(dict.fromkeys(row[0] for row in rows))
+
+    def clear(self):
+        if self.exists:
+            os.remove(self.path)
+
+
+def is_indexable(value):
+    return isinstance(value, (str, int, float, bool)) and not is_nan(value)
+
+
+def parse_criteria(criteria):
+    """Split {field or field__op: value} into (field, op, value) triples."""
+    out = []
+    for name, value in criteria.items():
+        field, _, op = name.rpartition("__")
+        if not field or op not in INDEX_OPS:
+            field, op = name, "eq"
+        out.append((field, op, value))
+    return out
+
+
+def match_criteria(record, criteria):
+    """Whether a record ({field: values}) meets every (field, op, value) criterion."""
+    for field, op, value in criteria:
+        func = _INDEX_OP_FUNCS[op]
+        try:
+            if not any(func(v, value) for v in record.get(field, ())):
+                return False
+        except TypeError:
+            return False
+    return True
@@ -151,6 +151,42 @@ def flatten_ld(item, ind={}):
         return [{**ind, "_value": item}]
 
 
+class ColumnBatch:
+    """Rows gathered column by column; columns a row lacks are filled with NaN."""
+
+    def __init__(self):
+        self.columns = {}  # name -> (row numbers, values)
+        self.num_rows = 0
+
+    def __len__(self):
+        return self.num_rows
+
+    def append(self, row):
+        for k, v in row.items():
+            col = self.columns.get(k)
+            if col is None:
+                col = self.columns[k] = ([], [])
+            col[0].append(self.num_rows)
+            col[1].append(v)
+        self.num_rows += 1
+
+    def to_dict(self):
+        out = {}
+        for k, (rows, vals) in self.columns.items():
+            if len(rows) < self.num_rows:
+                full = [float("nan")] * self.num_rows
+                for i, v in zip(rows, vals):
+                    full[i] = v
+                vals = full
+            out[k] = vals
+        return out
+
+    def to_pandas(self):
+        import pandas as pd
+
+        return pd.DataFrame(self.to_dict())
+
+
 def is_meta_col(col):
     return col and col[0] == "_" and col not in {"_key", "_value"}
 
@@ -202,6 +238,32 @@ def is_dataframe(df):
     return get_obj_addr(df).endswith("DataFrame")
 
 
+def is_large_array(obj):
+    """A numeric numpy array big enough to be stored as its own .npy file."""
+    return (
+        get_obj_addr(obj) in {"numpy.ndarray", "numpy.memmap"}
+        and obj.dtype.kind != "O"
+        and obj.nbytes >= ARRAY_FILE_MIN_SIZE
+    )
+
+
+def save_npy(path, arr):
+    import numpy as np
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = os.path.join(os.path.dirname(path), f".{uuid.uuid4().hex}.tmp")
+    with open(tmp_path, "wb") as f:
+        np.save(f, arr, allow_pickle=False)
+    os.replace(tmp_path, path)
+
+
+def load_npy(path, mmap=False):
+    """Load a .npy file, or map it read-only (an np.memmap) if mmap."""
+    import numpy as np
+
+    return np.load(path, mmap_mode="r" if mmap else None, allow_pickle=False)
+
+
 def flatten_args_kwargs(args_kwargs, prefix_args="_arg", prefix_kwargs="_"):
     if (
         not isinstance(args_kwargs, dict)
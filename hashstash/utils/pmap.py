@@ -14,6 +14,8 @@ from types import MethodType
 from functools import cached_property
 from concurrent.futures import Future
 from queue import Queue, Empty
+from functools import partial
+import itertools
 from .misc import is_stash
 import atexit
 from contextlib import contextmanager
@@ -23,13 +25,25 @@ import os
 executors = {}
 executor_lock = threading.Lock()
 
-def get_global_executor(num_proc):
+def get_global_executor(num_proc, initializer=None, initargs=()):
     global executors
-    pid = os.getpid()
+    key = (os.getpid(), initializer, initargs)
     with executor_lock:
-        if pid not in executors:
-            executors[pid] = ProcessPoolExecutor(max_workers=num_proc)
-        return executors[pid]
+        if key not in executors:
+            if initializer is not None:
+                # pools with their own initializer are per map: keep only the latest few
+                # (a pool with work in flight is left alone; callers look pools up per submit)
+                initialized = [k for k in executors if k[1] is not None]
+                for old_key in initialized[: max(0, len(initialized) - PMAP_MAX_WORKER_POOLS + 1)]:
+                    if not executor_busy(executors[old_key]):
+                        executors.pop(old_key).shutdown(wait=False)
+            executors[key] = ProcessPoolExecutor(
+                max_workers=num_proc, initializer=initializer, initargs=initargs
+            )
+        return executors[key]
+
+def executor_busy(executor):
+    return bool(getattr(executor, "_pending_work_items", None))
 
 def shutdown_global_executors():
     global executors
@@ -44,6 +58,43 @@ def get_num_proc(n=None, num_spare=2):
     num_avail = mp.cpu_count()
     return n if n and 1<=n<=num_avail else (num_avail-num_spare) if (num_avail-num_spare)>0 else 1
 
+def get_worker_context(func, stash=None, num_proc=1, prewarm=False, _force=False):
+    """
+    Return (context, context id, executor initializer and initargs) for mapping func.
+
+    The context holds the function and stash; pools install it once per worker,
+    and tasks refer to it by id instead of carrying it.
+    """
+    context = {"func": func, "stash": stash, "_force": _force}
+    if num_proc <= 1:
+        return context, None, ()
+    from ..serializers import serialize_custom
+    from .encodings import encode_hash
+
+    serialized_context = serialize_custom(context)
+    context_id = encode_hash(serialized_context)
+    return context, context_id, (init_stash_map_worker, (context_id, serialized_context, bool(prewarm)))
+
+def get_stashed_results(stash, func, items):
+    """Look up func's stashed result for each (args, kwargs) in one batched read, None if missing."""
+    fstash = stash if stash.is_function_stash else stash.attach_func(func)
+    keys = [
+        fstash.new_function_key(
+            *args, **{k: v for k, v in kwargs.items() if k and k[0] != "_"}
+        )
+        for args, kwargs in items
+    ]
+    return fstash.get_many(keys)
+
+def get_auto_chunksize(task_time, limit):
+    """Runs per task so each takes about PMAP_CHUNK_SECONDS, given the time per run; at most limit."""
+    if not task_time:
+        return 1
+    return max(1, min(int(PMAP_CHUNK_SECONDS / task_time), limit))
+
+def average_task_time(task_time, new_task_time):
+    return new_task_time if task_time is None else (task_time + new_task_time) / 2
+
 class StashMap(UserList):
     def __init__(
         self,
@@ -62,6 +113,8 @@ class StashMap(UserList):
         _stash_key=None,
         stash_runs=True,
         stash_map=True,
+        prewarm=False,
+        chunksize=None,
         _force=False,
         **common_kwargs,
     ):
@@ -92,27 +145,53 @@ class StashMap(UserList):
         self.stash_runs = stash_runs
         self.stash_map = stash_map
         self._force = _force
+        self.chunksize = chunksize
+        self._task_time = None
+        self._next_index = 0
+        self._eager = preload or precompute
+        self._dispatch_lock = threading.Lock()
+        self._completed = Queue()  # indices of runs as they finish
 
         self.progress_bar = None
         if self.progress:
             from .misc import progress_bar
             self.progress_bar = progress_bar(total=self.total, desc=self.desc)
 
-        self._executor = get_global_executor(num_proc)
+        self._context, self._context_id, self._executor_init = get_worker_context(
+            func,
+            stash=stash if stash_runs else None,
+            num_proc=num_proc,
+            prewarm=prewarm,
+            _force=_force,
+        )
+        self._executor = get_global_executor(num_proc, *self._executor_init)
         self._executor_lock = mp.Lock() if num_proc > 1 else None
 
+        self._results = []
         if _results is None:
+            if preload and stash is not None and stash_runs and not _force:
+                # resolve hits here in one batched read; only misses go to workers
+                cached = self.get_cached_results()
+            else:
+                cached = [None] * self.total
             self._results = [
                 StashMapRun(
                     self.func,
                     self.objects[i],
                     self.options[i],
                     self,
-                    _preload=preload,
-                    _precompute=precompute,
+                    _preload=False,
+                    _precompute=False,
+                    _result=cached[i],
                 )
                 for i in range(self.total)
             ]
+            for i, run in enumerate(self._results):
+                run._index = i
+                if run._result is not None:
+                    run._set_computed(run._result)
+            if self._eager:
+                self._start_dispatching()
         else:
             self._results = [
                 StashMapRun.from_dict(
@@ -126,6 +205,8 @@ class StashMap(UserList):
                 )
                 for res in _results
             ]
+            for i, run in enumerate(self._results):
+                run._index = i
 
     @staticmethod
     def process_input(objects=None, options=None, total=None, **common_kwargs):
@@ -172,9 +253,79 @@ class StashMap(UserList):
     def get_stash_key(cls, func, objects=None, options=None, total=None, **common_kwargs):
         return {"func": func, "objects": objects, "options": options, "total":total, **common_kwargs}
 
+    @log.debug
+    def get_cached_results(self):
+        """Look up the stashed result of every run at once, None for those not yet stashed."""
+        return get_stashed_results(self.stash, self.func, zip(self.objects, self.options))
+
     @property
     def executor(self):
-        return self._executor
+        # looked up each time, in case the pool was retired for a newer map's
+        return get_global_executor(self.num_proc, *self._executor_init)
+
+    def get_chunksize(self):
+        """Runs per task: chunksize if given, else enough to keep each task near PMAP_CHUNK_SECONDS."""
+        if self.chunksize:
+            return self.chunksize
+        remaining = len(self._results) - self._next_index
+        return get_auto_chunksize(self._task_time, -(-remaining // self.num_proc))
+
+    def _start_dispatching(self):
+        if self.num_proc > 1:
+            # a couple of tasks per worker; each one finishing sends the next
+            for _ in range(2 * self.num_proc):
+                if not self._dispatch():
+                    break
+        else:
+            while self._dispatch():
+                pass
+
+    def _dispatch(self, run=None):
+        """Submit run, filled up with the next runs not yet started, as one task."""
+        with self._dispatch_lock:
+            chunk = [run] if run is not None and not run._processing_started else []
+            size = self.get_chunksize()
+            while len(chunk) < size and self._next_index < len(self._results):
+                next_run = self._results[self._next_index]
+                self._next_index += 1
+                if next_run is not run and not next_run._processing_started and not next_run._computed:
+                    chunk.append(next_run)
+            for chunk_run in chunk:
+                chunk_run._processing_started = True
+        if chunk:
+            self._execute_chunk(chunk)
+        return bool(chunk)
+
+    def _execute_chunk(self, chunk):
+        items = [(run.args, run.kwargs) for run in chunk]
+        if self.num_proc > 1:
+            from ..serializers import stuff
+
+            with self._executor_lock:
+                future = self.executor.submit(_pmap_chunk, self._context_id, stuff(items))
+            for i, run in enumerate(chunk):
+                run._future, run._chunk_index = future, i
+            future.add_done_callback(partial(self._set_chunk_computed, chunk))
+        else:
+            self._set_chunk_computed(chunk, _run_pmap_chunk(self._context, items))
+
+    def _set_chunk_computed(self, chunk, future_or_output):
+        if isinstance(future_or_output, Future):
+            try:
+                outputs, elapsed = future_or_output.result()
+            except Exception as e:
+                log.error(e)
+                outputs, elapsed = [(None, None)] * len(chunk), None
+        else:
+            outputs, elapsed = future_or_output
+        if elapsed is not None:
+            self._task_time = average_task_time(self._task_time, elapsed / len(chunk))
+        for run, (error, value) in zip(chunk, outputs):
+            if error is not None:
+                log.error(error)
+            run._set_computed(value)
+        if self._eager and self.num_proc > 1:
+            self._dispatch()
 
     @property
     def finished(self):
@@ -188,15 +339,37 @@ class StashMap(UserList):
         return self.total
 
     def compute(self):
-        for res in self:
+        for res in self._results:
             res.compute()
 
     def __iter__(self):
+        if not self.ordered:
+            for i, _ in self.iter_unordered():
+                yield self._results[i]
+            return
         for res in self._results:
             yield res
             if not res._computed:
                 res.compute()
 
+    def iter_unordered(self):
+        """Yield (index, result) pairs as runs finish, in order of completion."""
+        self._eager = True
+        if self.num_proc > 1:
+            self._start_dispatching()
+        done = set()
+        for i, res in enumerate(self._results):
+            if res._computed or res._result is not None:
+                done.add(i)
+                yield i, res.result
+        while len(done) < self.total:
+            if self.num_proc == 1 and self._completed.empty():
+                self._dispatch()
+            i = self._completed.get()
+            if i not in done:
+                done.add(i)
+                yield i, self._results[i].result
+
     @property
     def data(self):
         return list(self)
@@ -204,7 +377,7 @@ class StashMap(UserList):
     @cached_property
     def results(self):
         self.compute()
-        resl = [res.result for res in self]
+        resl = [res.result for res in self._results]
         if self.stash_map and type(self) is StashMap and self.stash is not None:
             self.stash.set(self.stash_key, self)
         if self.progress_bar:
@@ -228,6 +401,10 @@ class StashMap(UserList):
         return list(self.keys())
 
     def results_iter(self):
+        """Yield results in input order, or (index, result) pairs as they finish if not ordered."""
+        if not self.ordered:
+            yield from self.iter_unordered()
+            return
         self.compute()
         yield from (res.result for res in self)
 
@@ -249,11 +426,10 @@ class StashMap(UserList):
         if index < 0 or index >= len(self):
             raise IndexError("StashMap index out of range")
 
-        for i, item in enumerate(self):
-            if i == index:
-                return item
-
-        raise IndexError("StashMap index out of range")
+        res = self._results[index]
+        if not res._computed:
+            res.compute()
+        return res
 
     def to_dict(self):
         results = [
@@ -276,6 +452,7 @@ class StashMap(UserList):
             "stash": self.stash,
             "preload": self._preload,
             "precompute": self._precompute,
+            "chunksize": self.chunksize,
             "_results": results,
         }
 
@@ -293,6 +470,7 @@ class StashMap(UserList):
             stash=data["stash"],
             preload=data["preload"],
             precompute=data["precompute"],
+            chunksize=data.get("chunksize"),
             _results=data["_results"],
         )
         return pmap
@@ -300,12 +478,6 @@ class StashMap(UserList):
     def __reduce__(self):
         return (self.__class__.from_dict, (self.to_dict(),))
 
-    def _execute_task(self, stuffed_item):
-        if self.num_proc > 1:
-            return self.executor.submit(_pmap_item, stuffed_item)
-        else:
-            return _pmap_item(stuffed_item)
-
 
 class StashMapSlice(StashMap):
     def __init__(self, pmap, slice_obj):
@@ -399,7 +571,8 @@ class StashMapRun:
         self._pmap_instance = _pmap_instance
         self._result = _result
         self._future = None
-        self._direct_result = None  # New attribute to store direct results
+        self._chunk_index = None
+        self._index = None
         self._computed = False
         self._processing_started = False
         self._preload = _preload
@@ -473,15 +646,7 @@ class StashMapRun:
         if self._result is not None:
             self._processing_started = True
             return
-        stuffed_item = self.stuff()
-        if self._pmap_instance.num_proc > 1:
-            with self._pmap_instance._executor_lock:
-                self._future = self._pmap_instance._execute_task(stuffed_item)
-                self._future.add_done_callback(self._set_computed)
-        else:
-            self._direct_result = self._pmap_instance._execute_task(stuffed_item)
-            self._set_computed(self._direct_result)
-        self._processing_started = True
+        self._pmap_instance._dispatch(self)
 
     def _set_computed(self, future_or_result):
         self._computed = True
@@ -495,6 +660,8 @@ class StashMapRun:
                 self._result = future_or_result
         if self._pmap_instance.progress_bar:
             self._pmap_instance.progress_bar.update(1)
+        if self._index is not None:
+            self._pmap_instance._completed.put(self._index)
 
     @cached_property
     def result(self):
@@ -505,11 +672,11 @@ class StashMapRun:
                 self._start_processing()
             if self._future:
                 try:
-                    self._result = self._future.result()
-                except Exception as e:
-                    log.error(e)
-            else:
-                self._result = self._direct_result
+                    # errors are logged by the chunk's done callback
+                    outputs, _ = self._future.result()
+                    self._result = outputs[self._chunk_index][1]
+                except Exception:
+                    pass
             self._computed = True
         return self._result
 
@@ -555,7 +722,12 @@ def init_worker():
 
 
 def pmap(func, *args, **kwargs):
-    for res in StashMap(func, *args, **kwargs):
+    """Yield func's results in input order, or (index, result) pairs as they finish if not ordered."""
+    smap = StashMap(func, *args, **kwargs)
+    if not smap.ordered:
+        yield from smap.iter_unordered()
+        return
+    for res in smap:
         yield res.result
 
 
@@ -563,21 +735,200 @@ def pmap_l(*x, **y):
     return list(pmap(*x, **y))
 
 
+def pmap_stream(
+    func,
+    objects=None,
+    options=None,
+    num_proc=None,
+    stash=None,
+    window=None,
+    ordered=True,
+    chunksize=None,
+    stash_runs=True,
+    prewarm=False,
+    progress=True,
+    desc=None,
+    _force=False,
+    **common_kwargs,
+):
+    """
+    Map func over objects and/or options lazily, yielding results as they finish.
+
+    Either input may be any iterable, even an endless one. Items are pulled from
+    it only while fewer than window runs (PMAP_STREAM_WINDOW by default) are in
+    flight or waiting to be yielded, so memory stays flat however long the input
+    is. Workers stash each result as they go, and results already stashed are
+    looked up in batches instead of being sent out again. Results come in input
+    order if ordered, else as (index, result) pairs in order of completion.
+    """
+    from ..serializers import stuff
+    from .misc import progress_bar
+
+    num_proc = get_num_proc(num_proc)
+    window = window or PMAP_STREAM_WINDOW
+    stash = stash if stash_runs else None
+    context, context_id, executor_init = get_worker_context(
+        func, stash=stash, num_proc=num_proc, prewarm=prewarm, _force=_force
+    )
+    fstash = get_context_function_stash(context) if stash is not None else None
+    items = enumerate(iter_map_inputs(objects, options, **common_kwargs))
+    pbar = progress_bar(
+        desc=(desc if desc is not None else f"Streaming {get_obj_addr(func)}")
+        + (f" [{num_proc}x]" if num_proc > 1 else ""),
+        progress=progress,
+    )
+
+    futures = {}  # future -> indices of the runs in its chunk
+    finished = {}  # index -> result, for runs not yet yielded
+    num_pulled = next_index = 0
+    task_time = None
+    exhausted = False
+
+    def collect(indices, outputs, elapsed):
+        nonlocal task_time
+        if elapsed is not None:
+            task_time = average_task_time(task_time, elapsed / len(indices))
+        for i, (error, value) in zip(indices, outputs):
+            if error is not None:
+                log.error(error)
+            finished[i] = value
+
+    try:
+        while True:
+            # until tasks have been timed, pull only enough to keep each worker busy
+            limit = window if chunksize or task_time else min(window, 2 * num_proc)
+            room = limit - (num_pulled - next_index)
+            if not exhausted and room > 0:
+                batch = list(itertools.islice(items, room))
+                exhausted = len(batch) < room
+                num_pulled += len(batch)
+                cached = (
+                    get_stashed_results(fstash, func, (item for _, item in batch))
+                    if stash is not None and not _force and batch
+                    else [None] * len(batch)
+                )
+                misses = []
+                for (i, item), value in zip(batch, cached):
+                    if value is not None:
+                        finished[i] = value
+                    else:
+                        misses.append((i, item))
+                size = chunksize or get_auto_chunksize(task_time, -(-len(misses) // num_proc))
+                # looked up per batch, in case the pool was retired for a newer map's
+                executor = get_global_executor(num_proc, *executor_init) if num_proc > 1 and misses else None
+                for start in range(0, len(misses), size):
+                    chunk = misses[start : start + size]
+                    indices = [i for i, _ in chunk]
+                    runs = [item for _, item in chunk]
+                    if executor is not None:
+                        futures[executor.submit(_pmap_chunk, context_id, stuff(runs))] = indices
+                    else:
+                        collect(indices, *_run_pmap_chunk(context, runs))
+
+            ready = []
+            if ordered:
+                while next_index + len(ready) in finished:
+                    ready.append(finished.pop(next_index + len(ready)))
+            else:
+                ready = list(finished.items())
+                finished.clear()
+            for result in ready:
+                next_index += 1
+                pbar.update(1)
+                yield result
+
+            if futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    indices = futures.pop(future)
+                    try:
+                        collect(indices, *future.result())
+                    except Exception as e:
+                        log.error(e)
+                        collect(indices, [(None, None)] * len(indices), None)
+            elif exhausted and not finished:
+                break
+    finally:
+        for future in futures:
+            future.cancel()
+        pbar.close()
+
+
+def iter_map_inputs(objects=None, options=None, **common_kwargs):
+    """Lazily pair up objects and options into (args, kwargs), as StashMap.process_input does."""
+    if objects is None and options is None:
+        raise ValueError("At least one of objects or options must be given")
+    objects = itertools.repeat(()) if objects is None else objects
+    options = itertools.repeat({}) if options is None else options
+    for obj, opt in zip(objects, options):
+        args = tuple(obj) if isinstance(obj, (tuple, list)) else (obj,)
+        yield args, ({**common_kwargs, **opt} if common_kwargs else opt)
+
+
 def _pmap_item(stuffed_item):
     from ..serializers import unstuff
 
     unstuffed_item = unstuff(stuffed_item)  # if num_proc>1 else stuffed_item
-    func, args, kwargs = (
-        unstuffed_item["func"],
+    return _run_pmap_item(
+        unstuffed_item,
         unstuffed_item["args"],
         unstuffed_item["kwargs"],
     )
-    stash = unstuffed_item.get("stash")
-    _force = unstuffed_item.get("_force")
+
+
+def get_context_function_stash(context):
+    """The stash a context's function results go in, resolved once and kept in the context."""
+    if "fstash" not in context:
+        context["fstash"] = context["stash"].attach_func(context["func"])
+    return context["fstash"]
+
+
+def _run_pmap_item(context, args, kwargs):
+    stash = context.get("stash")
     if stash is not None:
-        return stash.run(func, *args, **kwargs, _force=_force)
+        return stash.run(
+            context["func"],
+            *args,
+            **kwargs,
+            _force=context.get("_force"),
+            _fstash=get_context_function_stash(context),
+        )
     else:
-        return func(*args, **kwargs)
+        return context["func"](*args, **kwargs)
+
+
+# contexts installed by init_stash_map_worker, by id
+_worker_contexts = {}
+
+
+def init_stash_map_worker(context_id, serialized_context, prewarm=False):
+    """Process pool initializer: decode a map's function and stash once per worker."""
+    from ..serializers import deserialize_custom
+
+    context = _worker_contexts[context_id] = deserialize_custom(serialized_context)
+    if prewarm and context["stash"] is not None:
+        # open the function stash's connection ahead of the first task
+        from ..engines.base import warm_connections
+
+        warm_connections(get_context_function_stash(context))
+
+
+def _pmap_chunk(context_id, stuffed_items):
+    from ..serializers import unstuff
+
+    return _run_pmap_chunk(_worker_contexts[context_id], unstuff(stuffed_items))
+
+
+def _run_pmap_chunk(context, items):
+    # per-run errors come back with the results, so one failure doesn't sink its chunk
+    started = time.perf_counter()
+    outputs = []
+    for args, kwargs in items:
+        try:
+            outputs.append((None, _run_pmap_item(context, args, kwargs)))
+        except Exception as e:
+            outputs.append((e, None))
+    return outputs, time.perf_counter() - started
 
 
 def _pmap_lookup_item(stuffed_item):
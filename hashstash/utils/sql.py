@@ -0,0 +1,125 @@
+from . import *
+
+SQL_TABLE = "stash"
+SQL_ENGINES = ("duckdb", "sqlite")
+
+
+def get_sql_engine(engine=None):
+    if engine is None:
+        try:
+            import duckdb
+
+            return "duckdb"
+        except ImportError:
+            return "sqlite"
+    if engine not in SQL_ENGINES:
+        raise ValueError(f"SQL engine {engine} not supported. Please choose one of: {SQL_ENGINES}")
+    return engine
+
+
+@log.debug
+def run_sql(query, source, engine=None):
+    """
+    Run a SQL query over source, available to it as the table "stash".
+
+    source is either a pyarrow Table or Dataset, or an iterable of pandas
+    DataFrames (which may not all have the same columns). Returns a pandas
+    DataFrame.
+    """
+    if get_sql_engine(engine) == "duckdb":
+        return run_sql_duckdb(query, source)
+    return run_sql_sqlite(query, source)
+
+
+def run_sql_duckdb(query, source):
+    # arrow tables and datasets are scanned in place, with filters and projections pushed down
+    import duckdb
+    import pyarrow as pa
+
+    if not hasattr(source, "to_batches"):
+        tables = [MetaDataFrame(df).to_arrow_table() for df in source]
+        if tables:
+            schema = pa.unify_schemas([t.schema for t in tables], promote_options="permissive")
+            source = pa.RecordBatchReader.from_batches(schema, iter_aligned_batches(tables, schema))
+        else:
+            source = pa.table({})
+    con = duckdb.connect()
+    try:
+        con.register(SQL_TABLE, source)
+        return con.execute(query).df()
+    finally:
+        con.close()
+
+
+def iter_aligned_batches(tables, schema):
+    # each table is fitted to the shared schema only when duckdb reaches it,
+    # instead of building one promoted copy of them all up front
+    for table in tables:
+        if table.schema != schema:
+            table = align_arrow_table(table, schema)
+        yield from table.to_batches()
+
+
+def align_arrow_table(table, schema):
+    import pyarrow as pa
+
+    columns = []
+    for field in schema:
+        if field.name in table.column_names:
+            col = table.column(field.name)
+            columns.append(col if col.type == field.type else col.cast(field.type))
+        else:
+            columns.append(pa.nulls(len(table), field.type))
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def run_sql_sqlite(query, source):
+    # filled batch by batch into a temporary database, which sqlite spills to disk
+    import sqlite3
+    import pandas as pd
+
+    if hasattr(source, "to_batches"):
+        source = (batch.to_pandas(ignore_metadata=True) for batch in source.to_batches())
+
+    con = sqlite3.connect("")
+    try:
+        columns = []
+        for df in source:
+            names = [str(c) for c in df.columns]
+            new = [c for c in dict.fromkeys(names) if c not in columns]
+            if new:
+                if not columns:
+                    con.execute(f"CREATE TABLE {SQL_TABLE} ({', '.join(map(quote_sql_name, new))})")
+                else:
+                    for name in new:
+                        con.execute(f"ALTER TABLE {SQL_TABLE} ADD COLUMN {quote_sql_name(name)}")
+                columns.extend(new)
+            if not len(df):
+                continue
+            values = [
+                [to_sql_value(v) for v in col.astype(object).where(col.notna(), None).tolist()]
+                for col in (df.iloc[:, i] for i in range(len(names)))
+            ]
+            con.executemany(
+                f"INSERT INTO {SQL_TABLE} ({', '.join(map(quote_sql_name, names))}) "
+                f"VALUES ({', '.join('?' * len(names))})",
+                zip(*values),
+            )
+        if not columns:
+            con.execute(f"CREATE TABLE {SQL_TABLE} (_key)")
+        return pd.read_sql_query(query, con)
+    finally:
+        con.close()
+
+
+def quote_sql_name(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def to_sql_value(value):
+    # lists and dicts become json text, so sqlite's json functions can reach into them
+    if value is None or isinstance(value, (str, int, float, bytes)):
+        return value
+    if isinstance(value, (list, tuple, dict)):
+        return json.dumps(value, default=str)
+    return str(value)
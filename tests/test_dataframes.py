@@ -124,7 +124,7 @@ def test_metadataframe_concat():
     assert len(concatenated) == 4
     assert concatenated['A'].tolist() == [1, 2, 3, 4]
 
-@pytest.mark.parametrize("io_engine", ["csv", "parquet", "json", "feather", "pickle"])
+@pytest.mark.parametrize("io_engine", ["csv", "parquet", "json", "feather", "pickle", "arrow"])
 def test_metadataframe_write_read(sample_data, io_engine):
     mdf = MetaDataFrame(sample_data)
     with tempfile.NamedTemporaryFile(suffix=f".{io_engine}") as tmp:
@@ -133,6 +133,125 @@ def test_metadataframe_write_read(sample_data, io_engine):
         assert list(read_mdf.columns) == list(mdf.columns)
         assert read_mdf.shape == mdf.shape
 
+@pytest.mark.parametrize("compression", [None, "lz4"])
+def test_metadataframe_arrow_io(compression, tmp_path):
+    import pyarrow as pa
+
+    df = pd.DataFrame({'A': [1, 2, 3], 'B': ['a', 'b', None], 'C': [4.5, 5.0, None]})
+    df.index.name = 'id'
+    path = str(tmp_path / "test.arrow")
+    MetaDataFrame(df).write(path, io_engine="arrow", compression=compression)
+
+    # types and index survive without reinference
+    read_mdf = MetaDataFrame.read(path)
+    assert read_mdf.df.equals(df)
+    assert read_mdf.df.index.name == 'id'
+
+    table = read_arrow_table(path)
+    assert isinstance(table, pa.Table)
+    assert table.schema.field('A').type == pa.int64()
+
+    arrow_df = MetaDataFrame.read(path, arrow_dtypes=True).df
+    assert isinstance(arrow_df['A'].dtype, pd.ArrowDtype)
+    assert arrow_df['A'].tolist() == [1, 2, 3]
+
+    pl_df = MetaDataFrame.read(path, df_engine="polars").df
+    assert pl_df['A'].dtype == pl.Int64
+    assert pl_df['B'].to_list() == ['a', 'b', None]
+
+@pytest.mark.parametrize("io_engine", ["parquet", "feather"])
+def test_metadataframe_columnar_types(io_engine, tmp_path):
+    import pyarrow as pa
+    import pyarrow.feather
+    import pyarrow.parquet
+
+    df = pd.DataFrame({
+        'n': [1, 2, 3],
+        'x': [0.5, 1.5, None],
+        's': ['a', 'b', 'c'],
+        'mixed': [1, 'b', None],
+    })
+    path = str(tmp_path / f"test.{io_engine}")
+    MetaDataFrame(df).write(path, io_engine=io_engine)
+
+    # native columns are stored typed, only the mixed column falls back to strings
+    schema = pa.parquet.read_schema(path) if io_engine == "parquet" else pa.feather.read_table(path).schema
+    assert schema.field('n').type == pa.int64()
+    assert schema.field('x').type == pa.float64()
+    assert schema.field('mixed').type == pa.string()
+
+    read_df = MetaDataFrame.read(path).df
+    assert read_df['n'].tolist() == [1, 2, 3]
+    assert read_df['mixed'].tolist() == ['1', 'b', None]
+
+@pytest.mark.parametrize("io_engine", ["parquet", "feather", "arrow"])
+def test_metadataframe_nested_columns(io_engine, tmp_path):
+    import pyarrow as pa
+
+    df = pd.DataFrame({
+        'dicts': [{'a': 1}, {'b': 'x'}, None],
+        'nested': [[{'a': 1}], [{'b': 2}], []],
+        'containers': [{'a': [1, 2]}, [1, 'b'], 3],
+        'lists': [[1, 2], [3], None],
+    })
+    path = str(tmp_path / f"test.{io_engine}")
+    MetaDataFrame(df).write(path, io_engine=io_engine)
+
+    # dicts come back with their own keys, not merged into one struct
+    read_df = MetaDataFrame.read(path).df
+    for column in ['dicts', 'nested', 'containers']:
+        assert read_df[column].tolist() == df[column].tolist()
+    assert read_df['lists'].map(lambda v: v if v is None else list(v)).tolist() == df['lists'].tolist()
+    # lists arrow types as is stay native
+    assert MetaDataFrame(df).to_arrow_table().schema.field('lists').type == pa.list_(pa.int64())
+
+@pytest.mark.parametrize("io_engine", ["parquet", "feather", "arrow"])
+def test_metadataframe_schema_roundtrip(io_engine, tmp_path):
+    df = pd.DataFrame({
+        'zip': ['00123', '04567', '10001'],
+        'when': pd.to_datetime(['2024-01-01', '2024-06-01', '2024-12-31']).tz_localize('UTC'),
+        'cat': pd.Categorical(['x', 'y', 'x'], categories=['y', 'x', 'z']),
+        'n': pd.array([1, None, 3], dtype='Int64'),
+    }, index=pd.Index(['a', 'b', 'c'], name='key'))
+    path = str(tmp_path / f"test.{io_engine}")
+    MetaDataFrame(df).write(path, io_engine=io_engine)
+
+    # schema restored exactly, strings that look numeric are not reinferred
+    read_df = MetaDataFrame.read(path).df
+    pd.testing.assert_frame_equal(read_df, df)
+    assert list(read_df['cat'].cat.categories) == ['y', 'x', 'z']
+
+def test_metadataframe_read_untyped_feather(tmp_path):
+    # files written before typed writes hold strings and are still reinferred
+    path = str(tmp_path / "old.feather")
+    pd.DataFrame({'n': ['1', '2'], 's': ['a', 'b']}).to_feather(path)
+    read_df = MetaDataFrame.read(path).df
+    assert read_df['n'].tolist() == [1, 2]
+
+def test_metadataframe_key_serialization(tmp_path):
+    import io
+    import pyarrow as pa
+    import pyarrow.feather
+    from base64 import b64decode
+    from hashstash import HashStash
+    from hashstash.serializers import unstuff, typed_frames
+
+    def stored_type(stuffed):
+        data = unstuff(stuffed)['data']
+        data = data if isinstance(data, bytes) else b64decode(data)
+        return pa.feather.read_table(io.BytesIO(data)).schema.field('n').type
+
+    df = pd.DataFrame({'n': [1, 2, 3], 'x': [0.5, 1.5, None]})
+    # keys keep the string cast, so cached calls taking DataFrames hash as before
+    assert stored_type(MetaDataFrame(df).stuff(io_engine="feather")) == pa.string()
+    with typed_frames():
+        assert stored_type(MetaDataFrame(df).stuff(io_engine="feather")) == pa.int64()
+
+    stash = HashStash(root_dir=str(tmp_path / "stash"))
+    stash[df] = df
+    assert stash[df]['n'].dtype == 'int64'
+    assert stash[df]['x'].isna().tolist() == [False, False, True]
+
 def test_get_io_engine():
     assert get_io_engine("csv") == "csv"
     with pytest.raises(ValueError):
@@ -3,6 +3,7 @@ from hashstash.utils.encodings import encode, decode, encode_hash, RAW_NO_COMPRE
 import json
 import base64
 import zlib
+import os
 
 @pytest.fixture
 def default_params():
@@ -25,6 +26,16 @@ def test_hash():
     hashed = encode_hash(data)
     assert len(hashed) == 32  # MD5 hash is 32 characters long
 
+@pytest.mark.parametrize("hash_type", ["md5", "blake2b", "xxh3"])
+def test_hash_types(hash_type):
+    if hash_type == "xxh3":
+        pytest.importorskip("xxhash")
+    hashed = encode_hash(b"Test data", hash_type)
+    assert len(hashed) == 32
+    assert hashed == encode_hash("Test data", hash_type)
+    with pytest.raises(ValueError):
+        encode_hash(b"Test data", "sha1")
+
 def test_b64_encoding(default_params):
     data = json.dumps({"test": "data"})
     encoded = encode(data, b64=True, compress=False)
@@ -37,6 +48,108 @@ def test_compression(default_params):
     encoded_uncompressed = encode(data, b64=False, compress=RAW_NO_COMPRESS)
     assert len(encoded_compressed) < len(encoded_uncompressed)
 
+def test_zstd_dictionaries(tmp_path):
+    pytest.importorskip("zstandard")
+    from hashstash.utils.encodings import ZstdDictionaries
+    samples = [json.dumps({"id": i, "name": f"user{i}", "status": "active"}).encode() for i in range(500)]
+    plain = encode(samples[0], b64=False, compress='zstd')
+    assert decode(plain, b64=False, compress='zstd') == samples[0]
+
+    dicts = ZstdDictionaries(str(tmp_path / "dicts"))
+    first = dicts.train(samples, dict_size=2048)
+    with_dict = encode(samples[0], b64=False, compress='zstd', zstd_dict=first)
+    assert len(with_dict) < len(plain)
+    # the dictionary is used only for values that pass the incompressibility probe
+    from hashstash.utils.encodings import choose_codec
+    assert choose_codec(samples[0], zstd_dict=first) == 'zstd'
+    assert choose_codec(samples[0] * 100, zstd_dict=first) == 'zstd'
+    assert choose_codec(os.urandom(100), zstd_dict=first) == RAW_NO_COMPRESS
+    assert choose_codec(os.urandom(4096), zstd_dict=first) == RAW_NO_COMPRESS
+    # values large enough to be compressed in blocks stream back with their dictionary
+    import io
+    from hashstash.utils.encodings import StreamDecoder, COMPRESS_BLOCKS_MAGIC, COMPRESS_BLOCK_SIZE, COMPRESS_BLOCK_MIN_BLOCKS
+    big = b"".join(samples) * (COMPRESS_BLOCK_SIZE * COMPRESS_BLOCK_MIN_BLOCKS // len(b"".join(samples)) + 1)
+    blocks = encode(big, b64=False, compress='zstd', zstd_dict=first)
+    assert blocks[:4] == COMPRESS_BLOCKS_MAGIC
+    reader = StreamDecoder(io.BytesIO(blocks), b64=False, compress='zstd', zstd_dicts=ZstdDictionaries(dicts.path))
+    assert reader.read() == big
+    second = dicts.train(samples[::-1], dict_size=2048)
+    assert dicts.num_versions == 2 and dicts.latest.dict_id() == second.dict_id()
+    # older values name their dictionary in the frame header
+    assert decode(with_dict, b64=False, compress='zstd', zstd_dicts=ZstdDictionaries(dicts.path)) == samples[0]
+
+def test_value_header_and_codec_choice():
+    from hashstash.utils.encodings import encode_value_header, decode_value_header, choose_codec
+    header = encode_value_header("hashstash_bin", "zstd")
+    assert decode_value_header(header + b"payload") == ("hashstash_bin", "zstd", 0, len(header))
+    assert decode_value_header(b'{"a": 1}') is None
+    assert choose_codec(b"tiny") == RAW_NO_COMPRESS
+    assert choose_codec(os.urandom(4096)) == RAW_NO_COMPRESS
+    assert choose_codec(b"abc" * 4096) != RAW_NO_COMPRESS
+
+@pytest.mark.parametrize("compress", ["raw", "zlib", "gzip", "bz2", "zstd", "lz4"])
+@pytest.mark.parametrize("b64", [True, False])
+def test_stream_encode_decode(compress, b64):
+    import io
+    from hashstash.utils.encodings import StreamEncoder, StreamDecoder, get_working_compressers
+    if compress != "raw" and compress not in get_working_compressers():
+        pytest.skip(f"{compress} not installed")
+    data = os.urandom(1000) + b"abc" * 100000
+    out = io.BytesIO()
+    with StreamEncoder(out, b64=b64, compress=compress) as encoder:
+        for i in range(0, len(data), 7777):
+            encoder.write(data[i : i + 7777])
+    # streamed output is readable by the one-shot decoder and vice versa
+    assert decode(out.getvalue(), b64=b64, compress=compress) == data
+    reader = StreamDecoder(io.BytesIO(encode(data, b64=b64, compress=compress)), b64=b64, compress=compress, chunk_size=1001)
+    assert reader.read() == data
+
+def test_stream_lz4_frames():
+    import io
+    from hashstash.utils.encodings import StreamEncoder, StreamDecoder, LZ4_FRAME_MAGIC, get_working_compressers
+    if "lz4" not in get_working_compressers():
+        pytest.skip("lz4 not installed")
+    data = b"abc" * 100000
+    out = io.BytesIO()
+    with StreamEncoder(out, b64=False, compress="lz4") as encoder:
+        encoder.write(data[:1000])
+        # compressed as it goes rather than buffered until close
+        assert encoder._buffered is None
+        encoder.write(data[1000:])
+    assert out.getvalue()[:4] == LZ4_FRAME_MAGIC
+    reader = StreamDecoder(io.BytesIO(out.getvalue()), b64=False, compress="lz4", chunk_size=1001)
+    assert reader.read(10) == data[:10]
+    assert not reader._eof
+    assert reader.read() == data[10:]
+    # one-shot lz4 block values still read back through the stream decoder
+    block = encode(data, b64=False, compress="lz4")
+    assert block[:4] != LZ4_FRAME_MAGIC
+    assert StreamDecoder(io.BytesIO(block), b64=False, compress="lz4").read() == data
+
+@pytest.mark.parametrize("compress", ["zlib", "lz4", "zstd", "gzip"])
+def test_compress_blocks(compress):
+    from hashstash.utils.encodings import (
+        get_working_compressers, set_compress_threads, COMPRESS_BLOCKS_MAGIC, COMPRESS_BLOCK_SIZE, _compress,
+    )
+    if compress not in get_working_compressers():
+        pytest.skip(f"{compress} not installed")
+    data = (os.urandom(1000) + b"abc" * 1000) * (COMPRESS_BLOCK_SIZE * 5 // 4000)
+    try:
+        set_compress_threads(4)
+        encoded = encode(data, b64=False, compress=compress)
+        assert encoded[:4] == COMPRESS_BLOCKS_MAGIC
+        assert decode(encoded, b64=False, compress=compress) == data
+        # the same bytes whatever the thread setting, so encoded keys still match
+        set_compress_threads(1)
+        assert encode(data, b64=False, compress=compress) == encoded
+        assert decode(encoded, b64=False, compress=compress) == data
+        # values written whole, in one block, still read back
+        single = _compress(data, compress)
+        assert single[:4] != COMPRESS_BLOCKS_MAGIC
+        assert decode(single, b64=False, compress=compress) == data
+    finally:
+        set_compress_threads(None)
+
 def test_as_string(default_params):
     data = json.dumps({"test": "data"})
     encoded = encode(data, as_string=True)
@@ -19,7 +19,7 @@ TEST_CLASSES = [
     PairtreeHashStash,
     SqliteHashStash,
     MemoryHashStash,
-    # ShelveHashStash,
+    ShelveHashStash,
     RedisHashStash,
     DiskCacheHashStash,
     LMDBHashStash,
@@ -199,6 +199,44 @@ class TestHashStash:
         assert ("key1", "value1") in items
         assert ("key2", "value2") in items
 
+    def test_batch(self, cache):
+        with cache.batch():
+            cache["key1"] = "value1"
+            cache["key2"] = "value2"
+        assert cache["key1"] == "value1"
+        assert len(cache) == 2
+
+        with cache.transaction():
+            cache["key3"] = "value3"
+        assert cache["key3"] == "value3"
+
+    def test_rehash(self, cache):
+        for i in range(20):
+            cache[f"key{i}"] = {"value": i}
+        rehashed = cache.rehash("blake2b", num_proc=4)
+        assert rehashed.hash_type == "blake2b"
+        assert rehashed.path_dirname.endswith(".blake2b")
+        assert rehashed.path != cache.path
+        assert len(rehashed) == 20
+        assert rehashed["key7"] == {"value": 7}
+        assert rehashed.hash(b"x") == encode_hash(b"x", "blake2b") != cache.hash(b"x")
+
+        # nested stashes, like function results, come along
+        assert [cache.run(_double, i) for i in range(3)] == [0, 2, 4]
+        rehashed = cache.rehash("blake2b")
+        func_stash = rehashed.sub_function_results(_double)
+        assert func_stash.hash_type == "blake2b"
+        assert len(func_stash) == 3
+        assert rehashed.run(_double, 2) == 4
+        # ...and one rehashed on its own goes where its parent's copy looks
+        assert cache.sub_function_results(_double).rehash("blake2b").path == func_stash.path
+        rehashed.clear()
+
+        # results under hashed keys can't be rekeyed without their arguments
+        cache.run(_double, 5, _store_args=False)
+        with pytest.raises(ValueError):
+            cache.rehash("blake2b")
+
     def test_sub_function_results(self, cache):
         def example_func(x, y):
             return x + y
@@ -287,6 +325,61 @@ class TestHashStash:
 
         
 
+    def test_assemble_batches(self, cache):
+        for i in range(7):
+            cache[f"key{i}"] = {"result": i}
+        cache["frame"] = pd.DataFrame({'col1': [3, 4], 'col2': ['c', 'd']})
+        cache["list"] = [1, {"nested": "dict"}]
+
+        batches = list(cache.assemble_batches(batch_size=3))
+        assert all(is_dataframe(df) for df in batches)
+        assert sum(len(df) for df in batches) == 11
+        frame_batch = next(df for df in batches if "col1" in df.columns)
+        assert frame_batch.to_dict("records") == [
+            {"_key": "frame", "col1": 3, "col2": "c"},
+            {"_key": "frame", "col1": 4, "col2": "d"},
+        ]
+        assert all(len(df) <= 3 for df in batches if df is not frame_batch)
+        assert not any("_version" in df.columns for df in batches)
+
+    def test_secondary_indexes(self, cache):
+        for i in range(20):
+            cache[f"k{i}"] = {"score": i / 10, "meta": {"lang": "en" if i % 2 else "fr"}}
+        cache.create_index("score").create_index("meta.lang")
+        assert cache.indexes.fields == ["meta.lang", "score"]
+
+        assert list(cache.find(score__gt=1.6)) == ["k17", "k18", "k19"]
+        assert set(cache.find({"meta.lang": "en"}, score__lte=0.5)) == {"k1", "k3", "k5"}
+        assert list(cache.find(score__in=[0.2, 0.4], return_vals=True)) == [
+            ("k2", {"score": 0.2, "meta": {"lang": "fr"}}),
+            ("k4", {"score": 0.4, "meta": {"lang": "fr"}}),
+        ]
+
+        # kept up to date on set and delete; unindexed fields are checked on the values
+        cache["k2"] = {"score": 5.0, "meta": {"lang": "de"}}
+        del cache["k19"]
+        assert list(cache.find(score__gt=1.6)) == ["k17", "k18", "k2"]
+        assert list(cache.find(_key="k2")) == ["k2"]
+        assert list(cache.query(score__gte=5.0)) == ["k2"]
+
+    def test_sql(self, cache):
+        for i in range(9):
+            cache[f"k{i}"] = {"score": i, "lang": ["en", "fr", "de"][i % 3], "tags": ["a", i]}
+        cache["plain"] = "value"
+
+        df = cache.sql("SELECT lang, count(*) AS n, sum(score) AS total FROM stash WHERE lang IS NOT NULL GROUP BY lang ORDER BY lang").df
+        assert df.to_dict("records") == [
+            {"lang": "de", "n": 3, "total": 15},
+            {"lang": "en", "n": 3, "total": 9},
+            {"lang": "fr", "n": 3, "total": 12},
+        ]
+        assert cache.sql("SELECT _value FROM stash WHERE _key = 'plain'").df["_value"].tolist() == ["value"]
+        assert "_version" in cache.sql("SELECT * FROM stash").df.columns
+
+        # criteria narrow the values read, through the index when there is one
+        cache.create_index("lang")
+        assert cache.sql("SELECT sum(score) AS total FROM stash", lang="fr").df["total"].tolist() == [12]
+
     def test_df_property(self, cache):
         cache["key1"] = {"result": "simple_dict"}
         cache["key2"] = [1, 2, {"nested": "dict"}]
@@ -339,6 +432,16 @@ class TestHashStash:
         assert isinstance(sub_cache, BaseHashStash)
         assert sub_cache.root_dir.endswith("sub_cache")
         assert sub_cache.engine == cache.engine
+        # the same settings give back the same sub-stash rather than a new child
+        assert cache.sub("sub_cache") is sub_cache
+        assert cache.sub("sub_cache", dbname="other") is not sub_cache
+        def double(x):
+            return x * 2
+
+        num_children = len(cache.children)
+        for _ in range(3):
+            cache.attach_func(double)
+        assert len(cache.children) == num_children + 1
 
     def test_tmp(self, cache):
         with cache.tmp() as tmp_cache:
@@ -652,5 +755,339 @@ def test_encode_path():
     cache = HashStash(engine='pairtree')
     assert os.path.isabs(cache.get_path_key('unencoded_key'))
 
+@pytest.mark.parametrize("stash_cls", [PairtreeHashStash, LMDBHashStash])
+def test_zstd_trained_dict(stash_cls, tmp_path):
+    pytest.importorskip("zstandard")
+    stash = stash_cls(os.path.join(tmp_path, "zstd_dict"), compress="zstd", compress_level=5)
+    records = {i: {"id": i, "name": f"user{i}", "status": "active" if i % 2 else "inactive"} for i in range(300)}
+    for key, value in records.items():
+        stash[key] = value
+    size_before = sum(len(v) for v in stash._values())
+    stash.train_zstd_dict(dict_size=4096)
+    for key, value in records.items():
+        stash[key] = value
+    assert sum(len(v) for v in stash._values()) < size_before
+    assert os.path.exists(os.path.join(stash.path_dirname, "zstd_dicts", "0001.zdict"))
+
+    reopened = stash_cls(os.path.join(tmp_path, "zstd_dict"), compress="zstd")
+    assert reopened[7] == records[7]
+
+@pytest.mark.parametrize("serializer", ["pickle", "hashstash"])
+@pytest.mark.parametrize("compress", ["raw", "zlib", "lz4"])
+def test_pairtree_streamed_values(serializer, compress, tmp_path):
+    stash = PairtreeHashStash(os.path.join(tmp_path, "streamed"), serializer=serializer, compress=compress, b64=True)
+    value = {"ids": list(range(100000)), "blob": os.urandom(3000)}
+    stash["big"] = value
+    assert stash["big"] == value
+    # files hold exactly what the one-shot encoder would have produced
+    with open(stash.get_path_value("big"), "rb") as f:
+        assert stash.decode_value(f.read()) == value
+
+    if serializer == "pickle":
+        # a value that fails halfway through leaves no partial file behind
+        with pytest.raises(Exception):
+            stash["broken"] = [os.urandom(STREAM_CHUNK_SIZE * 2), lambda: None]
+        assert "broken" not in stash
+
+@pytest.mark.parametrize("stash_cls", [PairtreeHashStash, SqliteHashStash, LMDBHashStash, DiskCacheHashStash])
+def test_array_files(stash_cls, tmp_path):
+    import numpy as np
+    stash = stash_cls(os.path.join(tmp_path, "arrays"), compress="zlib")
+    arr = np.arange(100000, dtype="float32").reshape(1000, 100)
+    stash["emb"] = arr
+    stash["small"] = np.arange(10)
+
+    loaded = stash["emb"]
+    assert loaded.dtype == arr.dtype and (loaded == arr).all()
+    assert loaded.flags.writeable
+    mapped = stash.get("emb", mmap=True)
+    assert isinstance(mapped, np.memmap) and not mapped.flags.writeable
+    assert (mapped[500:502] == arr[500:502]).all()
+    assert (stash["small"] == np.arange(10)).all()
+    assert sorted(stash.keys()) == ["emb", "small"]
+
+    npy_files = lambda: [fn for _, _, fns in os.walk(stash.path_dirname) for fn in fns if fn.endswith(".npy")]
+    assert len(npy_files()) == 1
+    stash["emb"] = arr * 2
+    assert (stash["emb"] == arr * 2).all()
+    assert len(npy_files()) == 1
+    del stash["emb"]
+    assert not npy_files()
+
+    # replacing an array with a value kept in the record removes its file too
+    stash["emb"] = arr
+    stash["emb"] = 3
+    assert stash["emb"] == 3
+    assert not npy_files()
+    del stash["emb"]
+    assert not npy_files()
+
+@pytest.mark.parametrize("compress", ["raw", "lz4"])
+def test_dataframe_arrow_files(compress, tmp_path):
+    import pyarrow as pa
+    stash = DataFrameHashStash(os.path.join(tmp_path, "arrow"), io_engine="arrow", compress=compress)
+    df = pd.DataFrame({"n": range(1000), "x": [i / 3 for i in range(1000)], "s": [f"s{i}" for i in range(1000)]})
+    stash["df"] = df
+    assert stash["df"].df.equals(df)
+
+    table = stash.get("df", as_arrow=True)
+    assert isinstance(table, pa.Table) and table.num_rows == 1000
+    assert table.schema.field("n").type == pa.int64()
+    assert isinstance(stash.get("df", arrow_dtypes=True).df["x"].dtype, pd.ArrowDtype)
+    assert stash.get("missing", as_arrow=True) is None
+
+@pytest.mark.parametrize("io_engine", ["parquet", "feather", "arrow"])
+def test_dataframe_scan(io_engine, tmp_path):
+    import pyarrow.dataset as ds
+    import polars as pl
+    stash = DataFrameHashStash(os.path.join(tmp_path, "scan"), io_engine=io_engine)
+    for i in range(5):
+        stash[{"args": [i], "kwargs": {"name": f"n{i}"}}] = pd.DataFrame({"a": range(i * 10, i * 10 + 10), "b": list("abcdefghij")})
+    stash["other"] = {"not": "a dataframe"}
+
+    dataset = stash.scan()
+    assert dataset.count_rows() == 50
+    table = dataset.to_table(columns=["a", "_name"], filter=(ds.field("_arg1") == 3) & (ds.field("a") > 35))
+    assert sorted(table.column("a").to_pylist()) == [36, 37, 38, 39]
+    assert set(table.column("_name").to_pylist()) == {"n3"}
+
+    # filters on key fields skip the other files without opening them
+    for path in stash.get_path_values({"args": [0], "kwargs": {"name": "n0"}}):
+        os.remove(path)
+    assert dataset.to_table(filter=ds.field("_arg1") == 4).num_rows == 10
+
+    assert stash.sql("SELECT _name, sum(a) AS a FROM stash GROUP BY _name ORDER BY _name").df["a"].tolist() == [145, 245, 345, 445]
+    assert stash.sql("SELECT count(*) AS n FROM stash", _arg1=2).df["n"].tolist() == [10]
+
+    lazy = stash.scan(df_engine="polars")
+    assert isinstance(lazy, pl.LazyFrame)
+    assert lazy.group_by("_name").agg(pl.col("a").sum()).collect().height == 4
+
+def test_sql_duckdb_batches():
+    pytest.importorskip("duckdb")
+    import pyarrow as pa
+    from hashstash.utils.sql import run_sql, iter_aligned_batches
+    frames = [
+        pd.DataFrame({"a": [1, 2], "b": ["x", "y"]}),
+        pd.DataFrame({"a": [3.5], "c": [True]}),
+        pd.DataFrame({"b": ["z"]}),
+    ]
+    df = run_sql("SELECT a, b, c FROM stash", frames, engine="duckdb")
+    assert df["a"].tolist()[:3] == [1, 2, 3.5]
+    assert df["b"].tolist() == ["x", "y", None, "z"]
+    assert df["c"].tolist()[2] == True
+    assert run_sql("SELECT sum(a) AS a FROM stash", frames, engine="duckdb")["a"].tolist() == [6.5]
+
+    # every batch handed to duckdb already has the shared schema
+    tables = [pa.Table.from_pandas(f, preserve_index=False) for f in frames]
+    schema = pa.unify_schemas([t.schema for t in tables], promote_options="permissive")
+    batches = list(iter_aligned_batches(tables, schema))
+    assert [b.num_rows for b in batches] == [2, 1, 1]
+    assert all(b.schema == schema for b in batches)
+
+@pytest.mark.parametrize("stash_cls", [SqliteHashStash, LMDBHashStash, ShelveHashStash, DiskCacheHashStash])
+def test_chunked_values(stash_cls, tmp_path):
+    stash = stash_cls(os.path.join(tmp_path, "chunked"), chunk_size=1000, compress="zlib")
+    blob = os.urandom(10500)
+    records = {f"n{i}": i for i in range(1000)}
+    stash["blob"] = blob
+    stash["records"] = records
+    stash["small"] = "tiny"
+    assert stash["blob"] == blob
+    assert stash["records"] == records
+    assert len(stash) == 3 and len(stash.chunks) > 10
+    assert dict(stash.items())["blob"] == blob
+
+    with stash.open("blob") as f:
+        f.seek(4321)
+        assert f.read(2000) == blob[4321:6321]
+        f.seek(-10, os.SEEK_END)
+        assert f.read() == blob[-10:]
+    assert stash.open("small").read() == stash.serialize("tiny").encode()
+
+    # replaced and deleted values take their chunks with them
+    num_chunks = len(stash.chunks)
+    stash["blob"] = blob[:5000]
+    assert stash["blob"] == blob[:5000]
+    assert len(stash.chunks) == num_chunks - 6
+    del stash["blob"]
+    del stash["records"]
+    assert len(stash.chunks) == 0
+    assert stash["small"] == "tiny"
+
+    # ...as do chunked values replaced by ones small enough to stay inline
+    stash["blob"] = blob
+    assert len(stash.chunks) > 0
+    stash["blob"] = b"short"
+    assert stash["blob"] == b"short"
+    assert len(stash.chunks) == 0
+    stash["blob"] = blob
+    stash["blob"] = b"short"
+    del stash["blob"]
+    assert len(stash.chunks) == 0
+
+@pytest.mark.parametrize("stash_cls", [SqliteHashStash, LMDBHashStash, ShelveHashStash, DiskCacheHashStash])
+def test_chunked_values_threaded(stash_cls, tmp_path, monkeypatch):
+    import multiprocessing as mp
+    monkeypatch.setattr(mp, "cpu_count", lambda: 8)  # chunks go through a thread pool
+    for trial in range(5):
+        stash = stash_cls(os.path.join(tmp_path, f"chunked{trial}"), chunk_size=1000, compress="zlib")
+        blob = os.urandom(40000)
+        stash["blob"] = blob
+        assert len(stash.chunks) == 40
+        assert stash["blob"] == blob
+
+def test_set_reads_old_value_only_with_external_values(tmp_path, monkeypatch):
+    stash = LMDBHashStash(os.path.join(tmp_path, "marker"), chunk_size=1000)
+    reads = []
+    get = stash._get
+    monkeypatch.setattr(stash, "_get", lambda *args, **kwargs: reads.append(args) or get(*args, **kwargs))
+    stash["a"] = 1
+    stash["a"] = 2
+    assert not reads and not os.path.exists(stash.path_external_marker)
+    stash["big"] = os.urandom(5000)
+    assert os.path.exists(stash.path_external_marker)
+    stash["big"] = 3
+    assert reads and len(stash.chunks) == 0
+
+@pytest.mark.parametrize("stash_cls", [PairtreeHashStash, SqliteHashStash, LMDBHashStash])
+def test_adaptive_compression(stash_cls, tmp_path):
+    stash = stash_cls(os.path.join(tmp_path, "adaptive"), compress="auto")
+    assert "auto" in stash.path_dirname
+    values = {
+        "small": {"a": 1},
+        "random": os.urandom(8192),
+        "repetitive": ["same old string"] * 2000,
+    }
+    for key, value in values.items():
+        stash[key] = value
+    for key, value in values.items():
+        assert stash[key] == value
+    codecs = {}
+    for encoded_key, encoded_value in stash._items():
+        header = decode_value_header(stash.decode(encoded_value, compress="raw"))
+        assert header[0] == stash.serializer
+        codecs[stash.decode_key(encoded_key)] = header[1]
+    assert codecs["small"] == codecs["random"] == "raw"
+    assert codecs["repetitive"] != "raw"
+
+    # values written under another serializer stay readable
+    other = stash_cls(os.path.join(tmp_path, "adaptive"), compress="auto", serializer="pickle")
+    assert other.path_dirname != stash.path_dirname
+    stash._set(stash.encode_key("pickled"), other.encode_value(stash.new_unencoded_value({"x": (1, 2)})))
+    assert stash["pickled"] == {"x": (1, 2)}
+
+    # an existing compressed stash goes adaptive in place, without a rewrite
+    old = stash_cls(os.path.join(tmp_path, "existing"), compress="zlib")
+    old["old"] = ["same old string"] * 100
+    migrated = stash_cls(os.path.join(tmp_path, "existing"), compress="zlib", adaptive=True)
+    assert migrated.path == old.path
+    assert migrated["old"] == ["same old string"] * 100
+    migrated["new"] = os.urandom(1000)
+    assert migrated.sub(dbname="child").adaptive
+    headers = {
+        migrated.decode_key(k): decode_value_header(migrated.decode(v, compress="raw"))
+        for k, v in migrated._items()
+    }
+    assert headers["old"] is None and headers["new"][1] == "raw"
+    assert sorted(migrated.keys()) == ["new", "old"]
+    assert migrated["old"] == ["same old string"] * 100
+
+@pytest.mark.parametrize("stash_cls", [PairtreeHashStash, SqliteHashStash, LMDBHashStash, DiskCacheHashStash])
+def test_batch_rollback(stash_cls, tmp_path):
+    stash = stash_cls(os.path.join(tmp_path, f"{stash_cls.__name__.lower()}_rollback"))
+    stash["kept"] = 1
+    with pytest.raises(ValueError):
+        with stash.batch():
+            stash["kept"] = 2
+            stash["discarded"] = 3
+            raise ValueError("abort batch")
+    assert stash["kept"] == 1
+    assert "discarded" not in stash
+    assert len(stash) == 1
+
+def test_shelve_batch_persists(tmp_path):
+    stash = ShelveHashStash(os.path.join(tmp_path, "shelve_batch"))
+    with stash.batch():
+        for i in range(10):
+            stash[f"key{i}"] = i
+    stash.close()
+
+    reopened = ShelveHashStash(os.path.join(tmp_path, "shelve_batch"))
+    assert len(reopened) == 10
+    assert reopened["key9"] == 9
+
+def test_shelve_pooled_handle(tmp_path):
+    import threading
+    stash = ShelveHashStash(os.path.join(tmp_path, "shelve_pool"))
+    stash["a"] = 1
+    with stash.get_connection() as first:
+        pass
+    stash["b"] = 2
+    assert stash["a"] == 1
+    with stash.get_connection() as second:
+        pass
+    # one handle for the process, not one per operation
+    assert first is second
+
+    # a batch belongs to the thread that opened it
+    depths = []
+    with stash.batch():
+        thread = threading.Thread(target=lambda: depths.append(stash._batch_depth))
+        thread.start()
+        thread.join()
+        assert stash._batch_depth == 1
+    assert depths == [0]
+
+def _double(x):
+    return x * 2
+
+def _write_in_child(path):
+    ShelveHashStash(path)["c"] = "child"
+
+def test_shelve_sees_other_processes_writes(tmp_path):
+    import multiprocessing as mp
+    path = os.path.join(tmp_path, "shelve_procs")
+    stash = ShelveHashStash(path)
+    stash["p"] = "parent"
+    proc = mp.get_context("spawn").Process(target=_write_in_child, args=(path,))
+    proc.start()
+    proc.join(timeout=60)
+    assert proc.exitcode == 0
+    assert stash["c"] == "child"
+    stash["p2"] = "parent"
+    stash.close()
+    assert sorted(ShelveHashStash(path).keys()) == ["c", "p", "p2"]
+
+def _read_in_child(stash, queue):
+    from hashstash.engines.base import _connection_pool
+    own_pid_only = all(key[0] == os.getpid() for key in _connection_pool)
+    queue.put((own_pid_only, stash["key"]))
+
+def test_connection_pool_after_fork(tmp_path):
+    import multiprocessing as mp
+    stash = LMDBHashStash(os.path.join(tmp_path, "lmdb_fork"))
+    stash["key"] = "value"
+    ctx = mp.get_context("fork")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_read_in_child, args=(stash, queue))
+    proc.start()
+    own_pid_only, value = queue.get(timeout=30)
+    proc.join()
+    assert own_pid_only
+    assert value == "value"
+    assert stash["key"] == "value"
+
+def test_reap_idle_connections(tmp_path):
+    from hashstash.engines.base import _connection_pool, get_connection_key, reap_idle_connections
+    stash = SqliteHashStash(os.path.join(tmp_path, "sqlite_reap"))
+    stash.CONNECTION_TIMEOUT = 0
+    stash["key"] = "value"
+    key = get_connection_key(stash.path)
+    assert key in _connection_pool
+    reap_idle_connections()
+    assert key not in _connection_pool
+    assert stash["key"] == "value"
+
 if __name__ == "__main__":
     pytest.main([__file__])
\ No newline at end of file
@@ -3,7 +3,7 @@ import pytest
 from unittest.mock import patch, MagicMock
 from hashstash.utils import logs
 from concurrent.futures import ProcessPoolExecutor
-from hashstash.utils.pmap import pmap, _pmap_item, progress_bar
+from hashstash.utils.pmap import pmap, _pmap_item, _run_pmap_item, progress_bar
 from hashstash.engines.base import HashStash
 from hashstash.serializers.serializer import serialize, deserialize
 logger.setLevel(logging.CRITICAL+1)
@@ -26,9 +26,53 @@ def test_pmap_single_process():
     result = list(pmap(square, objects=[1, 2, 3, 4], num_proc=1))
     assert result == [1, 4, 9, 16]
 
-def test_pmap_unordered():
-    result = set(pmap(square, objects=[1, 2, 3, 4], num_proc=2, ordered=False))
-    assert result == {1, 4, 9, 16}
+@pytest.mark.parametrize("num_proc", [1, 2])
+def test_pmap_unordered(num_proc):
+    # (index, result) pairs, as StashMap's unordered iteration gives them
+    result = list(pmap(square, objects=[1, 2, 3, 4], num_proc=num_proc, ordered=False, progress=False))
+    assert sorted(result) == [(0, 1), (1, 4), (2, 9), (3, 16)]
+
+def test_pmap_unordered_completion_order():
+    smap = StashMap(square, objects=[1, 2, 3, 4], num_proc=1, ordered=False, preload=False, precompute=False, progress=False)
+    assert smap[3].result == 16
+    # the run already finished comes out first
+    assert list(smap.results_iter()) == [(3, 16), (0, 1), (1, 4), (2, 9)]
+    assert smap.results == [1, 4, 9, 16]
+
+def test_pmap_stream():
+    from hashstash.utils.pmap import pmap_stream
+    import itertools
+
+    pulled = []
+
+    def numbers():
+        for x in itertools.count():
+            pulled.append(x)
+            yield x
+
+    # an endless input is only read a window ahead of what's been yielded
+    results = pmap_stream(square, numbers(), num_proc=1, window=10, progress=False)
+    assert list(itertools.islice(results, 5)) == [0, 1, 4, 9, 16]
+    assert len(pulled) <= 5 + 10
+    results.close()
+
+    with HashStash().tmp() as stash:
+        assert list(stash.map_stream(square, range(6), num_proc=1, progress=False)) == [0, 1, 4, 9, 16, 25]
+        assert len(square.stash) == 6
+        assert len(stash) == 0  # the map itself isn't stashed
+
+        # stashed runs are looked up rather than run again
+        with patch("hashstash.utils.pmap._run_pmap_item", wraps=_run_pmap_item) as mock_item:
+            pairs = list(stash.map_stream(square, range(8), num_proc=1, ordered=False, progress=False))
+        assert sorted(pairs) == [(i, i * i) for i in range(8)]
+        assert mock_item.call_count == 2
+
+        # the function stash is looked up once per stream, not attached per batch
+        list(stash.map_stream(square, range(100), num_proc=1, window=4, progress=False))
+        assert len(stash.children) == 1
+
+    assert list(pmap_stream(multiply, options=[{"x": 2, "y": 3}], num_proc=1, progress=False)) == [6]
+    assert list(pmap_stream(square, [], num_proc=1, progress=False)) == []
 
 def test_pmap_empty_input():
     with pytest.raises(ValueError):
@@ -143,6 +187,74 @@ def test_pmap_with_stash():
             assert func_stash.get_func(i) == i**2
 
 
+def test_pmap_cached_runs_not_dispatched():
+    with HashStash().tmp() as stash:
+        assert list(pmap(square, objects=[1, 2, 3], num_proc=2, stash=stash, progress=False)) == [1, 4, 9]
+        assert square.stash.get_many([((2,), {}), ((5,), {})]) == [4, None]
+
+        # hits come from one batched read in the parent; only the miss reaches a worker
+        with patch("hashstash.utils.pmap._run_pmap_item", wraps=_run_pmap_item) as mock_item, \
+                patch('hashstash.utils.pmap._pmap_lookup_item') as mock_lookup:
+            smap = StashMap(square, objects=[1, 2, 3, 4], num_proc=1, stash=stash, progress=False)
+            assert smap.results == [1, 4, 9, 16]
+        assert mock_item.call_count == 1
+        mock_lookup.assert_not_called()
+        assert len(square.stash) == 4
+
+
+def test_pmap_chunks():
+    smap = StashMap(square, objects=list(range(10)), num_proc=1, chunksize=4, progress=False)
+    assert smap.results == [x * x for x in range(10)]
+
+    # auto-tuned chunks grow once a task's duration has been measured
+    smap = StashMap(square, objects=list(range(10)), num_proc=1, precompute=False, preload=False, progress=False)
+    assert smap.get_chunksize() == 1
+    assert list(smap.results_iter()) == [x * x for x in range(10)]
+    assert smap._task_time is not None
+
+
+def test_pmap_worker_context():
+    from hashstash.utils.pmap import init_stash_map_worker, _pmap_chunk, _worker_contexts
+    from hashstash.serializers import serialize_custom
+
+    with HashStash().tmp() as stash:
+        init_stash_map_worker("ctx", serialize_custom({"func": failing_function, "stash": stash, "_force": False}))
+        try:
+            outputs, elapsed = _pmap_chunk("ctx", stuff([((1,), {}), ((2,), {}), ((3,), {})]))
+            _pmap_chunk("ctx", stuff([((4,), {}), ((5,), {})]))
+            # the function stash is resolved once per worker, not attached again per run
+            assert len(_worker_contexts["ctx"]["stash"].children) == 1
+        finally:
+            _worker_contexts.pop("ctx")
+        assert [value for error, value in outputs] == [1, None, 9]
+        assert isinstance(outputs[1][0], ValueError)
+        assert elapsed >= 0
+        assert len(stash.sub_function_results(failing_function)) == 4
+
+
+def noop_initializer(*args):
+    pass
+
+
+def test_global_executor_keeps_busy_pools():
+    import time
+    from hashstash.utils.pmap import get_global_executor, executors
+
+    busy = get_global_executor(2, noop_initializer, ("busy",))
+    future = busy.submit(time.sleep, 2)
+    newer = [get_global_executor(2, noop_initializer, (i,)) for i in range(PMAP_MAX_WORKER_POOLS)]
+    try:
+        # a pool with work in flight isn't retired for newer maps' pools
+        assert busy in executors.values()
+        assert busy.submit(square, 3).result() == 9
+        future.result()
+    finally:
+        for executor in [busy] + newer:
+            executor.shutdown()
+        for key in [k for k, v in executors.items() if v in [busy] + newer]:
+            executors.pop(key)
+
+
 def test_pmap_item_without_stash():
     item = stuff({
         "func": square,
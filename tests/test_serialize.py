@@ -7,7 +7,7 @@ from pandas.testing import assert_frame_equal
 from pathlib import Path
 from hashstash.constants import SERIALIZER_TYPES
 
-serializers = ['hashstash']
+serializers = ['hashstash', 'hashstash_bin']
 
 @pytest.fixture(params=serializers)
 def serializer_type(request):
@@ -156,4 +156,109 @@ class TestSerializers:
         assert result == large_data
         #print(f"\nSerializer: {cache.serializer}")
         #print(f"Write time: {write_time:.4f} seconds")
-        #print(f"Read time: {read_time:.4f} seconds")
\ No newline at end of file
+        #print(f"Read time: {read_time:.4f} seconds")
+
+
+def test_binary_serializer_raw_payloads():
+    payload = os.urandom(3000)
+    data = {'blob': payload, 'arr': np.arange(100), 'big': 2**80, 1: None}
+    serialized = serialize(data, serializer='hashstash_bin')
+    assert isinstance(serialized, bytes)
+    assert payload in serialized
+    assert len(serialized) < len(serialize(data, serializer='hashstash'))
+
+    result = deserialize(serialized, serializer='hashstash_bin')
+    assert result['blob'] == payload
+    assert np.array_equal(result['arr'], data['arr'])
+    assert result['big'] == 2**80
+    assert result[1] is None
+
+def test_pickle5_out_of_band(tmp_path):
+    arr = np.random.rand(10000)
+    df = pd.DataFrame({'a': arr, 'b': np.arange(len(arr))})
+    serialized = serialize([arr, df], serializer='pickle5')
+    assert serialized[:4] == PICKLE5_MAGIC
+    result_arr, result_df = deserialize(serialized, serializer='pickle5')
+    assert np.array_equal(result_arr, arr)
+    assert not result_arr.flags.writeable  # a view into serialized, not a copy
+    assert_frame_equal(result_df, df)
+
+    stash = PairtreeHashStash(os.path.join(tmp_path, 'pickle5'), serializer='pickle5', compress=False, b64=False)
+    stash['arr'] = arr
+    assert np.array_equal(stash['arr'], arr)
+
+@pytest.mark.parametrize("backend", JSON_BACKENDS)
+def test_json_backend_compat(backend):
+    pytest.importorskip(backend)
+    data = {'a': [1, 2.5, None, True, 'ü/"x"'], 'big': 2**80, 'nan': float('inf'), 'arr': np.arange(3)}
+    serialized = serialize_custom(data)
+    assert serialized == json.dumps(stuff(data))  # keys hash the same whatever the backend
+    assert json_loads(serialized, backend) == json.loads(serialized)
+
+    from hashstash.serializers import custom
+    prev = custom.JSON_BACKEND  # None (auto-selection) unless pinned
+    set_json_backend(backend)
+    try:
+        result = deserialize(serialized, serializer='hashstash')
+        assert result['big'] == 2**80 and np.array_equal(result['arr'], data['arr'])
+    finally:
+        set_json_backend(prev)
+    assert custom.JSON_BACKEND == prev
+    with pytest.raises(ValueError):
+        set_json_backend('not_a_backend')
+
+def test_serialize_custom_to_stream():
+    import io
+    from hashstash.serializers.custom import serialize_custom_to
+    data = {
+        'ids': list(range(5000)),
+        'rows': [{'a': i, 'b': str(i), 'c': [i, (i, 2)]} for i in range(2000)],
+        'nest': [[list(range(300))] * 3],
+        'arr': np.arange(10),
+        1: {'x': list(range(1000))},
+        None: [],
+    }
+    expected = serialize_custom(data).encode()
+    out = io.BytesIO()
+    serialize_custom_to(data, out)
+    assert out.getvalue() == expected
+
+    # written in pieces of about chunk_size, not built whole
+    writes = []
+    class Writer:
+        def write(self, b):
+            writes.append(bytes(b))
+    serialize_custom_to(data, Writer(), chunk_size=1000)
+    assert b''.join(writes) == expected
+    assert len(writes) > 10 and max(map(len, writes)) < len(expected) // 5
+
+    for value in [None, 5, 'x', [], {}, [[]] * 1000]:
+        out = io.BytesIO()
+        serialize_custom_to(value, out)
+        assert out.getvalue() == serialize_custom(value).encode()
+
+def test_serialize_custom_deep_and_mixed():
+    import sys
+    deep = []
+    cur = deep
+    for i in range(sys.getrecursionlimit() * 2):
+        nxt = [i]
+        cur.append(nxt)
+        cur = nxt
+    prev_level = logger.level
+    logger.setLevel(logging.CRITICAL+1)  # debug logging would repr the deep list
+    try:
+        result = unstuff(stuff(deep))[0]
+    finally:
+        logger.setLevel(prev_level)
+    for i in range(sys.getrecursionlimit() * 2):
+        assert result[0] == i
+        result = result[-1]
+
+    data = [{'a': 1, 'b': [1, 2]}, {'t': (1, 2), 's': {3}}, {'arr': np.arange(3), 'p': Path('/tmp')}]
+    tree = stuff(data)
+    assert tree[0] == {'a': 1, 'b': [1, 2]}
+    assert tree[1]['t']['__py__'] == 'builtins.tuple'
+    result = unstuff(json.loads(json.dumps(tree)))
+    assert result[1] == {'t': (1, 2), 's': {3}}
+    assert np.array_equal(result[2]['arr'], data[2]['arr']) and result[2]['p'] == Path('/tmp')